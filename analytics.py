@@ -0,0 +1,171 @@
+"""
+Analytics backend for the Reports page.
+
+Report queries run on SQLite by default.  With CLINIC_ANALYTICS_BACKEND
+set to 'duckdb' (and the duckdb package installed) they run on an
+in-memory DuckDB snapshot of the tables in SNAPSHOT_TABLES instead.  The
+snapshot is columnar, so aggregates over years of appointments and bills
+read only the columns they need.  It is rebuilt in the background once it
+is older than CLINIC_ANALYTICS_REFRESH seconds, and SQLite answers until
+the first snapshot is ready or whenever a DuckDB query fails.
+
+Queries must use SQL both engines understand, with ? parameters.
+"""
+
+import os
+import threading
+import time
+from datetime import datetime
+
+import pandas as pd
+from database import db
+
+# Imported by load_duckdb() the first time the DuckDB backend is used
+duckdb = None
+
+BACKENDS = ('sqlite', 'duckdb')
+DEFAULT_BACKEND = 'sqlite'
+REFRESH_SECONDS = 300
+CHUNK_ROWS = 50000
+
+# Tables copied to the snapshot, with the DuckDB type of each column.
+# Only the columns reports aggregate on are copied, no names or notes.
+SNAPSHOT_TABLES = {
+    'patients': [('id', 'INTEGER'), ('gender', 'VARCHAR'), ('date_of_birth', 'DATE'),
+                 ('created_at', 'TIMESTAMP')],
+    'appointments': [('id', 'INTEGER'), ('patient_id', 'INTEGER'), ('doctor_name', 'VARCHAR'),
+                     ('appointment_date', 'DATE'), ('status', 'VARCHAR'), ('type', 'VARCHAR')],
+    'bills': [('id', 'INTEGER'), ('patient_id', 'INTEGER'), ('appointment_id', 'INTEGER'),
+              ('amount', 'DOUBLE'), ('paid_amount', 'DOUBLE'), ('payment_status', 'VARCHAR'),
+              ('payment_method', 'VARCHAR'), ('bill_date', 'DATE')],
+    'medical_records': [('id', 'INTEGER'), ('patient_id', 'INTEGER'), ('visit_date', 'DATE'),
+                        ('doctor_name', 'VARCHAR')],
+    'daily_revenue': [('day', 'DATE'), ('revenue', 'DOUBLE'), ('collected', 'DOUBLE'), ('bill_count', 'INTEGER')],
+    'daily_appointments_by_status': [('day', 'DATE'), ('status', 'VARCHAR'), ('appointment_count', 'INTEGER')],
+    'daily_new_patients': [('day', 'DATE'), ('patient_count', 'INTEGER')],
+}
+
+
+def _apply_dtypes(df, dtypes):
+    """Give a DuckDB result the column types get_dataframe(dtypes=...) would"""
+    for column, kind in (dtypes or {}).items():
+        if column not in df:
+            continue
+        if kind == 'category':
+            df[column] = df[column].astype('category')
+        elif kind == 'datetime':
+            df[column] = pd.to_datetime(df[column], errors='coerce')
+        elif kind == 'integer':
+            df[column] = pd.to_numeric(df[column], downcast='integer')
+        elif kind == 'float':
+            df[column] = pd.to_numeric(df[column]).astype('float64')
+        else:
+            df[column] = df[column].astype(kind)
+    return df
+
+
+def load_duckdb():
+    """The duckdb module, or None when it is not installed"""
+    global duckdb
+    if duckdb is None:
+        try:
+            import duckdb as module
+        except ImportError:
+            return None
+        duckdb = module
+    return duckdb
+
+
+def build_snapshot(database, tables=None):
+    """A new in-memory DuckDB connection holding a copy of `tables`"""
+    connection = load_duckdb().connect(':memory:')
+    for table, columns in (tables or SNAPSHOT_TABLES).items():
+        connection.execute(f"CREATE TABLE {table} ({', '.join(f'{name} {kind}' for name, kind in columns)})")
+        casts = ', '.join(f"TRY_CAST({name} AS {kind})" for name, kind in columns)
+        for chunk in database.stream(f"SELECT {', '.join(name for name, _ in columns)} FROM {table}",
+                                     chunk_size=CHUNK_ROWS, as_dataframe=True):
+            connection.register('chunk', chunk)
+            connection.execute(f"INSERT INTO {table} SELECT {casts} FROM chunk")
+            connection.unregister('chunk')
+    return connection
+
+
+class Analytics:
+    """Runs report queries on the selected backend"""
+
+    def __init__(self, database, backend=None, refresh_seconds=None):
+        self.db = database
+        self.backend = (backend or os.environ.get('CLINIC_ANALYTICS_BACKEND', DEFAULT_BACKEND)).lower()
+        self.refresh_seconds = refresh_seconds or float(os.environ.get('CLINIC_ANALYTICS_REFRESH',
+                                                                      REFRESH_SECONDS))
+        if self.backend not in BACKENDS:
+            print(f"Unknown analytics backend {self.backend!r}, using SQLite")
+            self.backend = 'sqlite'
+        if self.backend == 'duckdb' and load_duckdb() is None:
+            print("duckdb is not installed, using SQLite for analytics")
+            self.backend = 'sqlite'
+
+        self.snapshot_time = None
+        self._connection = None
+        self._refreshing = False
+        self._lock = threading.Lock()
+
+    def refresh(self):
+        """Rebuild the DuckDB snapshot now, then switch queries to it"""
+        started = time.monotonic()
+        connection = build_snapshot(self.db)
+        with self._lock:
+            self._connection = connection
+            self.snapshot_time = datetime.now()
+        print(f"Analytics snapshot refreshed in {time.monotonic() - started:.1f}s")
+
+    def _refresh_in_background(self):
+        try:
+            self.refresh()
+        except Exception as e:
+            print(f"Analytics snapshot failed: {e}")
+        finally:
+            with self._lock:
+                self._refreshing = False
+
+    def _snapshot(self):
+        """The current snapshot connection, starting a rebuild if it is missing or stale"""
+        with self._lock:
+            stale = (self.snapshot_time is None
+                     or (datetime.now() - self.snapshot_time).total_seconds() > self.refresh_seconds)
+            if stale and not self._refreshing:
+                self._refreshing = True
+                threading.Thread(target=self._refresh_in_background, name="analytics-snapshot",
+                                 daemon=True).start()
+            return self._connection
+
+    def active_backend(self):
+        """'duckdb' once a snapshot is serving queries, otherwise 'sqlite'"""
+        if self.backend == 'duckdb' and self._snapshot() is not None:
+            return 'duckdb'
+        return 'sqlite'
+
+    def get_dataframe(self, query, params=(), dtypes=None):
+        """Query result as a DataFrame, typed like Database.get_dataframe"""
+        if self.backend == 'duckdb':
+            connection = self._snapshot()
+            if connection is not None:
+                try:
+                    # A cursor is a separate connection to the same snapshot, safe to use per thread
+                    cursor = connection.cursor()
+                    try:
+                        return _apply_dtypes(cursor.execute(query, list(params)).df(), dtypes)
+                    finally:
+                        cursor.close()
+                except Exception as e:
+                    print(f"DuckDB analytics query failed, using SQLite: {e}")
+        return self.db.get_dataframe(query, params, dtypes=dtypes)
+
+    def fetch_one(self, query, params=()):
+        """First row of a query as a tuple, or None"""
+        df = self.get_dataframe(query, params)
+        # object dtype turns numpy scalars back into Python numbers
+        return tuple(df.head(1).astype(object).iloc[0]) if not df.empty else None
+
+
+analytics = Analytics(db)
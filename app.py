@@ -1,9 +1,9 @@
 import streamlit as st
 import pandas as pd
 from datetime import datetime, date, timedelta
-import time
 from auth import auth
 from database import db
+from page_profiler import page_profiler
 
 # Streamlit page configuration
 st.set_page_config(
@@ -105,15 +105,13 @@ def show_login_page():
                 if login_submit:
                     if username and password:
                         with st.spinner("Verifying credentials..."):
-                            time.sleep(1)
                             success, message = auth.login(username, password)
 
-                            if success:
-                                st.success("✅ Login successful!")
-                                time.sleep(1)
-                                st.rerun()
-                            else:
-                                st.error("❌ Invalid username or password")
+                        if success:
+                            # The dashboard replaces the login page straight away
+                            st.rerun()
+                        else:
+                            st.error("❌ Invalid username or password")
                     else:
                         st.warning("⚠️ Please enter username and password")
 
@@ -132,47 +130,23 @@ def show_login_page():
             st.markdown("</div>", unsafe_allow_html=True)
 
 
+@page_profiler.section("📊 Quick Overview")
 def get_dashboard_stats():
     """Get dashboard statistics"""
     try:
-        # Total patients
-        patients_result = db.execute_query("SELECT COUNT(*) FROM patients")
-        total_patients = patients_result[0][0][0] if patients_result[0] else 0
-
-        # New patients today
-        new_patients_result = db.execute_query(
-            "SELECT COUNT(*) FROM patients WHERE DATE(created_at) = ?",
-            (date.today(),)
-        )
-        new_patients_today = new_patients_result[0][0][0] if new_patients_result[0] else 0
-
-        # Today's appointments
-        appointments_result = db.execute_query(
-            """SELECT COUNT(*) FROM appointments 
-               WHERE appointment_date = ? AND status = 'Scheduled'""",
+        # All KPIs come from the trigger-maintained counters in one lookup:
+        # global counters are stored under day '' and daily ones under their date
+        counters = dict(db.fetch_all(
+            "SELECT name, value FROM clinic_counters WHERE day IN ('', ?)",
             (date.today(),)
-        )
-        today_appointments = appointments_result[0][0][0] if appointments_result[0] else 0
-
-        # Total revenue
-        revenue_result = db.execute_query(
-            """SELECT COALESCE(SUM(amount), 0) FROM bills 
-               WHERE payment_status = 'Paid'"""
-        )
-        total_revenue = revenue_result[0][0][0] if revenue_result[0] else 0
-
-        # Unpaid bills
-        unpaid_result = db.execute_query(
-            "SELECT COUNT(*) FROM bills WHERE payment_status = 'Unpaid'"
-        )
-        unpaid_bills = unpaid_result[0][0][0] if unpaid_result[0] else 0
+        ))
 
         return {
-            'total_patients': total_patients,
-            'new_patients_today': new_patients_today,
-            'today_appointments': today_appointments,
-            'total_revenue': total_revenue,
-            'unpaid_bills': unpaid_bills
+            'total_patients': counters.get('total_patients', 0),
+            'new_patients_today': counters.get('new_patients', 0),
+            'today_appointments': counters.get('scheduled_appointments', 0),
+            'total_revenue': counters.get('paid_revenue', 0),
+            'unpaid_bills': counters.get('unpaid_bills', 0)
         }
 
     except Exception as e:
@@ -191,7 +165,7 @@ def show_dashboard():
     load_css()
 
     # Sidebar
-    with st.sidebar:
+    with st.sidebar, page_profiler.section("🧭 Sidebar"):
         st.markdown('<div class="sidebar-content">', unsafe_allow_html=True)
 
         st.markdown("<h1 style='text-align: center; font-size: 60px;'>🏥</h1>", unsafe_allow_html=True)
@@ -227,6 +201,10 @@ def show_dashboard():
         if user.get('role') in ['admin', 'manager']:
             nav_items.append({"label": "👤 Users Management", "page": "pages/6_Users.py"})
 
+        if user.get('role') == 'admin':
+            nav_items.append({"label": "🐢 Query Performance", "page": "pages/7_Query_Performance.py"})
+            nav_items.append({"label": "⏱️ Performance", "page": "pages/8_Performance.py"})
+
         for item in nav_items:
             if st.button(item['label'], use_container_width=True, key=f"nav_{item['page']}"):
                 st.switch_page(item['page'])
@@ -281,7 +259,7 @@ def show_dashboard():
 
     with col1:
         # Alerts and notifications
-        with st.expander("🔔 Alerts and Notifications", expanded=True):
+        with st.expander("🔔 Alerts and Notifications", expanded=True), page_profiler.section("🔔 Alerts"):
             try:
                 # Today's appointments
                 upcoming = db.execute_query("""
@@ -334,7 +312,7 @@ def show_dashboard():
                     st.switch_page("pages/5_Reports.py")
 
     # Today's appointments
-    with st.expander("📅 Today's Appointments", expanded=True):
+    with st.expander("📅 Today's Appointments", expanded=True), page_profiler.section("📅 Today's Appointments"):
         try:
             appointments = db.execute_query("""
                 SELECT p.name, a.appointment_time, a.status, a.doctor_name
@@ -360,7 +338,7 @@ def show_dashboard():
 
     col1, col2 = st.columns(2)
 
-    with col1:
+    with col1, page_profiler.section("👥 Recent Patients"):
         # Recent patients
         try:
             recent_patients = db.execute_query("""
@@ -379,7 +357,7 @@ def show_dashboard():
         except Exception as e:
             st.error(f"Error loading data: {str(e)}")
 
-    with col2:
+    with col2, page_profiler.section("💰 Recent Bills"):
         # Recent bills
         try:
             recent_bills = db.execute_query("""
@@ -401,6 +379,7 @@ def show_dashboard():
             st.error(f"Error loading data: {str(e)}")
 
 
+@page_profiler.page("app.py")
 def main():
     """Main application function"""
     try:
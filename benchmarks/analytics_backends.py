@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Compare the SQLite and DuckDB analytics backends on several years of data.
+
+Seeds a temporary database spanning --years years, builds the DuckDB
+snapshot, then runs the Reports page queries and a few raw-table
+aggregates over the whole period on both backends and reports the median
+time of each.
+
+Usage:
+    python benchmarks/analytics_backends.py [--years 5] [--patients 20000] [--runs 5]
+"""
+
+import argparse
+import logging
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# (name, SQL, uses the period parameters)
+QUERIES = [
+    ("Period totals (rollups)", """
+        SELECT (SELECT CAST(COALESCE(SUM(patient_count), 0) AS INTEGER) FROM daily_new_patients
+                WHERE day BETWEEN ? AND ?),
+               (SELECT CAST(COALESCE(SUM(appointment_count), 0) AS INTEGER) FROM daily_appointments_by_status
+                WHERE day BETWEEN ? AND ?),
+               (SELECT COALESCE(SUM(revenue), 0) FROM daily_revenue WHERE day BETWEEN ? AND ?)
+    """, 3),
+    ("Revenue trend (rollups)", """
+        SELECT day as Date, revenue as Revenue FROM daily_revenue
+        WHERE day BETWEEN ? AND ? AND bill_count > 0 ORDER BY day
+    """, 1),
+    ("Appointment distribution (rollups)", """
+        SELECT NULLIF(status, '') as Status, SUM(appointment_count) as Count
+        FROM daily_appointments_by_status WHERE day BETWEEN ? AND ?
+        GROUP BY status HAVING SUM(appointment_count) > 0
+    """, 1),
+    ("Gender distribution", """
+        SELECT gender as Gender, COUNT(*) as Count FROM patients
+        WHERE gender IS NOT NULL AND gender != '' GROUP BY gender
+    """, 0),
+    ("Monthly revenue (bills)", """
+        SELECT substr(CAST(bill_date AS TEXT), 1, 7) as Month, SUM(amount), SUM(paid_amount), COUNT(*)
+        FROM bills WHERE bill_date BETWEEN ? AND ? GROUP BY 1 ORDER BY 1
+    """, 1),
+    ("Doctor workload (appointments)", """
+        SELECT doctor_name, status, COUNT(*), COUNT(DISTINCT patient_id)
+        FROM appointments WHERE appointment_date BETWEEN ? AND ? GROUP BY doctor_name, status
+    """, 1),
+    ("Collections by method (bills)", """
+        SELECT payment_method, payment_status, SUM(amount - paid_amount), AVG(amount)
+        FROM bills GROUP BY payment_method, payment_status
+    """, 0),
+    ("Monthly visits (medical_records)", """
+        SELECT substr(CAST(visit_date AS TEXT), 1, 7) as Month, COUNT(*), COUNT(DISTINCT patient_id)
+        FROM medical_records GROUP BY 1 ORDER BY 1
+    """, 0),
+]
+
+
+def seed(db, patients, years):
+    """Spread patients, appointments, visits and bills over the last `years` years"""
+    rng = random.Random(19)
+    today = date.today()
+    days = years * 365
+    doctors = [f"Dr. {letter}" for letter in "ABCDEFGHIJ"]
+
+    def day():
+        return today - timedelta(days=rng.randint(0, days))
+
+    with db.transaction():
+        db.execute_many(
+            "INSERT INTO patients (national_id, name, gender, date_of_birth, created_at) VALUES (?, ?, ?, ?, ?)",
+            ((f"N{i:08d}", f"Patient {i}", rng.choice(["Male", "Female"]),
+              today - timedelta(days=rng.randint(365, 85 * 365)), f"{day()} 09:00:00") for i in range(patients)))
+        db.execute_many(
+            """INSERT INTO appointments (patient_id, doctor_name, appointment_date, appointment_time, status)
+               VALUES (?, ?, ?, ?, ?)""",
+            ((rng.randint(1, patients), rng.choice(doctors), day(), "09:00",
+              rng.choice(["Scheduled", "Completed", "Completed", "Cancelled"])) for _ in range(patients * 10)))
+        db.execute_many(
+            "INSERT INTO medical_records (patient_id, visit_date, diagnosis, doctor_name) VALUES (?, ?, ?, ?)",
+            ((rng.randint(1, patients), day(), "Flu", rng.choice(doctors)) for _ in range(patients * 5)))
+        db.execute_many(
+            """INSERT INTO bills (patient_id, amount, paid_amount, payment_status, payment_method, bill_date)
+               VALUES (?, ?, ?, ?, ?, ?)""",
+            ((rng.randint(1, patients), round(rng.uniform(20, 500), 2), rng.choice([0.0, 20.0]),
+              rng.choice(["Paid", "Unpaid", "Partial"]), rng.choice(["Cash", "Credit Card", "Bank Transfer"]), day())
+             for _ in range(patients * 10)))
+
+
+def median_time(backend, sql, params, runs):
+    """Median seconds of `runs` executions, and the row count of the result"""
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        df = backend.get_dataframe(sql, params)
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples), len(df)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--years", type=int, default=5)
+    parser.add_argument("--patients", type=int, default=20000)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    os.chdir(tempfile.mkdtemp(prefix="clinic_analytics_"))
+    sys.path.insert(0, ROOT)
+    # Keep the slow-query log out of the timings
+    logging.disable(logging.CRITICAL)
+    from database import db
+    import analytics
+
+    if analytics.load_duckdb() is None:
+        print("duckdb is not installed: pip install duckdb")
+        return
+
+    start = time.perf_counter()
+    seed(db, args.patients, args.years)
+    print(f"Seeded {args.years} years, {args.patients * 26:,} rows in {time.perf_counter() - start:.1f}s")
+
+    sqlite_backend = analytics.Analytics(db, backend='sqlite')
+    duckdb_backend = analytics.Analytics(db, backend='duckdb')
+    start = time.perf_counter()
+    duckdb_backend.refresh()
+    print(f"DuckDB snapshot built in {time.perf_counter() - start:.2f}s\n")
+
+    period = (date.today() - timedelta(days=args.years * 365), date.today())
+    print(f"{'query':<36} {'rows':>6} {'sqlite ms':>10} {'duckdb ms':>10} {'speedup':>8}")
+    for name, sql, period_params in QUERIES:
+        params = period * period_params
+        sqlite_seconds, rows = median_time(sqlite_backend, sql, params, args.runs)
+        duckdb_seconds, duckdb_rows = median_time(duckdb_backend, sql, params, args.runs)
+        if rows != duckdb_rows:
+            print(f"  {name}: {rows} rows from SQLite but {duckdb_rows} from DuckDB")
+        print(f"{name:<36} {rows:>6} {sqlite_seconds * 1000:>10.1f} {duckdb_seconds * 1000:>10.1f} "
+              f"{sqlite_seconds / duckdb_seconds:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
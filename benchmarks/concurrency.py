@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Measure read latency while payments are being written, for each database profile.
+
+Reader threads run the Medical Records patient list query while writer
+threads record payments on bills, the way reception and doctors share the
+database in the morning. Every profile runs on its own temporary copy.
+
+Usage:
+    python benchmarks/concurrency.py [--seconds 5] [--readers 8] [--writers 2]
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+READ_QUERY = """
+    SELECT p.id, p.name, p.phone, COUNT(mr.id) as records_count, MAX(mr.visit_date) as last_visit
+    FROM patients p
+             LEFT JOIN medical_records mr ON p.id = mr.patient_id
+    GROUP BY p.id
+    ORDER BY p.name
+"""
+
+WRITE_QUERY = "UPDATE bills SET paid_amount = paid_amount + 1, payment_status = 'Partial' WHERE id = ?"
+
+
+def percentile(samples, pct):
+    """Nearest-rank percentile"""
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def run_profile(profile, args):
+    """Run readers and writers against a fresh database using `profile`"""
+    from database import Database
+    sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+    from page_rerun import seed
+
+    db_name = os.path.join(tempfile.mkdtemp(prefix="clinic_conc_"), "clinic.db")
+    db = Database(db_name, pool_size=args.readers + args.writers, profile=profile)
+    seed(db_name, args.patients)
+
+    stop = threading.Event()
+    latencies = []
+    errors = []
+    writes = [0]
+    lock = threading.Lock()
+
+    def reader():
+        while not stop.is_set():
+            start = time.perf_counter()
+            result, error = db.execute_query(READ_QUERY)
+            elapsed = (time.perf_counter() - start) * 1000
+            with lock:
+                if result is None:
+                    errors.append(error)
+                else:
+                    latencies.append(elapsed)
+
+    def writer():
+        rng = random.Random()
+        while not stop.is_set():
+            result, error = db.execute_query(WRITE_QUERY, (rng.randint(1, args.patients * 4),))
+            with lock:
+                if result is None:
+                    errors.append(error)
+                else:
+                    writes[0] += 1
+
+    threads = [threading.Thread(target=reader) for _ in range(args.readers)]
+    threads += [threading.Thread(target=writer) for _ in range(args.writers)]
+    for thread in threads:
+        thread.start()
+    time.sleep(args.seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    db.pool.close_all()
+
+    return {
+        'reads': len(latencies),
+        'writes': writes[0],
+        'p50': statistics.median(latencies) if latencies else 0,
+        'p95': percentile(latencies, 95) if latencies else 0,
+        'max': max(latencies) if latencies else 0,
+        'errors': len(errors),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seconds", type=float, default=5, help="duration of each run")
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--writers", type=int, default=2)
+    parser.add_argument("--patients", type=int, default=2000)
+    args = parser.parse_args()
+
+    os.chdir(tempfile.mkdtemp(prefix="clinic_conc_"))
+    sys.path.insert(0, ROOT)
+    from database import PERFORMANCE_PROFILES
+
+    print(f"{'profile':<12} {'reads':>7} {'writes':>7} {'p50 ms':>8} {'p95 ms':>8} {'max ms':>8} {'errors':>7}")
+    for profile in PERFORMANCE_PROFILES:
+        r = run_profile(profile, args)
+        print(f"{profile:<12} {r['reads']:>7} {r['writes']:>7} {r['p50']:>8.1f} {r['p95']:>8.1f} "
+              f"{r['max']:>8.1f} {r['errors']:>7}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Compare DataFrame construction for a large bills table.
+
+Builds the same frame three ways with Database.get_dataframe: the default
+object-dtype frame, a typed frame (dtypes='auto') and an Arrow table, and
+reports build time and memory footprint.
+
+Usage:
+    python benchmarks/dataframe_build.py [--rows 1000000]
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+QUERY = """
+    SELECT id, patient_id, amount, paid_amount, payment_status, payment_method, bill_date, created_at
+    FROM bills
+"""
+
+
+def seed_bills(db, rows):
+    """Insert `rows` random bills"""
+    rng = random.Random(7)
+    start = date.today() - timedelta(days=3 * 365)
+    with db.transaction():
+        db.execute_many(
+            """INSERT INTO bills (patient_id, amount, paid_amount, payment_status, payment_method, bill_date)
+               VALUES (?, ?, ?, ?, ?, ?)""",
+            ((rng.randint(1, 50000), round(rng.uniform(20, 2000), 2), 0.0,
+              rng.choice(["Paid", "Unpaid", "Partial"]), rng.choice(["Cash", "Credit Card", "Bank Transfer", "Check"]),
+              start + timedelta(days=rng.randint(0, 3 * 365))) for _ in range(rows))
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1000000)
+    args = parser.parse_args()
+
+    os.chdir(tempfile.mkdtemp(prefix="clinic_df_"))
+    sys.path.insert(0, ROOT)
+    from database import db
+    seed_bills(db, args.rows)
+
+    print(f"{'mode':<12} {'seconds':>8} {'MB':>8}")
+    for mode, kwargs in [("object", {}), ("typed", {"dtypes": "auto"}), ("arrow", {"dtypes": "auto", "arrow": True})]:
+        start = time.perf_counter()
+        result = db.get_dataframe(QUERY, **kwargs)
+        elapsed = time.perf_counter() - start
+        size = result.nbytes if mode == "arrow" else result.memory_usage(deep=True).sum()
+        print(f"{mode:<12} {elapsed:>8.2f} {size / 1e6:>8.1f}")
+        del result
+
+
+if __name__ == "__main__":
+    main()
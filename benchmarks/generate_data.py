@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+"""
+Fill a clinic database with reproducible synthetic data.
+
+The same --seed and --anchor date always produce the same rows.  Dates are
+spread over --years years before the anchor (appointments also run a few
+weeks past it), with weekday-heavy schedules, repeat patients, weighted
+doctors, diagnoses and payment outcomes, and log-normal bill amounts.
+Rows are written with executemany in transactions of --batch rows; the
+schema, migrations and their triggers are created first by Database, so
+counters, rollups and search indexes match the data.
+
+Usage:
+    python benchmarks/generate_data.py OUTPUT.db [--scale medium] [--seed 42]
+    python benchmarks/generate_data.py OUTPUT.db --patients 5000 --appointments 50000
+"""
+
+import argparse
+import hashlib
+import itertools
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Rows per table: (patients, appointments, medical_records, bills)
+SCALES = {
+    'tiny': (200, 2000, 1000, 1600),
+    'small': (1000, 10000, 5000, 8000),
+    'medium': (20000, 200000, 100000, 160000),
+    'large': (100000, 1000000, 500000, 800000),
+    'full': (1000000, 10000000, 5000000, 8000000),
+}
+
+BATCH_ROWS = 100000
+YEARS = 3
+USERS = 20
+
+FIRST_NAMES = ["Ahmed", "Mohammed", "Fatima", "Aisha", "Omar", "Layla", "Yousef", "Mariam", "Khalid", "Nora",
+               "Ali", "Sara", "Hassan", "Huda", "Ibrahim", "Reem", "John", "Maria", "David", "Anna"]
+LAST_NAMES = ["Al-Harbi", "Al-Qahtani", "Hassan", "Saleh", "Nasser", "Khan", "Haddad", "Mansour", "Smith",
+              "Garcia", "Ibrahim", "Aziz", "Farouk", "Rahman", "Youssef", "Karim"]
+CITIES = ["Riyadh", "Jeddah", "Dammam", "Mecca", "Medina", "Khobar", "Taif", "Abha"]
+BLOOD_TYPES = (["O+", "A+", "B+", "AB+", "O-", "A-", "B-", "AB-"], [38, 34, 9, 3, 7, 6, 2, 1])
+ALLERGIES = ["Penicillin", "Peanuts", "Dust", "Latex", "Sulfa drugs", "Shellfish"]
+# Age brackets (years) and their share of patients
+AGE_BRACKETS = ([(0, 17), (18, 30), (31, 45), (46, 60), (61, 90)], [18, 22, 25, 20, 15])
+
+DOCTORS = ([f"Dr. {name}" for name in ["Ahmed Saleh", "Sara Nasser", "Omar Haddad", "Layla Mansour",
+                                       "Khalid Aziz", "Nora Karim", "Ali Rahman", "Huda Farouk",
+                                       "John Smith", "Maria Garcia", "Yousef Khan", "Reem Ibrahim"]],
+           [16, 14, 12, 11, 10, 9, 8, 6, 5, 4, 3, 2])
+APPOINTMENT_TYPES = (["Regular", "Follow-up", "Check-up", "Emergency"], [55, 25, 15, 5])
+PAST_STATUSES = (["Completed", "Cancelled", "No Show", "Scheduled"], [75, 12, 8, 5])
+FUTURE_STATUSES = (["Scheduled", "Cancelled"], [90, 10])
+# Quarter-hour slots from 08:00 to 16:45, quieter over lunch
+TIME_SLOTS = [f"{hour:02d}:{minute:02d}" for hour in range(8, 17) for minute in (0, 15, 30, 45)]
+TIME_WEIGHTS = [1 if slot.startswith(("12", "13")) else 3 for slot in TIME_SLOTS]
+
+DIAGNOSES = (["Hypertension", "Type 2 diabetes", "Upper respiratory infection", "Migraine", "Asthma",
+              "Back pain", "Gastritis", "Allergic rhinitis", "Anxiety", "Urinary tract infection",
+              "Hyperlipidemia", "Dermatitis"],
+             [14, 12, 16, 7, 6, 9, 7, 8, 5, 6, 6, 4])
+SYMPTOMS = ["Fever and cough", "Headache", "Fatigue", "Chest tightness", "Abdominal pain", "Skin rash",
+            "Dizziness", "Shortness of breath", "Joint pain", "Sore throat"]
+PRESCRIPTIONS = ["Paracetamol 500mg", "Amoxicillin 500mg", "Metformin 850mg", "Amlodipine 5mg", "Ibuprofen 400mg",
+                 "Salbutamol inhaler", "Omeprazole 20mg", "Cetirizine 10mg", "Atorvastatin 20mg"]
+TESTS = ["CBC", "HbA1c", "Lipid panel", "Urinalysis", "Chest X-ray", "ECG", "Liver function", "Kidney function"]
+
+PAYMENT_STATUSES = (["Paid", "Unpaid", "Partial"], [70, 18, 12])
+PAYMENT_METHODS = (["Cash", "Credit Card", "Bank Transfer", "Check"], [45, 35, 15, 5])
+SERVICES = ["Consultation", "Consultation, Lab tests", "Follow-up visit", "X-ray", "Vaccination",
+            "Consultation, Medication", "Emergency care", "Dressing"]
+
+
+class Weighted:
+    """Seeded choice from (values, weights) with the cumulative weights computed once"""
+
+    def __init__(self, rng, values_and_weights):
+        self.rng = rng
+        self.values, weights = values_and_weights
+        self.cum_weights = list(itertools.accumulate(weights))
+
+    def __call__(self):
+        return self.rng.choices(self.values, cum_weights=self.cum_weights)[0]
+
+
+class Generator:
+    """Row factories for each table, all drawing from one seeded random generator"""
+
+    def __init__(self, seed, anchor, years, counts):
+        self.rng = random.Random(seed)
+        self.anchor = anchor
+        self.span = years * 365
+        self.patients, self.appointments, self.records, self.bills = counts
+        self.blood_type = Weighted(self.rng, BLOOD_TYPES)
+        self.age_bracket = Weighted(self.rng, AGE_BRACKETS)
+        self.doctor = Weighted(self.rng, DOCTORS)
+        self.appointment_type = Weighted(self.rng, APPOINTMENT_TYPES)
+        self.past_status = Weighted(self.rng, PAST_STATUSES)
+        self.future_status = Weighted(self.rng, FUTURE_STATUSES)
+        self.time_slot = Weighted(self.rng, (TIME_SLOTS, TIME_WEIGHTS))
+        self.diagnosis = Weighted(self.rng, DIAGNOSES)
+        self.payment_status = Weighted(self.rng, PAYMENT_STATUSES)
+        self.payment_method = Weighted(self.rng, PAYMENT_METHODS)
+
+    def day(self, future_days=0):
+        """A date in the span, recent days more likely as the clinic grows; weekends are quieter"""
+        rng = self.rng
+        offset = int(self.span * rng.random() ** 1.5) - rng.randint(0, future_days)
+        day = self.anchor - timedelta(days=offset)
+        if day.weekday() >= 5 and rng.random() < 0.7:
+            day -= timedelta(days=day.weekday() - rng.randint(0, 4))
+        return day
+
+    def patient_id(self):
+        """Regular patients come back far more often than others"""
+        return 1 + int(self.patients * self.rng.random() ** 2)
+
+    def patient_rows(self):
+        rng = self.rng
+        for i in range(self.patients):
+            low, high = self.age_bracket()
+            born = self.anchor - timedelta(days=rng.randint(low * 365, high * 365 + 364))
+            first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+            yield (f"{1000000000 + i}", f"{first} {last}", f"05{rng.randint(10000000, 99999999)}",
+                   f"{first.lower()}.{i}@example.com" if rng.random() < 0.6 else None,
+                   str(born), rng.choices(["Male", "Female", None], cum_weights=[48, 98, 100])[0],
+                   rng.choice(CITIES), f"05{rng.randint(10000000, 99999999)}", self.blood_type(),
+                   rng.choice(ALLERGIES) if rng.random() < 0.15 else None,
+                   f"{self.day()} {rng.randint(8, 17):02d}:{rng.randint(0, 59):02d}:00")
+
+    def appointment_rows(self):
+        rng = self.rng
+        for _ in range(self.appointments):
+            day = self.day(future_days=60)
+            status = self.future_status() if day > self.anchor else self.past_status()
+            booked = day - timedelta(days=rng.randint(0, 30))
+            yield (self.patient_id(), self.doctor(), str(day), self.time_slot(), status, self.appointment_type(),
+                   "Patient requested morning slot" if rng.random() < 0.1 else None, f"{booked} 09:00:00")
+
+    def record_rows(self):
+        rng = self.rng
+        for _ in range(self.records):
+            day = self.day()
+            yield (self.patient_id(), str(day), self.diagnosis(), rng.choice(PRESCRIPTIONS), rng.choice(SYMPTOMS),
+                   rng.choice(TESTS) if rng.random() < 0.4 else None,
+                   "Review in two weeks" if rng.random() < 0.2 else None, self.doctor(), f"{day} 12:00:00")
+
+    def bill_rows(self):
+        rng = self.rng
+        for _ in range(self.bills):
+            day = self.day()
+            amount = round(rng.lognormvariate(4.8, 0.6), 2)
+            status = self.payment_status()
+            paid = amount if status == "Paid" else round(amount * rng.uniform(0.2, 0.8), 2) if status == "Partial" \
+                else 0.0
+            yield (self.patient_id(), rng.randint(1, self.appointments) if self.appointments and rng.random() < 0.7
+                   else None, amount, paid, status, rng.choice(SERVICES),
+                   self.payment_method() if status != "Unpaid" else None, str(day), f"{day} 10:00:00")
+
+    def user_rows(self, count):
+        rng = self.rng
+        password_hash = hashlib.sha256("password".encode()).hexdigest()
+        for i in range(count):
+            role = rng.choice(["doctor", "doctor", "reception", "nurse"])
+            yield (f"{role}{i + 1}", password_hash, f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}", role,
+                   f"{role}{i + 1}@clinic.example", f"05{rng.randint(10000000, 99999999)}",
+                   0 if rng.random() < 0.1 else 1)
+
+
+INSERTS = [
+    ('users', 'user_rows', """INSERT INTO users (username, password_hash, full_name, role, email, phone, is_active)
+                              VALUES (?, ?, ?, ?, ?, ?, ?)"""),
+    ('patients', 'patient_rows', """INSERT INTO patients (national_id, name, phone, email, date_of_birth, gender,
+                                                          address, emergency_contact, blood_type, allergies,
+                                                          created_at)
+                                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"""),
+    ('appointments', 'appointment_rows', """INSERT INTO appointments (patient_id, doctor_name, appointment_date,
+                                                                      appointment_time, status, type, notes,
+                                                                      created_at)
+                                            VALUES (?, ?, ?, ?, ?, ?, ?, ?)"""),
+    ('medical_records', 'record_rows', """INSERT INTO medical_records (patient_id, visit_date, diagnosis,
+                                                                       prescription, symptoms, tests, notes,
+                                                                       doctor_name, created_at)
+                                          VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)"""),
+    ('bills', 'bill_rows', """INSERT INTO bills (patient_id, appointment_id, amount, paid_amount, payment_status,
+                                                 services, payment_method, bill_date, created_at)
+                              VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)"""),
+]
+
+
+def generate(db_name, counts, seed=42, anchor=None, years=YEARS, users=USERS, batch=BATCH_ROWS, log=print):
+    """Create `db_name` with the app's schema and fill it; returns {table: seconds}"""
+    sys.path.insert(0, ROOT)
+    from database import Database
+
+    # Schema, migrations, triggers and the admin user
+    Database(db_name, pool_size=1).pool.close_all()
+
+    generator = Generator(seed, anchor or date.today(), years, counts)
+    conn = sqlite3.connect(db_name)
+    # The file is disposable until generation finishes
+    conn.execute("PRAGMA synchronous = OFF")
+    conn.execute("PRAGMA cache_size = -200000")
+
+    timings = {}
+    for table, factory, sql in INSERTS:
+        started = time.perf_counter()
+        rows = generator.user_rows(users) if table == 'users' else getattr(generator, factory)()
+        written = 0
+        while True:
+            chunk = list(itertools.islice(rows, batch))
+            if not chunk:
+                break
+            with conn:
+                conn.executemany(sql, chunk)
+            written += len(chunk)
+        timings[table] = time.perf_counter() - started
+        log(f"{table:<16} {written:>12,} rows  {timings[table]:.1f}s")
+
+    conn.execute("ANALYZE")
+    conn.close()
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("output", help="database file to create")
+    parser.add_argument("--scale", choices=list(SCALES), default='small')
+    parser.add_argument("--patients", type=int)
+    parser.add_argument("--appointments", type=int)
+    parser.add_argument("--records", type=int)
+    parser.add_argument("--bills", type=int)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--anchor", type=date.fromisoformat, help="date the data ends at (default: today)")
+    parser.add_argument("--years", type=int, default=YEARS)
+    parser.add_argument("--batch", type=int, default=BATCH_ROWS, help="rows per transaction")
+    args = parser.parse_args()
+
+    if os.path.exists(args.output):
+        print(f"❌ {args.output} already exists")
+        return 1
+
+    output = os.path.abspath(args.output)
+    # Importing database opens clinic.db in the working directory
+    os.chdir(tempfile.mkdtemp(prefix="clinic_generate_"))
+
+    counts = [override if override is not None else default for override, default in
+              zip((args.patients, args.appointments, args.records, args.bills), SCALES[args.scale])]
+    started = time.perf_counter()
+    generate(output, counts, seed=args.seed, anchor=args.anchor, years=args.years, batch=args.batch)
+    print(f"✅ {args.output} generated in {time.perf_counter() - started:.1f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+"""
+Simulate many staff sessions using the app at once and report rerun latency.
+
+Each simulated session logs in through app.py, then repeatedly runs
+interaction scripts on the pages (search a patient, book an appointment,
+record a payment, run a report, browse records and stats) with Streamlit's
+AppTest.  AppTest swaps a global mock runtime in and out around every
+run, so each session runs in its own process; all of them share one
+generated database in a temporary directory.
+
+Every rerun is timed and the queries it issued are counted, and the
+p50/p95/p99 latency and average queries per rerun are reported for each
+page and action.
+
+Usage:
+    python benchmarks/load_test.py [--sessions 15] [--iterations 3] [--scale tiny] [--output load.json]
+"""
+
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from collections import defaultdict
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from concurrency import percentile
+from generate_data import SCALES, generate
+
+PASSWORD = "password"
+
+
+class QueryCounter:
+    """Wrap the query profiler to count the queries issued by script runs"""
+
+    def __init__(self, db):
+        from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+        self._get_ctx = get_script_run_ctx
+        self._record = db.profiler.record
+        self._count = 0
+        db.profiler.record = self
+
+    def __call__(self, query, params, seconds, rows, conn=None):
+        # Queries from background threads (report jobs, snapshots) have no script context
+        if self._get_ctx() is not None:
+            self._count += 1
+        return self._record(query, params, seconds, rows, conn)
+
+    def take(self):
+        """Queries counted since the last call"""
+        count, self._count = self._count, 0
+        return count
+
+
+def widget(elements, label):
+    """The first element of an AppTest element list with `label`"""
+    return next(element for element in elements if element.label == label)
+
+
+class Session:
+    """One staff member: an AppTest per page, all sharing the logged-in user"""
+
+    def __init__(self, number, username, counter, timeout, rng):
+        self.number = number
+        self.username = username
+        self.counter = counter
+        self.samples = []
+        self.timeout = timeout
+        self.rng = rng
+        self.user = None
+        self.apps = {}
+
+    def rerun(self, at, page, action):
+        """Run the script once and record latency and query count"""
+        self.counter.take()
+        start = time.perf_counter()
+        try:
+            at.run()
+            error = '; '.join(str(exception.value) for exception in at.exception) or None
+        except RuntimeError as e:
+            error = str(e)
+        elapsed = (time.perf_counter() - start) * 1000
+        self.samples.append({'session': self.number, 'page': page, 'action': action, 'ms': elapsed,
+                             'queries': self.counter.take(), 'error': error})
+        return at
+
+    def open(self, page):
+        """The page's AppTest, rerun as a page view"""
+        from streamlit.testing.v1 import AppTest
+
+        at = self.apps.get(page)
+        if at is None:
+            at = self.apps[page] = AppTest.from_file(os.path.join(ROOT, page), default_timeout=self.timeout)
+            at.session_state.logged_in = True
+            at.session_state.user = self.user
+        return self.rerun(at, page, 'view')
+
+    def login(self):
+        from streamlit.testing.v1 import AppTest
+
+        at = AppTest.from_file(os.path.join(ROOT, "app.py"), default_timeout=self.timeout)
+        self.rerun(at, "app.py", 'view')
+        widget(at.text_input, "👤 Username").set_value(self.username)
+        widget(at.text_input, "🔒 Password").set_value(PASSWORD)
+        widget(at.button, "🚀 Login").click()
+        self.rerun(at, "app.py", 'login')
+        self.user = at.session_state.user
+        self.apps["app.py"] = at
+
+
+# Interaction scripts, each starting with a page view
+
+def search_patient(session):
+    at = session.open("pages/1_Patients.py")
+    name = session.rng.choice(["Ahmed", "Sara", "Hassan", "Khan", "Maria", "Nasser"])
+    widget(at.text_input, "Search by name or phone").set_value(name)
+    widget(at.button, "Search").click()
+    session.rerun(at, "pages/1_Patients.py", 'search')
+
+
+def book_appointment(session):
+    at = session.open("pages/2_Appointments.py")
+    widget(at.text_input, "👨‍⚕️ Doctor Name *").set_value("Dr. Load Test")
+    widget(at.button, "💾 Save Appointment").click()
+    session.rerun(at, "pages/2_Appointments.py", 'book')
+
+
+def record_payment(session):
+    at = session.open("pages/4_Bills.py")
+    buttons = [button for button in at.button if button.label == "💳 Record Payment"]
+    if buttons:
+        session.rng.choice(buttons[:20]).click()
+        session.rerun(at, "pages/4_Bills.py", 'payment')
+
+
+def run_report(session):
+    at = session.open("pages/5_Reports.py")
+    widget(at.selectbox, "Report Type").select(session.rng.choice(widget(at.selectbox, "Report Type").options))
+    widget(at.selectbox, "File Format").select("CSV")
+    widget(at.button, "📥 Export Data").click()
+    session.rerun(at, "pages/5_Reports.py", 'export')
+    at.button(key="refresh_report_jobs").click()
+    session.rerun(at, "pages/5_Reports.py", 'refresh jobs')
+
+
+def browse_records(session):
+    session.open("pages/3_Medical_Records.py")
+
+
+def dashboard(session):
+    session.rerun(session.apps["app.py"], "app.py", 'view')
+
+
+# (script, weight): what reception and doctors spend a morning doing
+SCRIPTS = [
+    (search_patient, 30),
+    (dashboard, 20),
+    (book_appointment, 15),
+    (browse_records, 15),
+    (record_payment, 10),
+    (run_report, 10),
+]
+
+
+def run_session(workdir, number, username, iterations, ramp_up, timeout, seed, ready):
+    """Worker process: log in, then run `iterations` weighted interaction scripts; returns the samples"""
+    os.chdir(workdir)
+    logging.disable(logging.CRITICAL)
+    sys.path.insert(0, ROOT)
+    from database import db
+
+    session = Session(number, username, QueryCounter(db), timeout, random.Random(seed))
+    # Imports are slow; start the clock once every session is ready
+    ready.wait()
+    time.sleep(session.rng.uniform(0, ramp_up))
+    session.login()
+    scripts, weights = zip(*SCRIPTS)
+    for _ in range(iterations):
+        script = session.rng.choices(scripts, weights=weights)[0]
+        try:
+            script(session)
+        except (StopIteration, KeyError, IndexError) as e:
+            session.samples.append({'session': number, 'page': script.__name__, 'action': 'script',
+                                    'ms': 0.0, 'queries': 0, 'error': f"widget not found: {e!r}"})
+    return session.samples
+
+
+def report(samples):
+    """Latency percentiles and queries per rerun, grouped by page and action"""
+    groups = defaultdict(list)
+    for sample in samples:
+        groups[(sample['page'], sample['action'])].append(sample)
+
+    rows = []
+    for (page, action), group in sorted(groups.items()):
+        timings = [sample['ms'] for sample in group]
+        rows.append({
+            'page': page,
+            'action': action,
+            'reruns': len(group),
+            'p50_ms': percentile(timings, 50),
+            'p95_ms': percentile(timings, 95),
+            'p99_ms': percentile(timings, 99),
+            'queries_per_rerun': sum(sample['queries'] for sample in group) / len(group),
+            'errors': sum(1 for sample in group if sample['error']),
+        })
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=15, help="concurrent simulated staff sessions")
+    parser.add_argument("--iterations", type=int, default=3, help="interaction scripts per session")
+    parser.add_argument("--ramp-up", type=float, default=2.0, help="seconds over which sessions start")
+    parser.add_argument("--scale", choices=list(SCALES), default='tiny')
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--timeout", type=float, default=300, help="seconds before a rerun is abandoned")
+    parser.add_argument("--output", help="write the samples and summary as JSON")
+    args = parser.parse_args()
+
+    output = os.path.abspath(args.output) if args.output else None
+    workdir = tempfile.mkdtemp(prefix="clinic_load_")
+    logging.disable(logging.CRITICAL)
+    db_name = os.path.join(workdir, "clinic.db")
+    generate(db_name, SCALES[args.scale], seed=args.seed)
+
+    # Generated staff accounts all use PASSWORD; the admin keeps the default one
+    conn = sqlite3.connect(db_name)
+    usernames = [row[0] for row in conn.execute(
+        "SELECT username FROM users WHERE is_active = 1 AND username != 'admin' ORDER BY id")]
+    conn.close()
+
+    rng = random.Random(args.seed)
+    context = multiprocessing.get_context("spawn")
+    with context.Manager() as manager, context.Pool(args.sessions) as pool:
+        ready = manager.Barrier(args.sessions)
+        jobs = [pool.apply_async(run_session, (workdir, number, usernames[number % len(usernames)], args.iterations,
+                                               args.ramp_up, args.timeout, rng.random(), ready))
+                for number in range(args.sessions)]
+        print(f"Running {args.sessions} sessions x {args.iterations} scripts on the {args.scale} data set...")
+        start = time.perf_counter()
+        samples = [sample for job in jobs for sample in job.get()]
+        elapsed = time.perf_counter() - start
+
+    rows = report(samples)
+    print(f"\n{'page':<28} {'action':<13} {'reruns':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} "
+          f"{'queries':>8} {'errors':>6}")
+    for row in rows:
+        print(f"{row['page']:<28} {row['action']:<13} {row['reruns']:>6} {row['p50_ms']:>9.1f} {row['p95_ms']:>9.1f} "
+              f"{row['p99_ms']:>9.1f} {row['queries_per_rerun']:>8.1f} {row['errors']:>6}")
+    timings = [sample['ms'] for sample in samples]
+    print(f"\n{len(samples)} reruns in {elapsed:.1f}s, all pages p50 {percentile(timings, 50):.0f} ms, "
+          f"p95 {percentile(timings, 95):.0f} ms, p99 {percentile(timings, 99):.0f} ms")
+    errors = [sample for sample in samples if sample['error']]
+    for sample in errors[:5]:
+        print(f"  error on {sample['page']} {sample['action']}: {sample['error']}")
+
+    if output:
+        with open(output, 'w', encoding='utf-8') as file:
+            json.dump({'sessions': args.sessions, 'iterations': args.iterations, 'scale': args.scale,
+                       'seconds': elapsed, 'summary': rows, 'samples': samples}, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
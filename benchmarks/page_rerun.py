@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Time a full rerun of app.py and every page under pages/ with Streamlit's AppTest.
+
+The benchmark works on a seeded copy of the database in a temporary
+directory, so clinic.db is never touched.
+
+Usage:
+    python benchmarks/page_rerun.py [--runs 5] [--patients 500]
+"""
+
+import argparse
+import os
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def seed(db_name, patients):
+    """Fill a fresh database with a small, deterministic data set"""
+    rng = random.Random(42)
+    today = date.today()
+    conn = sqlite3.connect(db_name)
+    conn.executemany(
+        "INSERT INTO patients (national_id, name, phone, gender, date_of_birth) VALUES (?, ?, ?, ?, ?)",
+        [(f"N{i:08d}", f"Patient {i}", f"05{i:08d}", rng.choice(["Male", "Female"]),
+          today - timedelta(days=rng.randint(365, 80 * 365))) for i in range(patients)]
+    )
+    conn.executemany(
+        """INSERT INTO appointments (patient_id, doctor_name, appointment_date, appointment_time, status)
+           VALUES (?, ?, ?, ?, ?)""",
+        [(rng.randint(1, patients), f"Dr. {rng.choice('ABCDEF')}", today - timedelta(days=rng.randint(0, 365)),
+          f"{rng.randint(8, 15):02d}:{rng.choice(['00', '30'])}",
+          rng.choice(["Scheduled", "Completed", "Completed", "Cancelled", "No Show"])) for _ in range(patients * 4)]
+    )
+    conn.executemany(
+        """INSERT INTO medical_records (patient_id, visit_date, diagnosis, prescription, doctor_name)
+           VALUES (?, ?, ?, ?, ?)""",
+        [(rng.randint(1, patients), today - timedelta(days=rng.randint(0, 365)),
+          rng.choice(["Flu", "Hypertension", "Diabetes", "Migraine"]), "Paracetamol",
+          f"Dr. {rng.choice('ABCDEF')}") for _ in range(patients * 3)]
+    )
+    conn.executemany(
+        """INSERT INTO bills (patient_id, amount, paid_amount, payment_status, payment_method, bill_date)
+           VALUES (?, ?, ?, ?, ?, ?)""",
+        [(rng.randint(1, patients), 100.0, rng.choice([0.0, 50.0, 100.0]), rng.choice(["Paid", "Paid", "Unpaid"]),
+          rng.choice(["Cash", "Credit Card"]), today - timedelta(days=rng.randint(0, 365)))
+         for _ in range(patients * 4)]
+    )
+    conn.commit()
+    conn.close()
+
+
+def page_files():
+    """app.py followed by every page script"""
+    pages_dir = os.path.join(ROOT, "pages")
+    return ["app.py"] + [os.path.join("pages", name) for name in sorted(os.listdir(pages_dir)) if name.endswith(".py")]
+
+
+class QueryTimer:
+    """Wrap the query profiler to count queries and time spent in SQLite.
+
+    Every Database method (fetch_all, scalar, get_dataframe, stream, ...)
+    reports through db.profiler.record, so no query path is missed.
+    """
+
+    def __init__(self, db):
+        self.calls = 0
+        self.seconds = 0.0
+        db.profiler.enabled = True
+        self._record = db.profiler.record
+        db.profiler.record = self
+
+    def __call__(self, query, params, seconds, rows, conn=None):
+        self.calls += 1
+        self.seconds += seconds
+        return self._record(query, params, seconds, rows, conn)
+
+    def reset(self):
+        self.calls = 0
+        self.seconds = 0.0
+
+
+def time_page(page, user, runs, timer):
+    """Median rerun wall time, median time inside queries (ms) and queries per rerun"""
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(os.path.join(ROOT, page), default_timeout=120)
+    at.session_state.logged_in = True
+    at.session_state.user = user
+    at.run()
+
+    samples, db_samples = [], []
+    for _ in range(runs):
+        timer.reset()
+        start = time.perf_counter()
+        at.run()
+        samples.append((time.perf_counter() - start) * 1000)
+        db_samples.append(timer.seconds * 1000)
+    return statistics.median(samples), statistics.median(db_samples), timer.calls
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5, help="timed reruns per page")
+    parser.add_argument("--patients", type=int, default=500, help="patients to seed (other tables scale with it)")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="clinic_bench_")
+    os.chdir(workdir)
+    sys.path.insert(0, ROOT)
+
+    from database import db
+    seed(db.db_name, args.patients)
+
+    rows, columns = db.execute_query("SELECT * FROM users WHERE username = 'admin'")
+    user = dict(zip(columns, rows[0]))
+
+    timer = QueryTimer(db)
+    print(f"{'page':<30} {'rerun ms':>10} {'db ms':>10} {'queries':>8}")
+    for page in page_files():
+        rerun_ms, db_ms, queries = time_page(page, user, args.runs, timer)
+        print(f"{page:<30} {rerun_ms:>10.1f} {db_ms:>10.1f} {queries:>8}")
+
+    if hasattr(db, "pool"):
+        print(f"\npool: {db.pool.stats()}")
+
+
+if __name__ == "__main__":
+    main()
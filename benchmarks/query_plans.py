@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""
+Print the EXPLAIN QUERY PLAN of the hot-path queries issued by app.py and the pages.
+
+Queries whose plan still contains a full table scan are flagged, so a new
+filter without a matching index shows up here first.
+
+Usage:
+    python benchmarks/query_plans.py [path/to/clinic.db]
+"""
+
+import os
+import sqlite3
+import sys
+import tempfile
+from datetime import date
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from exports import DATASETS as EXPORT_QUERIES
+
+TODAY = date.today()
+MONTH_START = TODAY.replace(day=1)
+
+# (source, sql, params) for every filtered or ordered query on a clinic table
+QUERIES = [
+    ("app.py dashboard counters",
+     "SELECT name, value FROM clinic_counters WHERE day IN ('', ?)",
+     (TODAY,)),
+    ("app.py overdue bills",
+     """SELECT COUNT(*) FROM bills WHERE payment_status = 'Unpaid'
+        AND julianday('now') - julianday(bill_date) > 30""",
+     ()),
+    ("app.py today's appointment list",
+     """SELECT p.name, a.appointment_time, a.status, a.doctor_name
+        FROM appointments a JOIN patients p ON a.patient_id = p.id
+        WHERE a.appointment_date = ? ORDER BY a.appointment_time""",
+     (TODAY,)),
+    ("app.py recent patients",
+     "SELECT name, phone, created_at FROM patients ORDER BY created_at DESC LIMIT 5",
+     ()),
+    ("app.py recent bills",
+     """SELECT p.name, b.amount, b.payment_status FROM bills b JOIN patients p ON b.patient_id = p.id
+        ORDER BY b.created_at DESC LIMIT 5""",
+     ()),
+    ("1_Patients list page",
+     """SELECT id, name, created_at FROM patients WHERE (created_at, id) < (?, ?)
+        ORDER BY created_at DESC, id DESC LIMIT ?""",
+     (TODAY, 1000, 26)),
+    ("1_Patients list page by name",
+     "SELECT id, name FROM patients WHERE (name, id) > (?, ?) ORDER BY name ASC, id ASC LIMIT ?",
+     ("M", 0, 26)),
+    ("1_Patients search",
+     """SELECT p.id, p.name FROM (SELECT rowid AS id FROM patients_fts WHERE patients_fts MATCH ?
+                                  ORDER BY id DESC LIMIT ?) m JOIN patients p ON p.id = m.id
+        ORDER BY p.name LIKE ? DESC, p.name LIKE ? DESC, length(p.name), p.id DESC LIMIT ?""",
+     ('"ahmed"', 500, "ahmed%", "%ahmed%", 100)),
+    ("2_Appointments doctors",
+     "SELECT DISTINCT doctor_name FROM appointments WHERE doctor_name IS NOT NULL",
+     ()),
+    ("2_Appointments schedule page",
+     """SELECT a.id, p.name FROM appointments a JOIN patients p ON a.patient_id = p.id
+        WHERE a.appointment_date = ? AND a.status = ? AND a.doctor_name = ?
+          AND (a.appointment_date, a.appointment_time, a.id) < (?, ?, ?)
+        ORDER BY a.appointment_date DESC, a.appointment_time DESC, a.id DESC LIMIT ?""",
+     (TODAY, "Scheduled", "Dr. A", TODAY, "12:00", 1000, 26)),
+    ("3_Medical_Records latest visits of a page of patients",
+     """SELECT patient_id, id, visit_date, diagnosis
+        FROM (SELECT mr.*,
+                     ROW_NUMBER() OVER (PARTITION BY patient_id ORDER BY visit_date DESC, id DESC) AS visit_number
+              FROM medical_records mr WHERE patient_id IN (?, ?, ?))
+        WHERE visit_number <= ? ORDER BY patient_id, visit_number""",
+     (1, 2, 3, 6)),
+    ("3_Medical_Records older visits of one patient",
+     """SELECT id, visit_date, diagnosis FROM medical_records
+        WHERE patient_id = ? AND (visit_date, id) < (?, ?)
+        ORDER BY visit_date DESC, id DESC LIMIT ?""",
+     (1, TODAY, 1000, 6)),
+    ("3_Medical_Records clinical search",
+     """SELECT mr.id, p.name, snippet(medical_records_fts, -1, '**', '**', ' … ', 16)
+        FROM medical_records_fts f CROSS JOIN medical_records mr ON mr.id = f.rowid
+                 LEFT JOIN patients p ON p.id = mr.patient_id
+        WHERE medical_records_fts MATCH ? AND mr.visit_date >= ? AND mr.visit_date <= ? AND mr.doctor_name = ?
+        ORDER BY f.rowid DESC LIMIT ?""",
+     ('"amoxicillin"*', MONTH_START, TODAY, "Dr. A", 21)),
+    ("3_Medical_Records search doctors",
+     "SELECT DISTINCT doctor_name FROM medical_records WHERE doctor_name IS NOT NULL ORDER BY doctor_name",
+     ()),
+    ("4_Bills list page",
+     """SELECT b.id, p.name FROM bills b JOIN patients p ON b.patient_id = p.id
+        WHERE b.bill_date BETWEEN ? AND ? AND b.payment_status = ? AND (b.bill_date, b.id) < (?, ?)
+        ORDER BY b.bill_date DESC, b.id DESC LIMIT ?""",
+     (MONTH_START, TODAY, "Paid", TODAY, 1000, 26)),
+    ("4_Bills list totals",
+     """SELECT COALESCE(SUM(b.amount), 0), COALESCE(SUM(b.paid_amount), 0)
+        FROM bills b JOIN patients p ON b.patient_id = p.id
+        WHERE b.bill_date BETWEEN ? AND ? AND b.payment_status = ?""",
+     (MONTH_START, TODAY, "Paid")),
+    ("4_Bills completed appointments",
+     """SELECT a.id, p.name, a.appointment_date FROM appointments a JOIN patients p ON a.patient_id = p.id
+        WHERE a.status = 'Completed' ORDER BY a.appointment_date DESC""",
+     ()),
+    ("4_Bills unpaid for payment",
+     """SELECT b.id, p.name FROM bills b JOIN patients p ON b.patient_id = p.id
+        WHERE b.payment_status != 'Paid' ORDER BY b.bill_date""",
+     ()),
+    ("5_Reports period totals",
+     """SELECT (SELECT CAST(COALESCE(SUM(patient_count), 0) AS INTEGER) FROM daily_new_patients
+                WHERE day BETWEEN ? AND ?),
+               (SELECT CAST(COALESCE(SUM(appointment_count), 0) AS INTEGER) FROM daily_appointments_by_status
+                WHERE day BETWEEN ? AND ?),
+               (SELECT COALESCE(SUM(revenue), 0) FROM daily_revenue WHERE day BETWEEN ? AND ?)""",
+     (MONTH_START, TODAY) * 3),
+    ("5_Reports revenue trend",
+     """SELECT day as Date, revenue as Revenue FROM daily_revenue
+        WHERE day BETWEEN ? AND ? AND bill_count > 0 ORDER BY day""",
+     (MONTH_START, TODAY)),
+    ("5_Reports appointment distribution",
+     """SELECT NULLIF(status, '') as Status, SUM(appointment_count) as Count FROM daily_appointments_by_status
+        WHERE day BETWEEN ? AND ? GROUP BY status HAVING SUM(appointment_count) > 0""",
+     (MONTH_START, TODAY)),
+    ("5_Reports report job cache lookup",
+     """SELECT id, status, artifact_path FROM report_jobs
+        WHERE cache_key = ?
+          AND (status IN ('queued', 'running') OR (status = 'done' AND finished_at >= datetime('now', ?)))
+        ORDER BY id DESC LIMIT 1""",
+     ("0" * 64, "-900 seconds")),
+    ("5_Reports report jobs of a user",
+     "SELECT id, status, progress FROM report_jobs WHERE requested_by IS ? ORDER BY id DESC LIMIT ?",
+     ("admin", 10)),
+]
+
+# Export queries stream whole date ranges and must not need a sort
+QUERIES += [(f"5_Reports export {name}", sql, (MONTH_START, TODAY)) for name, sql in EXPORT_QUERIES.items()]
+
+
+def explain(conn, sql, params):
+    """Plan rows as a list of detail strings"""
+    return [row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + sql, params)]
+
+
+def is_full_scan(detail, materialized=()):
+    """True for a table scan that uses no index
+
+    Scans of subqueries the plan has already materialized are not counted.
+    """
+    if not detail.startswith("SCAN") or "INDEX" in detail or detail == "SCAN CONSTANT ROW":
+        return False
+    return detail.split()[1] not in materialized
+
+
+def materialized_names(plan):
+    """Subqueries and CTEs the plan builds before scanning them"""
+    return {detail.split()[1] for detail in plan if detail.startswith(("MATERIALIZE", "CO-ROUTINE"))}
+
+
+def main():
+    if len(sys.argv) > 1:
+        db_name = sys.argv[1]
+    else:
+        os.chdir(tempfile.mkdtemp(prefix="clinic_plans_"))
+        from database import db
+        db_name = db.db_name
+
+    conn = sqlite3.connect(db_name)
+    scans = 0
+    for source, sql, params in QUERIES:
+        plan = explain(conn, sql, params)
+        materialized = materialized_names(plan)
+        flagged = any(is_full_scan(detail, materialized) for detail in plan)
+        scans += flagged
+        print(f"{'!!' if flagged else 'ok'} {source}")
+        for detail in plan:
+            print(f"     {detail}")
+    conn.close()
+
+    print(f"\n{len(QUERIES) - scans}/{len(QUERIES)} queries served by an index")
+
+
+if __name__ == "__main__":
+    main()
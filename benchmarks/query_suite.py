@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+"""
+Time the app's queries at several data sizes and write the results as JSON.
+
+For every scale a database is generated with generate_data.py (same seed,
+so runs are comparable), then:
+
+- every query in the query_plans.py catalog is timed directly, and
+- app.py and every page are rerun with Streamlit's AppTest while the
+  query profiler records each statement they issue, with its callers.
+
+Each scale runs in its own process and temporary directory; clinic.db is
+never touched.  Pass --compare with an earlier result file to print the
+change per query.
+
+Usage:
+    python benchmarks/query_suite.py [--scales small,medium] [--runs 5] [--output results.json]
+    python benchmarks/query_suite.py --scales small --compare baseline.json
+"""
+
+import argparse
+import json
+import logging
+import os
+import platform
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BENCHMARKS = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BENCHMARKS)
+
+from generate_data import SCALES, generate
+
+TABLES = ['patients', 'appointments', 'medical_records', 'bills', 'users']
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=ROOT, capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def time_catalog(db, runs):
+    """Median, p95 and max ms of each query_plans.QUERIES entry, after one warm-up run"""
+    from concurrency import percentile
+    from query_plans import QUERIES
+
+    results = []
+    for source, sql, params in QUERIES:
+        rows = len(db.fetch_all(sql, params))
+        samples = []
+        for _ in range(runs):
+            start = time.perf_counter()
+            db.fetch_all(sql, params)
+            samples.append((time.perf_counter() - start) * 1000)
+        results.append({'source': source, 'median_ms': statistics.median(samples),
+                        'p95_ms': percentile(samples, 95), 'max_ms': max(samples), 'rows': rows})
+    return results
+
+
+def time_pages(db, runs, timeout):
+    """Rerun times of app.py and each page, and the profiler's view of every query they issued"""
+    from streamlit.testing.v1 import AppTest
+    from concurrency import percentile
+    from page_rerun import page_files
+
+    query = "SELECT * FROM users WHERE username = 'admin'"
+    user = dict(zip(db.column_names(query), db.fetch_one(query)))
+    db.profiler.reset()
+
+    pages = []
+    for page in page_files():
+        at = AppTest.from_file(os.path.join(ROOT, page), default_timeout=timeout)
+        at.session_state.logged_in = True
+        at.session_state.user = user
+        samples = []
+        try:
+            at.run()
+            calls_before = sum(stats['calls'] for stats in db.profiler.top(n=None))
+            for _ in range(runs):
+                start = time.perf_counter()
+                at.run()
+                samples.append((time.perf_counter() - start) * 1000)
+        except RuntimeError as e:
+            # AppTest gives up on a rerun slower than the timeout; the queries it ran are still recorded
+            print(f"{page}: {e}", file=sys.stderr)
+            pages.append({'page': page, 'median_ms': None, 'p95_ms': None, 'queries_per_run': None,
+                          'errors': [str(e)]})
+            continue
+        calls = sum(stats['calls'] for stats in db.profiler.top(n=None)) - calls_before
+        pages.append({'page': page, 'median_ms': statistics.median(samples), 'p95_ms': percentile(samples, 95),
+                      'queries_per_run': calls / runs, 'errors': [error.value for error in at.exception]})
+
+    queries = [{key: stats[key] for key in ('query', 'callers', 'calls', 'avg_ms', 'p95_ms', 'max_ms', 'rows')}
+               for stats in db.profiler.top(n=None, by='total_ms')]
+    return pages, queries
+
+
+def measure(scale, seed, runs, timeout):
+    """Generate one scale in the working directory and time it; runs in a child process"""
+    logging.disable(logging.CRITICAL)
+    db_name = os.path.abspath("clinic.db")
+    started = time.perf_counter()
+    generate(db_name, SCALES[scale], seed=seed, log=lambda message: print(message, file=sys.stderr))
+    generate_seconds = time.perf_counter() - started
+
+    sys.path.insert(0, ROOT)
+    from database import db
+
+    pages, queries = time_pages(db, runs, timeout)
+    return {
+        'scale': scale,
+        'counts': {table: db.scalar(f"SELECT COUNT(*) FROM {table}", default=0) for table in TABLES},
+        'generate_seconds': generate_seconds,
+        'catalog': time_catalog(db, runs),
+        'pages': pages,
+        'queries': queries,
+    }
+
+
+def run_scale(scale, args):
+    """Measure `scale` in a fresh process and temporary directory"""
+    workdir = tempfile.mkdtemp(prefix=f"clinic_suite_{scale}_")
+    result_path = os.path.join(workdir, "result.json")
+    subprocess.run([sys.executable, os.path.abspath(__file__), "--measure", scale, "--seed", str(args.seed),
+                    "--runs", str(args.runs), "--page-timeout", str(args.page_timeout), "--output", result_path],
+                   cwd=workdir, check=True)
+    with open(result_path, encoding='utf-8') as file:
+        return json.load(file)
+
+
+def change(old, new):
+    return f"{(new - old) / old * 100:+.0f}%" if old else "n/a"
+
+
+def compare(baseline, results):
+    """Print the change of every catalog query and page between two result files"""
+    old_scales = {scale['scale']: scale for scale in baseline['scales']}
+    for scale in results['scales']:
+        old = old_scales.get(scale['scale'])
+        if old is None:
+            continue
+        print(f"\n== {scale['scale']} vs baseline {baseline.get('git_commit') or ''}")
+        old_catalog = {entry['source']: entry for entry in old['catalog']}
+        for entry in scale['catalog']:
+            if entry['source'] in old_catalog:
+                before = old_catalog[entry['source']]['median_ms']
+                print(f"{entry['source']:<60} {before:>9.2f} -> {entry['median_ms']:>9.2f} ms "
+                      f"{change(before, entry['median_ms']):>6}")
+        old_pages = {entry['page']: entry for entry in old['pages']}
+        for entry in scale['pages']:
+            if entry['page'] in old_pages and None not in (entry['median_ms'], old_pages[entry['page']]['median_ms']):
+                before = old_pages[entry['page']]['median_ms']
+                print(f"{entry['page']:<60} {before:>9.1f} -> {entry['median_ms']:>9.1f} ms "
+                      f"{change(before, entry['median_ms']):>6}")
+
+
+def summary(scale):
+    print(f"\n== {scale['scale']}: " + ", ".join(f"{table} {count:,}" for table, count in scale['counts'].items()))
+    print(f"{'page':<36} {'median ms':>10} {'p95 ms':>10} {'queries':>8}")
+    for page in scale['pages']:
+        if page['median_ms'] is None:
+            print(f"{page['page']:<36} {'; '.join(page['errors'])}")
+            continue
+        print(f"{page['page']:<36} {page['median_ms']:>10.1f} {page['p95_ms']:>10.1f} {page['queries_per_run']:>8.1f}")
+    print("\nslowest catalog queries")
+    for entry in sorted(scale['catalog'], key=lambda entry: entry['median_ms'], reverse=True)[:5]:
+        print(f"{entry['source']:<60} {entry['median_ms']:>9.2f} ms {entry['rows']:>8,} rows")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scales", default="small,medium", help=f"comma-separated, from {', '.join(SCALES)}")
+    parser.add_argument("--runs", type=int, default=5, help="timed runs per query and page")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--page-timeout", type=float, default=300, help="seconds before a page rerun is abandoned")
+    parser.add_argument("--output", default="query_suite.json")
+    parser.add_argument("--compare", help="earlier result file to compare with")
+    parser.add_argument("--measure", choices=list(SCALES), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure:
+        with open(args.output, 'w', encoding='utf-8') as file:
+            json.dump(measure(args.measure, args.seed, args.runs, args.page_timeout), file, indent=2, default=str)
+        return 0
+
+    scales = [scale.strip() for scale in args.scales.split(",") if scale.strip()]
+    unknown = [scale for scale in scales if scale not in SCALES]
+    if unknown:
+        parser.error(f"unknown scales: {', '.join(unknown)}")
+
+    results = {
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'git_commit': git_commit(),
+        'python': platform.python_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'platform': platform.platform(),
+        'seed': args.seed,
+        'runs': args.runs,
+        'scales': [],
+    }
+    for scale in scales:
+        results['scales'].append(run_scale(scale, args))
+        summary(results['scales'][-1])
+
+    with open(args.output, 'w', encoding='utf-8') as file:
+        json.dump(results, file, indent=2)
+    print(f"\nResults written to {args.output}")
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as file:
+            compare(json.load(file), results)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
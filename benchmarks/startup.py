@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+Report the cold-start time of the app, so it can be kept fast.
+
+Every measurement runs in a fresh Python process against a generated
+database in a temporary directory (clinic.db is never touched):
+
+- run.py's dependency check,
+- importing database on a new database (schema created and migrated) and
+  on one already at the latest schema version (schema init skipped),
+- the first rerun of app.py and of every page, imports included, with the
+  optional heavy modules (plotly, openpyxl, duckdb, pyarrow) each one
+  loaded.
+
+Each figure is the median of --runs processes.
+
+Usage:
+    python benchmarks/startup.py [--runs 3] [--output startup.json]
+"""
+
+import argparse
+import json
+import logging
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+HEAVY_MODULES = ['plotly', 'openpyxl', 'duckdb', 'pyarrow']
+
+
+def measure_dependencies():
+    started = time.perf_counter()
+    import run
+    run.check_dependencies()
+    return {'seconds': time.perf_counter() - started}
+
+
+def measure_database():
+    started = time.perf_counter()
+    from database import db
+    return {'seconds': time.perf_counter() - started, 'init_seconds': db.init_seconds,
+            'schema_was_current': db.schema_was_current}
+
+
+def measure_page(page):
+    logging.disable(logging.CRITICAL)
+    started = time.perf_counter()
+    from streamlit.testing.v1 import AppTest
+    from database import db
+
+    query = "SELECT * FROM users WHERE username = 'admin'"
+    user = dict(zip(db.column_names(query), db.fetch_one(query)))
+    imported = time.perf_counter()
+    at = AppTest.from_file(os.path.join(ROOT, page), default_timeout=300)
+    at.session_state.logged_in = True
+    at.session_state.user = user
+    at.run()
+    return {'seconds': time.perf_counter() - started, 'import_seconds': imported - started,
+            'rerun_seconds': time.perf_counter() - imported,
+            'heavy_modules': [name for name in HEAVY_MODULES if name in sys.modules],
+            'errors': [str(exception.value) for exception in at.exception]}
+
+
+def measure(step, page=None):
+    """Run one measurement in the working directory; the child process side"""
+    sys.path.insert(0, ROOT)
+    if step == 'dependencies':
+        # Keep the check's own output out of the report
+        with open(os.devnull, 'w') as devnull:
+            stdout, sys.stdout = sys.stdout, devnull
+            try:
+                return measure_dependencies()
+            finally:
+                sys.stdout = stdout
+    if step == 'database':
+        return measure_database()
+    return measure_page(page)
+
+
+def run_step(workdir, step, page=None):
+    command = [sys.executable, os.path.abspath(__file__), "--measure", step]
+    if page:
+        command += ["--page", page]
+    result = subprocess.run(command, cwd=workdir, capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def median_run(runs, workdir, step, page=None, reset=None):
+    """Median `seconds` of `runs` fresh processes; `reset` prepares the directory before each one"""
+    results = []
+    for _ in range(runs):
+        if reset:
+            reset()
+        results.append(run_step(workdir, step, page))
+    result = dict(results[-1])
+    for key in ('seconds', 'init_seconds', 'import_seconds', 'rerun_seconds'):
+        if key in result:
+            result[key] = statistics.median(result[key] for result in results)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=3, help="processes per measurement")
+    parser.add_argument("--output", help="write the results as JSON")
+    parser.add_argument("--measure", choices=['dependencies', 'database', 'page'], help=argparse.SUPPRESS)
+    parser.add_argument("--page", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure:
+        print(json.dumps(measure(args.measure, args.page)))
+        return 0
+
+    from generate_data import SCALES, generate
+    from page_rerun import page_files
+
+    output = os.path.abspath(args.output) if args.output else None
+    workdir = tempfile.mkdtemp(prefix="clinic_startup_")
+    db_name = os.path.join(workdir, "clinic.db")
+
+    def remove_database():
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(db_name + suffix):
+                os.remove(db_name + suffix)
+
+    results = {'dependencies': median_run(args.runs, workdir, 'dependencies')}
+    results['new_database'] = median_run(args.runs, workdir, 'database', reset=remove_database)
+    results['current_database'] = median_run(args.runs, workdir, 'database')
+
+    generate(db_name, SCALES['tiny'], log=lambda message: None)
+    results['pages'] = {page: median_run(args.runs, workdir, 'page', page) for page in page_files()}
+
+    print(f"\n{'step':<36} {'total ms':>9} {'detail'}")
+    print(f"{'run.py dependency check':<36} {results['dependencies']['seconds'] * 1000:>9.0f}")
+    for key, label in (('new_database', "import database (new file)"),
+                       ('current_database', "import database (current schema)")):
+        result = results[key]
+        print(f"{label:<36} {result['seconds'] * 1000:>9.0f} schema init {result['init_seconds'] * 1000:.1f} ms"
+              f"{' (skipped)' if result['schema_was_current'] else ''}")
+    for page, result in results['pages'].items():
+        print(f"{'first rerun ' + page:<36} {result['seconds'] * 1000:>9.0f} "
+              f"imports {result['import_seconds'] * 1000:.0f} ms, rerun {result['rerun_seconds'] * 1000:.0f} ms, "
+              f"loads {', '.join(result['heavy_modules']) or '-'}"
+              f"{'  ERROR ' + '; '.join(result['errors']) if result['errors'] else ''}")
+
+    if output:
+        with open(output, 'w', encoding='utf-8') as file:
+            json.dump(results, file, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
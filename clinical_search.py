@@ -0,0 +1,128 @@
+"""
+Full-text search over medical record notes.
+
+medical_records_fts indexes diagnosis, symptoms, prescription, tests and
+notes (migration 8) and is kept in sync by triggers.  search() adds date
+range and doctor filters, latest-first keyset paging or relevance paging,
+and highlighted snippets for the rows of the current page.
+"""
+
+import re
+
+# Migration 8
+CREATE_STATEMENTS = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS medical_records_fts
+       USING fts5(diagnosis, symptoms, prescription, tests, notes,
+                  content='medical_records', content_rowid='id',
+                  tokenize='porter unicode61 remove_diacritics 2', prefix='2 3')""",
+    "INSERT INTO medical_records_fts (medical_records_fts) VALUES ('rebuild')",
+    """CREATE TRIGGER IF NOT EXISTS trg_medical_records_fts_insert AFTER INSERT ON medical_records
+       BEGIN
+           INSERT INTO medical_records_fts (rowid, diagnosis, symptoms, prescription, tests, notes)
+           VALUES (NEW.id, NEW.diagnosis, NEW.symptoms, NEW.prescription, NEW.tests, NEW.notes);
+       END""",
+    """CREATE TRIGGER IF NOT EXISTS trg_medical_records_fts_delete AFTER DELETE ON medical_records
+       BEGIN
+           INSERT INTO medical_records_fts (medical_records_fts, rowid, diagnosis, symptoms, prescription, tests, notes)
+           VALUES ('delete', OLD.id, OLD.diagnosis, OLD.symptoms, OLD.prescription, OLD.tests, OLD.notes);
+       END""",
+    """CREATE TRIGGER IF NOT EXISTS trg_medical_records_fts_update
+       AFTER UPDATE OF diagnosis, symptoms, prescription, tests, notes ON medical_records
+       BEGIN
+           INSERT INTO medical_records_fts (medical_records_fts, rowid, diagnosis, symptoms, prescription, tests, notes)
+           VALUES ('delete', OLD.id, OLD.diagnosis, OLD.symptoms, OLD.prescription, OLD.tests, OLD.notes);
+           INSERT INTO medical_records_fts (rowid, diagnosis, symptoms, prescription, tests, notes)
+           VALUES (NEW.id, NEW.diagnosis, NEW.symptoms, NEW.prescription, NEW.tests, NEW.notes);
+       END""",
+    # Lists the doctors for the search filter from the index alone
+    """CREATE INDEX IF NOT EXISTS idx_medical_records_doctor_visit
+       ON medical_records (doctor_name, visit_date)""",
+]
+
+# Relevance ranking covers this many of the latest matches
+RELEVANCE_CANDIDATES = 1000
+
+SNIPPET_TOKENS = 16
+
+_TERMS = re.compile(r'"([^"]*)"|(\S+)')
+_WORD = re.compile(r'\w', re.UNICODE)
+
+
+def match_expression(text):
+    """FTS5 query for user input: "quoted phrases" and word prefixes, all required"""
+    terms = []
+    for phrase, word in _TERMS.findall(text):
+        term = phrase or word
+        if not _WORD.search(term):
+            continue
+        quoted = '"' + term.replace('"', '""') + '"'
+        terms.append(quoted if phrase else quoted + '*')
+    return ' '.join(terms)
+
+
+def search(db, text, start_date=None, end_date=None, doctor=None, order='latest',
+           limit=20, after=None, offset=0):
+    """One page of records matching `text`.
+
+    Rows are (id, patient_id, patient_name, visit_date, doctor_name, snippet).
+    order='latest' lists matches by visit date, newest first; pass the
+    (visit_date, id) of the last row as `after` for the next page.
+    order='relevance' ranks the latest RELEVANCE_CANDIDATES matches by bm25
+    and pages with `offset`.
+    """
+    match = match_expression(text)
+    if not match:
+        return []
+
+    filters, params = ["medical_records_fts MATCH ?"], [match]
+    if start_date:
+        filters.append("mr.visit_date >= ?")
+        params.append(start_date)
+    if end_date:
+        filters.append("mr.visit_date <= ?")
+        params.append(end_date)
+    if doctor:
+        filters.append("mr.doctor_name = ?")
+        params.append(doctor)
+
+    source = """
+        FROM medical_records_fts f
+                 CROSS JOIN medical_records mr ON mr.id = f.rowid
+                 LEFT JOIN patients p ON p.id = mr.patient_id
+    """
+
+    if order == 'relevance':
+        # Only rank matches from the oldest candidate onwards
+        oldest = db.scalar(f"""
+            SELECT f.rowid {source}
+            WHERE {' AND '.join(filters)}
+            ORDER BY f.rowid DESC
+            LIMIT 1 OFFSET ?
+        """, params + [RELEVANCE_CANDIDATES - 1], 0)
+        filters.append("f.rowid >= ?")
+        params += [oldest, limit, offset]
+        order_by = "f.rank LIMIT ? OFFSET ?"
+    else:
+        # Sorting by visit date reads every match, so snippets are built
+        # afterwards for the rows of this page only
+        if after:
+            filters.append("(mr.visit_date, mr.id) < (?, ?)")
+            params += list(after)
+        page = f"""
+            SELECT mr.id {source}
+            WHERE {' AND '.join(filters)}
+            ORDER BY mr.visit_date DESC, mr.id DESC
+            LIMIT ?
+        """
+        filters = ["medical_records_fts MATCH ?", f"f.rowid IN ({page})"]
+        params = [match] + params + [limit]
+        order_by = "mr.visit_date DESC, mr.id DESC"
+
+    # snippet() only runs for the rows of this page
+    return db.fetch_all(f"""
+        SELECT mr.id, mr.patient_id, p.name, mr.visit_date, mr.doctor_name,
+               snippet(medical_records_fts, -1, '**', '**', ' … ', {SNIPPET_TOKENS})
+        {source}
+        WHERE {' AND '.join(filters)}
+        ORDER BY {order_by}
+    """, params)
@@ -0,0 +1,116 @@
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from queue import Queue, Empty, Full
+
+
+class ConnectionPool:
+    """Thread-aware pool of reusable SQLite connections.
+
+    Each thread borrows one connection at a time; nested borrows on the
+    same thread get the connection that thread already holds.  Up to
+    ``size`` idle connections are kept for reuse, extra connections opened
+    under load are closed when they are returned.
+    """
+
+    def __init__(self, db_name, size=5, timeout=30.0, cached_statements=256, health_check_interval=30.0,
+                 on_connect=None):
+        self.db_name = db_name
+        self.size = size
+        self.timeout = timeout
+        self.cached_statements = cached_statements
+        self.health_check_interval = health_check_interval
+        self.on_connect = on_connect
+        self._idle = Queue(maxsize=size)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._stats = {'created': 0, 'reused': 0, 'discarded': 0}
+
+    def _connect(self):
+        """Open a new connection"""
+        conn = sqlite3.connect(
+            self.db_name,
+            timeout=self.timeout,
+            check_same_thread=False,
+            cached_statements=self.cached_statements
+        )
+        if self.on_connect is not None:
+            self.on_connect(conn)
+        with self._lock:
+            self._stats['created'] += 1
+        return conn
+
+    def _is_healthy(self, conn, idle_since):
+        """Ping connections that have been idle for a while"""
+        if time.monotonic() - idle_since < self.health_check_interval:
+            return True
+        try:
+            conn.execute("SELECT 1").fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def _discard(self, conn):
+        """Close a connection that will not be reused"""
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+        with self._lock:
+            self._stats['discarded'] += 1
+
+    def acquire(self):
+        """Take an idle connection from the pool or open a new one"""
+        while True:
+            try:
+                conn, idle_since = self._idle.get_nowait()
+            except Empty:
+                return self._connect()
+            if self._is_healthy(conn, idle_since):
+                with self._lock:
+                    self._stats['reused'] += 1
+                return conn
+            self._discard(conn)
+
+    def release(self, conn):
+        """Return a connection to the pool"""
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+            self._idle.put_nowait((conn, time.monotonic()))
+        except (sqlite3.Error, Full):
+            self._discard(conn)
+
+    @contextmanager
+    def connection(self):
+        """Borrow a connection for the current thread"""
+        held = getattr(self._local, 'conn', None)
+        if held is not None:
+            yield held
+            return
+
+        conn = self.acquire()
+        self._local.conn = conn
+        try:
+            yield conn
+        finally:
+            self._local.conn = None
+            self.release(conn)
+
+    def close_all(self):
+        """Close every idle connection"""
+        while True:
+            try:
+                conn, _ = self._idle.get_nowait()
+            except Empty:
+                break
+            self._discard(conn)
+
+    def stats(self):
+        """Pool usage counters"""
+        with self._lock:
+            stats = dict(self._stats)
+        stats['idle'] = self._idle.qsize()
+        stats['size'] = self.size
+        return stats
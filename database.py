@@ -1,21 +1,210 @@
 import sqlite3
 import hashlib
 import os
+import threading
+import time
+from contextlib import contextmanager
 from datetime import datetime, date
+import numpy as np
 import pandas as pd
+from pandas.api.types import union_categoricals
+from connection_pool import ConnectionPool
+from migrations import migrate, current_version, is_current
+from query_cache import QueryCache, is_read_query, trigger_dependencies
+from query_profiler import QueryProfiler, explain
+
+# PRAGMA settings applied to every new connection, selected with the
+# `profile` argument or the CLINIC_DB_PROFILE environment variable
+PERFORMANCE_PROFILES = {
+    # SQLite defaults: rollback journal, writers block readers
+    'default': {},
+    # WAL lets readers continue while a writer commits; NORMAL sync is
+    # safe in WAL mode and only risks the last commits on power loss
+    'concurrent': {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'busy_timeout': 5000,
+        'cache_size': -20000,
+        'mmap_size': 268435456,
+        'temp_store': 'MEMORY',
+    },
+    # WAL with a full fsync on every commit
+    'durable': {
+        'journal_mode': 'WAL',
+        'synchronous': 'FULL',
+        'busy_timeout': 5000,
+        'temp_store': 'MEMORY',
+    },
+}
+
+DEFAULT_PROFILE = 'concurrent'
+
+# Columns returned by search_patients() unless others are requested
+PATIENT_COLUMNS = ['id', 'national_id', 'name', 'phone', 'email', 'date_of_birth',
+                   'gender', 'address', 'emergency_contact', 'blood_type', 'allergies', 'created_at']
+
+# Search words shorter than this cannot use the trigram index
+MIN_TRIGRAM_LENGTH = 3
+
+# Matches ranked by search_patients(), newest first
+SEARCH_CANDIDATES = 500
+
+# Column types used by get_dataframe(dtypes='auto')
+COLUMN_TYPES = {
+    'id': 'integer',
+    'patient_id': 'integer',
+    'appointment_id': 'integer',
+    'is_active': 'integer',
+    'amount': 'float',
+    'paid_amount': 'float',
+    'status': 'category',
+    'type': 'category',
+    'payment_status': 'category',
+    'payment_method': 'category',
+    'gender': 'category',
+    'blood_type': 'category',
+    'role': 'category',
+    'doctor_name': 'category',
+    'appointment_date': 'datetime',
+    'visit_date': 'datetime',
+    'bill_date': 'datetime',
+    'date_of_birth': 'datetime',
+    'created_at': 'datetime',
+}
+
+
+def _typed_column(values, kind):
+    """Convert a chunk of raw SQLite values to a typed pandas Series"""
+    if kind == 'category':
+        return pd.Series(pd.Categorical(values))
+    if kind == 'datetime':
+        try:
+            return pd.Series(np.array(values, dtype='datetime64[s]')).astype('datetime64[ns]')
+        except ValueError:
+            return pd.to_datetime(pd.Series(values, dtype=object), errors='coerce')
+    if kind == 'integer':
+        # Columns with NULLs or unparseable values stay float, with NaN
+        return pd.to_numeric(pd.Series(values, dtype=object), errors='coerce', downcast='integer')
+    if kind == 'float':
+        # Kept as float64: float32 loses cents on money columns
+        return pd.to_numeric(pd.Series(values, dtype=object), errors='coerce').astype('float64')
+    if kind is None:
+        return pd.Series(values)
+    return pd.Series(values, dtype=kind)
+
+
+def _concat_column(parts, kind):
+    """Join typed chunks of one column"""
+    if len(parts) == 1:
+        return parts[0]
+    if kind == 'category':
+        return pd.Series(union_categoricals([part.array for part in parts]))
+    return pd.concat(parts, ignore_index=True)
+
+
+def _arrow_column(values, kind):
+    """Convert a chunk of raw SQLite values to a typed Arrow array"""
+    import pyarrow as pa
+
+    try:
+        array = pa.array(values)
+        if kind == 'category':
+            return array.dictionary_encode()
+        if kind == 'datetime':
+            return array.cast(pa.timestamp('s'))
+        if kind == 'integer':
+            return array.cast(pa.int64())
+        if kind == 'float':
+            return array.cast(pa.float64())
+        if kind is not None:
+            return array.cast(pa.from_numpy_dtype(kind))
+        return array
+    except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError):
+        if kind not in ('datetime', 'integer', 'float'):
+            raise
+    # Values that do not parse become nulls, as on the pandas path
+    series = pd.Series(values, dtype=object)
+    if kind == 'datetime':
+        return pa.Array.from_pandas(pd.to_datetime(series, errors='coerce')).cast(pa.timestamp('s'), safe=False)
+    target = pa.int64() if kind == 'integer' else pa.float64()
+    return pa.Array.from_pandas(pd.to_numeric(series, errors='coerce')).cast(target, safe=False)
+
 
 class Database:
-    def __init__(self, db_name='clinic.db'):
+    def __init__(self, db_name='clinic.db', pool_size=5, profile=None, cache_size=None, cache_ttl=30.0):
         self.db_name = db_name
+        self.profile = profile or os.environ.get('CLINIC_DB_PROFILE', DEFAULT_PROFILE)
+        if self.profile not in PERFORMANCE_PROFILES:
+            raise ValueError(f"Unknown database profile: {self.profile}")
+        self.pool = ConnectionPool(db_name, size=pool_size, on_connect=self.apply_profile)
+        self._local = threading.local()
+        self.profiler = QueryProfiler(slow_query_ms=float(os.environ.get('CLINIC_SLOW_QUERY_MS', 100)))
+
         self.init_database()
 
+        # Result cache is opt-in: pass cache_size or set CLINIC_QUERY_CACHE_SIZE
+        if cache_size is None:
+            cache_size = int(os.environ.get('CLINIC_QUERY_CACHE_SIZE', 0))
+        self.cache = None
+        if cache_size > 0:
+            self.enable_cache(cache_size, cache_ttl)
+
+    def apply_profile(self, conn):
+        """Apply the PRAGMA settings of the selected profile"""
+        for pragma, value in PERFORMANCE_PROFILES[self.profile].items():
+            conn.execute(f"PRAGMA {pragma} = {value}")
+
     def get_connection(self):
         """Create new database connection"""
-        return sqlite3.connect(self.db_name)
+        conn = sqlite3.connect(self.db_name)
+        self.apply_profile(conn)
+        return conn
+
+    def connection(self):
+        """Borrow a pooled connection (use as a context manager)"""
+        return self.pool.connection()
 
     def init_database(self):
-        """Initialize database and tables"""
-        conn = self.get_connection()
+        """Initialize database and tables; a database already at the latest schema version is left alone"""
+        started = time.perf_counter()
+        with self.connection() as conn:
+            self.schema_was_current = is_current(conn)
+            if not self.schema_was_current:
+                self._create_schema(conn)
+                migrate(conn)
+        self.init_seconds = time.perf_counter() - started
+
+    def enable_cache(self, max_entries=256, ttl=30.0):
+        """Turn on the SELECT result cache"""
+        cache = QueryCache(max_entries=max_entries, ttl=ttl)
+        with self.connection() as conn:
+            cache.set_dependencies(trigger_dependencies(conn))
+        self.cache = cache
+
+    def disable_cache(self):
+        """Turn off the SELECT result cache"""
+        self.cache = None
+
+    def cache_stats(self):
+        """Result cache hit/miss counters (None when disabled)"""
+        return self.cache.stats() if self.cache is not None else None
+
+    def query_stats(self, n=20, by='total_ms'):
+        """Top-N statements recorded by the profiler, with their query plans"""
+        missing = self.profiler.missing_plans()
+        if missing:
+            with self.connection() as conn:
+                for query, params in missing:
+                    self.profiler.set_plan(query, explain(conn, query, params))
+        return self.profiler.top(n, by)
+
+    def schema_version(self):
+        """Current schema migration version"""
+        with self.connection() as conn:
+            return current_version(conn)
+
+    def _create_schema(self, conn):
+        """Create tables and the default admin user"""
         cursor = conn.cursor()
 
         # Users table
@@ -116,37 +305,239 @@ class Database:
             ''', ('admin', default_password, 'System Administrator', 'admin', 'admin@clinic.com'))
 
         conn.commit()
-        conn.close()
 
-    def execute_query(self, query, params=()):
-        """Execute database query"""
-        conn = self.get_connection()
-        try:
-            cursor = conn.cursor()
-            cursor.execute(query, params)
+    def _in_transaction(self):
+        return getattr(self._local, 'pending_writes', None) is not None
 
-            if query.strip().upper().startswith('SELECT'):
-                result = cursor.fetchall()
-                columns = [description[0] for description in cursor.description]
-                return result, columns
-            else:
+    def _after_write(self, conn, query):
+        """Commit a write, or defer it to the end of the open transaction"""
+        pending = getattr(self._local, 'pending_writes', None)
+        if pending is not None:
+            pending.append(query)
+            return
+        conn.commit()
+        if self.cache is not None:
+            self.cache.invalidate_for_write(query)
+
+    def _run(self, query, params):
+        """Execute one statement: (rows, columns) if it returns rows, else (rowcount, None)"""
+        cache = self.cache if not self._in_transaction() else None
+        if cache is not None and is_read_query(query):
+            cached = cache.get(query, params)
+            if cached is not None:
+                return cached
+
+        with self.connection() as conn:
+            start = time.perf_counter()
+            cursor = conn.execute(query, params)
+            if cursor.description is not None:
+                result = cursor.fetchall(), [description[0] for description in cursor.description]
+                self.profiler.record(query, params, time.perf_counter() - start, len(result[0]), conn)
+                if cache is not None and is_read_query(query):
+                    cache.put(query, params, result)
+                return result
+            self._after_write(conn, query)
+            self.profiler.record(query, params, time.perf_counter() - start, cursor.rowcount, conn)
+            return cursor.rowcount, None
+
+    def fetch_all(self, query, params=()):
+        """All rows of a query as a list of tuples"""
+        rows, columns = self._run(query, params)
+        return rows if columns is not None else []
+
+    def fetch_one(self, query, params=()):
+        """First row of a query, or None"""
+        rows = self.fetch_all(query, params)
+        return rows[0] if rows else None
+
+    def scalar(self, query, params=(), default=None):
+        """First column of the first row, or `default`"""
+        row = self.fetch_one(query, params)
+        return row[0] if row is not None and row[0] is not None else default
+
+    def column_names(self, query, params=()):
+        """Column names of a query's result, without reading any rows"""
+        return self._run(f"SELECT * FROM ({query}) LIMIT 0", params)[1]
+
+    def execute(self, query, params=()):
+        """Run a write statement and return the number of affected rows"""
+        with self.connection() as conn:
+            start = time.perf_counter()
+            cursor = conn.execute(query, params)
+            self._after_write(conn, query)
+            self.profiler.record(query, params, time.perf_counter() - start, cursor.rowcount, conn)
+            return cursor.rowcount
+
+    def insert(self, query, params=()):
+        """Run an INSERT and return the new row id"""
+        with self.connection() as conn:
+            start = time.perf_counter()
+            cursor = conn.execute(query, params)
+            self._after_write(conn, query)
+            self.profiler.record(query, params, time.perf_counter() - start, cursor.rowcount, conn)
+            return cursor.lastrowid
+
+    def execute_many(self, query, seq_of_params):
+        """Run a write statement once per parameter set, committed once"""
+        with self.connection() as conn:
+            start = time.perf_counter()
+            cursor = conn.executemany(query, seq_of_params)
+            self._after_write(conn, query)
+            self.profiler.record(query, (), time.perf_counter() - start, cursor.rowcount)
+            return cursor.rowcount
+
+    def search_patients(self, term, limit=100, columns=None):
+        """Patients whose name, phone or national ID contains every word of `term`
+
+        Words of three or more characters are looked up in the patients_fts
+        trigram index; shorter words only narrow those matches down.  The
+        newest SEARCH_CANDIDATES matches are ranked: names starting with the
+        search text, then names containing it, then shorter names first.
+        Ranking a bounded window keeps broad terms like "ali" fast.
+        """
+        words = term.split()
+        if not words:
+            return []
+
+        indexed = [word for word in words if len(word) >= MIN_TRIGRAM_LENGTH]
+        conditions, params = [], []
+        if indexed:
+            candidates = "SELECT rowid AS id FROM patients_fts WHERE patients_fts MATCH ?"
+            params.append(' '.join('"' + word.replace('"', '""') + '"' for word in indexed))
+        else:
+            candidates = "SELECT id FROM patients WHERE 1 = 1"
+
+        for word in words:
+            if len(word) < MIN_TRIGRAM_LENGTH:
+                conditions.append(" AND (name LIKE ? OR phone LIKE ? OR national_id LIKE ?)")
+                params.extend([f"%{word}%"] * 3)
+
+        select = ', '.join(f"p.{column}" for column in (columns or PATIENT_COLUMNS))
+        query = f"""
+            SELECT {select}
+            FROM ({candidates}{''.join(conditions)} ORDER BY id DESC LIMIT ?) m
+                     JOIN patients p ON p.id = m.id
+            ORDER BY p.name LIKE ? DESC, p.name LIKE ? DESC, length(p.name), p.id DESC
+            LIMIT ?
+        """
+        text = ' '.join(words)
+        return self.fetch_all(query, params + [SEARCH_CANDIDATES, f"{text}%", f"%{text}%", limit])
+
+    @contextmanager
+    def transaction(self):
+        """Group statements into one transaction, committed once on exit.
+
+        Rolls back if the block raises.  Nested transaction() blocks join
+        the outer one.
+        """
+        if self._in_transaction():
+            yield self
+            return
+
+        with self.connection() as conn:
+            if conn.in_transaction:
                 conn.commit()
-                return cursor.rowcount, None
+            conn.execute("BEGIN")
+            self._local.pending_writes = []
+            try:
+                yield self
+                conn.commit()
+            except BaseException:
+                conn.rollback()
+                raise
+            finally:
+                written = self._local.pending_writes
+                self._local.pending_writes = None
+
+        if self.cache is not None:
+            for query in written:
+                self.cache.invalidate_for_write(query)
+
+    def stream(self, query, params=(), chunk_size=5000, as_dataframe=False):
+        """Yield the result of a query in chunks of `chunk_size` rows.
+
+        Chunks are lists of tuples, or DataFrames when `as_dataframe` is
+        set.  The query runs on its own pooled connection, which is held
+        until the generator is exhausted or closed.
+        """
+        conn = self.pool.acquire()
+        elapsed, total_rows = 0.0, 0
+        try:
+            start = time.perf_counter()
+            cursor = conn.execute(query, params)
+            columns = [description[0] for description in cursor.description]
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                elapsed += time.perf_counter() - start
+                if not rows:
+                    break
+                total_rows += len(rows)
+                yield pd.DataFrame.from_records(rows, columns=columns) if as_dataframe else rows
+                start = time.perf_counter()
+        finally:
+            self.profiler.record(query, params, elapsed, total_rows)
+            self.pool.release(conn)
+
+    def execute_query(self, query, params=()):
+        """Execute database query (compatibility wrapper, errors are returned as (None, message))"""
+        try:
+            return self._run(query, params)
         except Exception as e:
             print(f"Database error: {e}")
             return None, str(e)
-        finally:
-            conn.close()
 
-    def get_dataframe(self, query, params=()):
-        """Get data as DataFrame"""
+    def get_dataframe(self, query, params=(), dtypes=None, arrow=False):
+        """Get data as DataFrame
+
+        `dtypes` maps column names to 'category', 'datetime', 'integer'
+        (downcast), 'float' (float64) or a pandas/numpy dtype; 'auto' uses
+        COLUMN_TYPES.  Values that do not parse become NaT/NaN or nulls.
+        Typed frames are built column by column from the cursor result.
+        With `arrow` a pyarrow.Table is returned instead of a DataFrame.
+        """
         try:
-            data, columns = self.execute_query(query, params)
-            if data and columns:
-                return pd.DataFrame(data, columns=columns)
-            return pd.DataFrame()
+            if dtypes is None and not arrow:
+                data, columns = self.execute_query(query, params)
+                if data and columns:
+                    return pd.DataFrame(data, columns=columns)
+                return pd.DataFrame()
+
+            if dtypes == 'auto':
+                dtypes = COLUMN_TYPES
+            dtypes = dtypes or {}
+            convert = _arrow_column if arrow else _typed_column
+
+            # Convert each fetched chunk column by column straight away, so
+            # only one chunk of row tuples is alive at a time
+            with self.connection() as conn:
+                start = time.perf_counter()
+                cursor = conn.execute(query, params)
+                columns = [description[0] for description in cursor.description]
+                kinds = [dtypes.get(column) for column in columns]
+                parts = [[] for _ in columns]
+                total_rows = 0
+                while True:
+                    chunk = cursor.fetchmany(50000)
+                    if not chunk:
+                        break
+                    total_rows += len(chunk)
+                    for i, chunk_values in enumerate(zip(*chunk)):
+                        parts[i].append(convert(list(chunk_values), kinds[i]))
+                    chunk = None
+                self.profiler.record(query, params, time.perf_counter() - start, total_rows, conn)
+
+            if columns and not parts[0]:
+                parts = [[convert([], kind)] for kind in kinds]
+
+            if arrow:
+                import pyarrow as pa
+                return pa.table({column: pa.chunked_array(parts[i]) for i, column in enumerate(columns)})
+            return pd.DataFrame({column: _concat_column(parts[i], kinds[i]) for i, column in enumerate(columns)})
         except Exception as e:
             print(f"Error in get_dataframe: {e}")
+            if arrow:
+                import pyarrow as pa
+                return pa.table({})
             return pd.DataFrame()
 
 # Global database instance
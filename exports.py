@@ -0,0 +1,352 @@
+"""
+Streaming data exports for the Reports page.
+
+Every dataset is a query over a date range that is read from a cursor a
+chunk at a time and written straight to a temporary file, so exports of
+any size never hold more than CHUNK_ROWS rows in memory.  Excel workbooks
+use openpyxl's write-only mode, which also streams every sheet to disk,
+and PDF reports go through pdf_writer.
+
+The export functions take an optional `progress` callable, called with
+the number of rows written after every chunk.  It may raise to stop the
+export, in which case the partial file is removed.
+"""
+
+import csv
+import gzip
+import io
+import os
+import tempfile
+import threading
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from pdf_writer import PdfWriter, LINE_CHARS
+
+CHUNK_ROWS = 10000
+
+# Excel allows 1,048,576 rows per sheet and the first one holds the column
+# names, longer datasets continue on "Title (2)", "Title (3)", ...
+MAX_SHEET_ROWS = 1048575
+
+# Each query takes the first and last day of the range and follows an index
+# on its date column, so rows stream out without a sort
+DATASETS = {
+    'patients': """
+        SELECT id, national_id, name, phone, email, date_of_birth, gender, address,
+               emergency_contact, blood_type, allergies, created_at
+        FROM patients
+        WHERE created_at >= ? AND created_at < date(?, '+1 day')
+        ORDER BY created_at, id""",
+    'appointments': """
+        SELECT a.id, a.patient_id, p.name AS patient_name, a.doctor_name, a.appointment_date,
+               a.appointment_time, a.status, a.type, a.notes, a.created_at
+        FROM appointments a
+                 LEFT JOIN patients p ON p.id = a.patient_id
+        WHERE a.appointment_date BETWEEN ? AND ?
+        ORDER BY a.appointment_date""",
+    'bills': """
+        SELECT b.id, b.patient_id, p.name AS patient_name, b.appointment_id, b.amount, b.paid_amount,
+               b.amount - b.paid_amount AS amount_due, b.payment_status, b.payment_method, b.services,
+               b.bill_date, b.created_at
+        FROM bills b
+                 LEFT JOIN patients p ON p.id = b.patient_id
+        WHERE b.bill_date BETWEEN ? AND ?
+        ORDER BY b.bill_date""",
+    'medical_records': """
+        SELECT mr.id, mr.patient_id, p.name AS patient_name, mr.visit_date, mr.doctor_name, mr.diagnosis,
+               mr.symptoms, mr.prescription, mr.tests, mr.notes, mr.created_at
+        FROM medical_records mr
+                 LEFT JOIN patients p ON p.id = mr.patient_id
+        WHERE mr.visit_date BETWEEN ? AND ?
+        ORDER BY mr.visit_date, mr.id""",
+}
+
+# Row counts of the datasets, read from the date indexes alone
+COUNT_QUERIES = {
+    'patients': "SELECT COUNT(*) FROM patients WHERE created_at >= ? AND created_at < date(?, '+1 day')",
+    'appointments': "SELECT COUNT(*) FROM appointments WHERE appointment_date BETWEEN ? AND ?",
+    'bills': "SELECT COUNT(*) FROM bills WHERE bill_date BETWEEN ? AND ?",
+    'medical_records': "SELECT COUNT(*) FROM medical_records WHERE visit_date BETWEEN ? AND ?",
+}
+
+SHEET_TITLES = {
+    'patients': "Patients",
+    'appointments': "Appointments",
+    'bills': "Bills",
+    'medical_records': "Medical Records",
+}
+
+MIME_TYPES = {
+    ".csv": "text/csv",
+    ".csv.gz": "application/gzip",
+    ".zip": "application/zip",
+    ".xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    ".pdf": "application/pdf",
+}
+
+# Widest column in a PDF table, in characters
+PDF_COLUMN_CHARS = 30
+
+REPORT_DATASETS = {
+    "Comprehensive Report": ['patients', 'appointments', 'bills', 'medical_records'],
+    "Patients Report": ['patients'],
+    "Appointments Report": ['appointments'],
+    "Bills Report": ['bills'],
+    "Medical Records Report": ['medical_records'],
+}
+
+
+def stream_rows(db, dataset, start_date, end_date):
+    """Column names of a dataset, then its rows in chunks of CHUNK_ROWS"""
+    query, params = DATASETS[dataset], (str(start_date), str(end_date))
+    yield db.column_names(query, params)
+    yield from db.stream(query, params, chunk_size=CHUNK_ROWS)
+
+
+def count_rows(db, datasets, start_date, end_date):
+    """Number of rows `datasets` hold for the date range"""
+    params = (str(start_date), str(end_date))
+    return sum(db.scalar(COUNT_QUERIES[dataset], params, 0) for dataset in datasets)
+
+
+def write_csv(db, dataset, start_date, end_date, file, progress=None):
+    """Write a dataset as CSV to the text file `file` and return the number of rows"""
+    writer = csv.writer(file)
+    chunks = stream_rows(db, dataset, start_date, end_date)
+    try:
+        writer.writerow(next(chunks))
+        count = 0
+        for rows in chunks:
+            writer.writerows(rows)
+            count += len(rows)
+            if progress:
+                progress(len(rows))
+    finally:
+        chunks.close()
+    return count
+
+
+def _temp_path(suffix):
+    fd, path = tempfile.mkstemp(prefix="clinic_export_", suffix=suffix)
+    os.close(fd)
+    return path
+
+
+def export_csv(db, datasets, start_date, end_date, compress=False, progress=None):
+    """Export `datasets` to a new temporary file and return (path, row count).
+
+    A single dataset is written as .csv, or .csv.gz when `compress` is set.
+    Several datasets go into a .zip holding one CSV each, deflated when
+    `compress` is set.  The caller removes the file when done with it.
+    """
+    if len(datasets) == 1:
+        suffix = ".csv.gz" if compress else ".csv"
+    else:
+        suffix = ".zip"
+    path = _temp_path(suffix)
+
+    try:
+        if len(datasets) > 1:
+            count = 0
+            method = zipfile.ZIP_DEFLATED if compress else zipfile.ZIP_STORED
+            with zipfile.ZipFile(path, 'w', method) as archive:
+                for dataset in datasets:
+                    with archive.open(f"{dataset}.csv", 'w', force_zip64=True) as member, \
+                            io.TextIOWrapper(member, encoding='utf-8', newline='') as file:
+                        count += write_csv(db, dataset, start_date, end_date, file, progress)
+        elif compress:
+            with gzip.open(path, 'wt', encoding='utf-8', newline='', compresslevel=6) as file:
+                count = write_csv(db, datasets[0], start_date, end_date, file, progress)
+        else:
+            with open(path, 'w', encoding='utf-8', newline='') as file:
+                count = write_csv(db, datasets[0], start_date, end_date, file, progress)
+    except Exception:
+        os.remove(path)
+        raise
+    return path, count
+
+
+def summary_rows(db, start_date, end_date):
+    """(item, value) rows summarising the date range, read from the daily rollups"""
+    params = (str(start_date), str(end_date))
+    new_patients = db.scalar("SELECT SUM(patient_count) FROM daily_new_patients WHERE day BETWEEN ? AND ?",
+                             params, 0)
+    by_status = db.fetch_all("""
+        SELECT NULLIF(status, ''), SUM(appointment_count) FROM daily_appointments_by_status
+        WHERE day BETWEEN ? AND ? GROUP BY status HAVING SUM(appointment_count) > 0 ORDER BY status
+    """, params)
+    revenue, collected, bill_count = db.fetch_one("""
+        SELECT COALESCE(SUM(revenue), 0), COALESCE(SUM(collected), 0), COALESCE(SUM(bill_count), 0)
+        FROM daily_revenue WHERE day BETWEEN ? AND ?
+    """, params)
+    visits, visit_patients = db.fetch_one("""
+        SELECT COUNT(*), COUNT(DISTINCT patient_id) FROM medical_records WHERE visit_date BETWEEN ? AND ?
+    """, params)
+
+    rows = [("Period", f"{start_date} to {end_date}"),
+            ("New patients", new_patients),
+            ("Appointments", sum(count for _, count in by_status))]
+    rows += [(f"Appointments - {status or 'No status'}", count) for status, count in by_status]
+    rows += [("Bills", bill_count),
+             ("Revenue", revenue),
+             ("Collected", collected),
+             ("Outstanding", revenue - collected),
+             ("Medical records", visits),
+             ("Patients seen", visit_patients)]
+    return rows
+
+
+def export_excel(db, datasets, start_date, end_date, progress=None):
+    """Export `datasets` to a new temporary .xlsx file and return (path, row count).
+
+    The workbook starts with a Summary sheet, followed by one sheet per
+    dataset.  Each dataset is read and written by its own thread.  The
+    caller removes the file when done with it.
+    """
+    # Imported here: openpyxl takes longer to import than the rest of the Reports page
+    from openpyxl import Workbook
+
+    path = _temp_path(".xlsx")
+    workbook = Workbook(write_only=True)
+    summary = workbook.create_sheet("Summary")
+    sheets = {}
+    lock = threading.Lock()
+
+    def new_sheet(dataset):
+        title = SHEET_TITLES[dataset]
+        with lock:
+            parts = sheets.setdefault(dataset, [])
+            sheet = workbook.create_sheet(f"{title} ({len(parts) + 1})" if parts else title)
+            parts.append(sheet)
+        sheet.freeze_panes = "A2"
+        return sheet
+
+    def write_sheet(dataset, sheet):
+        # Write-only sheets hold no shared state for unstyled values, so
+        # each one can be filled from its own thread
+        chunks = stream_rows(db, dataset, start_date, end_date)
+        try:
+            columns = next(chunks)
+            sheet.append(columns)
+            sheet_rows = count = 0
+            for rows in chunks:
+                for row in rows:
+                    if sheet_rows == MAX_SHEET_ROWS:
+                        sheet = new_sheet(dataset)
+                        sheet.append(columns)
+                        sheet_rows = 0
+                    sheet.append(row)
+                    sheet_rows += 1
+                count += len(rows)
+                if progress:
+                    progress(len(rows))
+        finally:
+            chunks.close()
+        return count
+
+    try:
+        first_sheets = [(dataset, new_sheet(dataset)) for dataset in datasets]
+        with ThreadPoolExecutor(max_workers=len(datasets) + 1) as pool:
+            totals = pool.submit(summary_rows, db, start_date, end_date)
+            counts = [pool.submit(write_sheet, dataset, sheet) for dataset, sheet in first_sheets]
+            counts = [future.result() for future in counts]
+
+        summary.append(("Item", "Value"))
+        for row in totals.result():
+            summary.append(row)
+        summary.append(())
+        summary.append(("Sheet", "Rows exported"))
+        for dataset, count in zip(datasets, counts):
+            summary.append((SHEET_TITLES[dataset], count))
+
+        # Continuation sheets were added as they filled up, put them after their first part
+        order = [summary] + [sheet for dataset in datasets for sheet in sheets[dataset]]
+        for index, sheet in enumerate(order):
+            workbook.move_sheet(sheet.title, index - workbook.index(sheet))
+        workbook.save(path)
+    except Exception:
+        # Close the sheets' own temporary files, which only save() would remove
+        for sheet in workbook.worksheets:
+            if sheet._writer is not None and not sheet.closed:
+                sheet.close()
+                sheet._writer.cleanup()
+        os.remove(path)
+        raise
+    return path, sum(counts)
+
+
+def _column_widths(columns, rows):
+    """Character widths that fit the names and the first rows of a table on one PDF line"""
+    widths = [len(column) for column in columns]
+    for row in rows:
+        widths = [max(width, len(" ".join(str(value).split())) if value is not None else 0)
+                  for width, value in zip(widths, row)]
+    widths = [min(width, PDF_COLUMN_CHARS) for width in widths]
+    while sum(widths) + len(widths) - 1 > LINE_CHARS and max(widths) > 1:
+        widths[widths.index(max(widths))] -= 1
+    return widths
+
+
+def _table_line(values, widths):
+    cells = []
+    for value, width in zip(values, widths):
+        text = "" if value is None else " ".join(str(value).split())
+        if len(text) > width:
+            text = text[:width - 1] + "…"
+        cells.append(text.ljust(width))
+    return " ".join(cells)
+
+
+def export_pdf(db, datasets, start_date, end_date, progress=None):
+    """Export `datasets` to a new temporary .pdf file and return (path, row count).
+
+    The report opens with the summary of the date range, then lists every
+    dataset as a text table whose column names repeat on each page.  The
+    caller removes the file when done with it.
+    """
+    path = _temp_path(".pdf")
+    count = 0
+    try:
+        with open(path, 'wb') as file:
+            pdf = PdfWriter(file, title=f"Clinic report {start_date} to {end_date}")
+            pdf.line("Summary", bold=True)
+            pdf.line()
+            for item, value in summary_rows(db, start_date, end_date):
+                pdf.line(f"{item:<40} {value:,.2f}" if isinstance(value, float) else f"{item:<40} {value}")
+
+            for dataset in datasets:
+                pdf.page_break()
+                title = SHEET_TITLES[dataset]
+                chunks = stream_rows(db, dataset, start_date, end_date)
+                try:
+                    columns = next(chunks)
+                    widths = None
+                    for rows in chunks:
+                        if widths is None:
+                            widths = _column_widths(columns, rows)
+                            pdf.page_header = [(title, True), (_table_line(columns, widths), True)]
+                        for row in rows:
+                            pdf.line(_table_line(row, widths))
+                        count += len(rows)
+                        if progress:
+                            progress(len(rows))
+                finally:
+                    chunks.close()
+                if widths is None:
+                    pdf.line(title, bold=True)
+                    pdf.line("No rows in this period")
+                pdf.page_break()
+                pdf.page_header = []
+            pdf.close()
+    except Exception:
+        os.remove(path)
+        raise
+    return path, count
+
+
+# Export function for each file format of the Reports page
+EXPORTERS = {
+    "CSV": export_csv,
+    "Excel": export_excel,
+    "PDF": export_pdf,
+}
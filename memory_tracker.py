@@ -0,0 +1,270 @@
+"""
+Opt-in memory profiling for long-running servers.
+
+Enabled with CLINIC_MEMORY_PROFILE=1 or `python run.py --memory-profile`.
+It then:
+
+- traces allocations with tracemalloc, keeping CLINIC_MEMORY_FRAMES
+  (default FRAMES) frames per trace so each allocation can be attributed
+  to app.py or the page that made it,
+- records, through the page profiler's start()/finish(), how much traced
+  memory each rerun left behind and its peak,
+- measures every session's st.session_state entries after each rerun,
+  counting DataFrames with their deep memory usage, and
+- writes a text report to memory_reports/ every CLINIC_MEMORY_REPORT_SECONDS
+  seconds: process size, sessions with the largest state, memory kept per
+  page, and the allocation sites that grew most since the last report.
+
+A full tracemalloc snapshot is only taken per report, not per rerun; with
+a large heap it takes longer than a rerun.  Tracing makes reruns many
+times slower (more so with more frames), so leave it off in normal use.
+CLINIC_MEMORY_FRAMES=0 is a light mode without tracemalloc: reruns are
+measured by the change in process size and only the session and page
+sections are reported.
+"""
+
+import logging
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import defaultdict
+
+logger = logging.getLogger("clinic.memory")
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+PAGES_DIR = os.path.join(ROOT, "pages")
+FRAMES = 20
+REPORT_SECONDS = 600
+REPORT_DIR = "memory_reports"
+TOP_ENTRIES = 15
+
+# Sessions not seen for this long are dropped from the accounting
+SESSION_IDLE_SECONDS = 4 * 3600
+
+
+def process_rss():
+    """Resident set size of this process in bytes, None where it cannot be read"""
+    try:
+        with open("/proc/self/statm") as file:
+            return int(file.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource
+        # Peak rather than current size; kilobytes on Linux, bytes on macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == 'darwin' else peak * 1024
+    except ImportError:
+        return None
+
+
+def deep_size(obj, seen=None, depth=0):
+    """Approximate bytes held by `obj` and what it references, counting shared objects once"""
+    seen = set() if seen is None else seen
+    if id(obj) in seen or depth > 20:
+        return 0
+    seen.add(id(obj))
+
+    # DataFrames, Series and Index know their own size, including string values
+    memory_usage = getattr(obj, 'memory_usage', None)
+    if callable(memory_usage) and not isinstance(obj, type):
+        try:
+            usage = memory_usage(deep=True)
+            return int(usage.sum() if hasattr(usage, 'sum') else usage)
+        except TypeError:
+            pass
+    if hasattr(obj, 'nbytes') and not isinstance(obj, type):
+        return sys.getsizeof(obj)
+
+    size = sys.getsizeof(obj, 0)
+    if isinstance(obj, (str, bytes, bytearray, int, float, bool)) or obj is None:
+        return size
+    if isinstance(obj, dict):
+        size += sum(deep_size(key, seen, depth + 1) + deep_size(value, seen, depth + 1)
+                    for key, value in list(obj.items()))
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(deep_size(item, seen, depth + 1) for item in list(obj))
+    elif hasattr(obj, '__dict__') and not isinstance(obj, type):
+        # Plain objects such as a pandas Styler: count their attributes
+        size += deep_size(vars(obj), seen, depth + 1)
+    return size
+
+
+def format_bytes(size):
+    if size is None:
+        return "n/a"
+    for unit in ("B", "KB", "MB"):
+        if abs(size) < 1024:
+            return f"{size:,.1f} {unit}"
+        size /= 1024
+    return f"{size:,.1f} GB"
+
+
+def page_of(traceback):
+    """The app script a traced allocation was made from, or None"""
+    for frame in traceback:
+        filename = os.path.abspath(frame.filename)
+        if filename == os.path.join(ROOT, "app.py") or os.path.dirname(filename) == PAGES_DIR:
+            return os.path.relpath(filename, ROOT).replace(os.sep, '/')
+    return None
+
+
+def allocation_site(traceback):
+    """'file:line' of the most recent frame of the project's own code, else of the allocating library"""
+    for frame in reversed(traceback):
+        if os.path.abspath(frame.filename).startswith(ROOT + os.sep):
+            return f"{os.path.relpath(frame.filename, ROOT)}:{frame.lineno}"
+    # Skip the import machinery's frozen modules
+    frames = [frame for frame in traceback if not frame.filename.startswith('<')] or list(traceback)
+    return f"{frames[-1].filename}:{frames[-1].lineno}"
+
+
+class MemoryTracker:
+    """Per-rerun memory growth, session_state sizes and periodic tracemalloc reports"""
+
+    def __init__(self, enabled=None, report_seconds=None, report_dir=None):
+        if enabled is None:
+            enabled = os.environ.get('CLINIC_MEMORY_PROFILE', '0') == '1'
+        self.enabled = enabled
+        self.report_seconds = report_seconds or float(os.environ.get('CLINIC_MEMORY_REPORT_SECONDS',
+                                                                      REPORT_SECONDS))
+        self.report_dir = report_dir or os.environ.get('CLINIC_MEMORY_REPORT_DIR', REPORT_DIR)
+        self.frames = int(os.environ.get('CLINIC_MEMORY_FRAMES', FRAMES))
+        self._lock = threading.Lock()
+        # The report thread and the Performance page both write reports
+        self._report_lock = threading.Lock()
+        self._pages = defaultdict(lambda: {'reruns': 0, 'kept': 0, 'peak': 0})
+        self._sessions = {}
+        self._previous = None
+        self._thread = None
+        self.last_report = None
+        if self.enabled:
+            self.start()
+
+    def start(self):
+        """Start tracing and the report thread"""
+        self.enabled = True
+        if self.frames and not tracemalloc.is_tracing():
+            tracemalloc.start(self.frames)
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._report_loop, name="memory-reports", daemon=True)
+            self._thread.start()
+
+    def begin_rerun(self):
+        """Traced bytes (or process size) at the start of a rerun"""
+        if not self.enabled:
+            return None
+        if not tracemalloc.is_tracing():
+            return process_rss()
+        # The peak is process-wide, so concurrent reruns share it
+        tracemalloc.reset_peak()
+        return tracemalloc.get_traced_memory()[0]
+
+    def end_rerun(self, page, before, session_id=None, user=None, session_state=None):
+        """Record what the rerun kept and the session's state sizes; returns the figures for the sample"""
+        if not self.enabled or before is None:
+            return {}
+        if tracemalloc.is_tracing():
+            current, peak = tracemalloc.get_traced_memory()
+        else:
+            current = process_rss() or before
+            peak = max(current, before)
+        kept = current - before
+        state = {}
+        if session_state is not None:
+            state = {str(key): deep_size(value) for key, value in list(session_state.items())}
+        with self._lock:
+            stats = self._pages[page]
+            stats['reruns'] += 1
+            stats['kept'] += kept
+            stats['peak'] = max(stats['peak'], peak - before)
+            if session_id is not None:
+                self._sessions[session_id] = {'user': user, 'page': page, 'seen': time.time(), 'state': state}
+        return {'memory_kept': kept, 'memory_peak': peak - before, 'session_state_bytes': sum(state.values())}
+
+    def session_sizes(self):
+        """(session id, user, last page, total bytes, {key: bytes}) of live sessions, largest first"""
+        cutoff = time.time() - SESSION_IDLE_SECONDS
+        with self._lock:
+            for session_id in [key for key, value in self._sessions.items() if value['seen'] < cutoff]:
+                del self._sessions[session_id]
+            sessions = [(session_id, value['user'], value['page'], sum(value['state'].values()), value['state'])
+                        for session_id, value in self._sessions.items()]
+        return sorted(sessions, key=lambda session: session[3], reverse=True)
+
+    def report(self):
+        """Text report of the process, sessions, pages and allocation growth since the last report"""
+        lines = [f"Memory report {time.strftime('%Y-%m-%d %H:%M:%S')}"]
+        line = f"Process RSS {format_bytes(process_rss())}"
+        if tracemalloc.is_tracing():
+            current, peak = tracemalloc.get_traced_memory()
+            line += f", traced {format_bytes(current)}, traced peak {format_bytes(peak)}"
+        lines.append(line)
+
+        sessions = self.session_sizes()
+        lines.append(f"\nSessions by st.session_state size ({len(sessions)} live)")
+        for session_id, user, page, total, state in sessions[:TOP_ENTRIES]:
+            largest = sorted(state.items(), key=lambda item: item[1], reverse=True)[:5]
+            lines.append(f"  {format_bytes(total):>12}  {user or 'anonymous'} on {page} ({session_id[:8]}): "
+                         + ", ".join(f"{key}={format_bytes(size)}" for key, size in largest))
+
+        with self._lock:
+            pages = sorted(self._pages.items(), key=lambda item: item[1]['kept'], reverse=True)
+        lines.append("\nMemory kept by reruns, per page")
+        for page, stats in pages:
+            lines.append(f"  {page:<32} {stats['reruns']:>6} reruns  kept {format_bytes(stats['kept']):>12}  "
+                         f"max rerun peak {format_bytes(stats['peak'])}")
+
+        if tracemalloc.is_tracing():
+            lines += self._allocations()
+        return "\n".join(lines)
+
+    def _allocations(self):
+        """Report lines of the traced allocations per page and site, as growth since the previous snapshot"""
+        snapshot = tracemalloc.take_snapshot().filter_traces([
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        ])
+        if self._previous is not None:
+            title = "Allocation growth since the last report, by page"
+            statistics = [(stat.traceback, stat.size_diff)
+                          for stat in snapshot.compare_to(self._previous, 'traceback')]
+        else:
+            title = "Allocated memory by page"
+            statistics = [(stat.traceback, stat.size) for stat in snapshot.statistics('traceback')]
+        self._previous = snapshot
+
+        by_page = defaultdict(lambda: defaultdict(int))
+        for traceback, size in statistics:
+            by_page[page_of(traceback) or "(outside the pages)"][allocation_site(traceback)] += size
+        lines = [f"\n{title}"]
+        for page, sites in sorted(by_page.items(), key=lambda item: sum(item[1].values()), reverse=True):
+            lines.append(f"  {page}: {format_bytes(sum(sites.values()))}")
+            for site, size in sorted(sites.items(), key=lambda item: item[1], reverse=True)[:5]:
+                lines.append(f"    {format_bytes(size):>12}  {site}")
+        return lines
+
+    def write_report(self):
+        """Write a report to the report directory and return its path"""
+        with self._report_lock:
+            text = self.report()
+        os.makedirs(self.report_dir, exist_ok=True)
+        path = os.path.join(self.report_dir, f"memory-{time.strftime('%Y%m%d-%H%M%S')}.txt")
+        with open(path, 'w', encoding='utf-8') as file:
+            file.write(text + "\n")
+        self.last_report = text
+        logger.info("Memory report written to %s", path)
+        return path
+
+    def _report_loop(self):
+        while True:
+            time.sleep(self.report_seconds)
+            try:
+                self.write_report()
+            except Exception as e:
+                print(f"Memory report failed: {e}")
+
+
+memory_tracker = MemoryTracker()
@@ -0,0 +1,156 @@
+"""
+Key figures shown on the stats tabs.
+
+Every KPI is declared once in METRICS, either as an aggregate over one
+table or as a value derived from other KPIs.  Metrics reads every
+requested aggregate of a table in one query, so a tab showing four
+figures from the same table scans it once.  Values are cached by the
+Metrics object, which pages create once per script run.
+"""
+
+import streamlit as st
+from database import db
+
+
+class Metric:
+    """One aggregate over `table`, optionally only over the rows matching `where`"""
+
+    def __init__(self, label, table, aggregate, where=None, fmt="{:,}", default=0):
+        self.label = label
+        self.table = table
+        self.aggregate = aggregate
+        self.where = where
+        self.fmt = fmt
+        self.default = default
+
+    def sql(self):
+        expression = f"{self.aggregate} FILTER (WHERE {self.where})" if self.where else self.aggregate
+        return f"COALESCE({expression}, {self.default!r})"
+
+
+class Derived:
+    """A value computed from other metrics, e.g. a rate"""
+
+    def __init__(self, label, inputs, compute, fmt="{:,}"):
+        self.label = label
+        self.inputs = inputs
+        self.compute = compute
+        self.fmt = fmt
+
+
+def percentage(part, whole):
+    return round(100.0 * part / whole, 1) if whole else 0
+
+
+def average(total, count):
+    return round(total / count, 1) if count else 0
+
+
+TODAY = "date('now', 'localtime')"
+THIS_MONTH = "date('now', 'localtime', 'start of month')"
+NEXT_MONTH = "date('now', 'localtime', 'start of month', '+1 month')"
+LAST_30_DAYS = "date('now', 'localtime', '-30 days')"
+MONEY = "${:,.0f}"
+PERCENT = "{:.1f}%"
+
+METRICS = {
+    # Patients
+    'patients.total': Metric("Total Patients", 'patients', "COUNT(*)"),
+    'patients.male': Metric("Male", 'patients', "COUNT(*)", "gender = 'Male'"),
+    'patients.female': Metric("Female", 'patients', "COUNT(*)", "gender = 'Female'"),
+    'patients.new_today': Metric("New Patients Today", 'patients', "COUNT(*)", f"created_at >= {TODAY}"),
+    'patients.new_30_days': Metric("New Patients (Last 30 days)", 'patients', "COUNT(*)",
+                                   f"created_at >= {LAST_30_DAYS}"),
+
+    # Appointments
+    'appointments.total': Metric("Total Appointments", 'appointments', "COUNT(*)"),
+    'appointments.today': Metric("Today's Appointments", 'appointments', "COUNT(*)",
+                                 f"appointment_date = {TODAY}"),
+    'appointments.completed': Metric("Completed Appointments", 'appointments', "COUNT(*)",
+                                     "status = 'Completed'"),
+    'appointments.cancelled': Metric("Cancelled Appointments", 'appointments', "COUNT(*)",
+                                     "status = 'Cancelled'"),
+    'appointments.upcoming_today': Metric("Upcoming Appointments", 'appointments', "COUNT(*)",
+                                          f"appointment_date = {TODAY} AND status = 'Scheduled'"),
+    'appointments.days': Metric("Days With Appointments", 'appointments', "COUNT(DISTINCT appointment_date)"),
+    'appointments.completion_rate': Derived("Completion Rate", ('appointments.completed', 'appointments.total'),
+                                            percentage, PERCENT),
+    'appointments.cancellation_rate': Derived("Cancellation Rate",
+                                              ('appointments.cancelled', 'appointments.total'),
+                                              percentage, PERCENT),
+    'appointments.average_daily': Derived("Average Daily Appointments", ('appointments.total', 'appointments.days'),
+                                          average),
+
+    # Medical records
+    'records.total': Metric("Total Records", 'medical_records', "COUNT(*)"),
+    'records.patients': Metric("Unique Patients", 'medical_records', "COUNT(DISTINCT patient_id)"),
+    'records.active_patients': Metric("Active Patients", 'medical_records', "COUNT(DISTINCT patient_id)",
+                                      f"visit_date >= {LAST_30_DAYS}"),
+    'records.this_month': Metric("Visits This Month", 'medical_records', "COUNT(*)",
+                                 f"visit_date >= {THIS_MONTH} AND visit_date < {NEXT_MONTH}"),
+    'records.today': Metric("Visits Today", 'medical_records', "COUNT(*)", f"visit_date = {TODAY}"),
+
+    # Bills
+    'bills.total': Metric("Total Bills", 'bills', "COUNT(*)"),
+    'bills.revenue': Metric("Total Revenue", 'bills', "SUM(amount)", fmt=MONEY),
+    'bills.collected': Metric("Collected Revenue", 'bills', "SUM(paid_amount)", fmt=MONEY),
+    'bills.pending': Metric("Pending Amount", 'bills', "SUM(amount - paid_amount)", "payment_status != 'Paid'",
+                            fmt=MONEY),
+    'bills.collection_rate': Derived("Collection Rate", ('bills.collected', 'bills.revenue'), percentage, PERCENT),
+
+    # Users
+    'users.total': Metric("Total Users", 'users', "COUNT(*)"),
+    'users.active': Metric("Active Users", 'users', "COUNT(*)", "is_active = 1"),
+    'users.new_this_month': Metric("New Users This Month", 'users', "COUNT(*)",
+                                   f"created_at >= {THIS_MONTH} AND created_at < {NEXT_MONTH}"),
+}
+
+
+class Metrics:
+    """Values of METRICS, cached for the lifetime of the object (one script run)"""
+
+    def __init__(self, registry=None):
+        self.registry = registry or METRICS
+        self._values = {}
+
+    def _aggregates(self, names, found):
+        """The plain aggregates behind `names`, including the inputs of derived metrics"""
+        for name in names:
+            metric = self.registry[name]
+            if isinstance(metric, Derived):
+                self._aggregates(metric.inputs, found)
+            elif name not in self._values:
+                found.setdefault(metric.table, []).append(name)
+        return found
+
+    def load(self, *names):
+        """Fetch every uncached aggregate behind `names` with one query per table"""
+        for table, table_names in self._aggregates(names, {}).items():
+            table_names = list(dict.fromkeys(table_names))
+            row = db.fetch_one(f"""
+                SELECT {', '.join(self.registry[name].sql() for name in table_names)}
+                FROM {table}
+            """)
+            for index, name in enumerate(table_names):
+                self._values[name] = row[index] if row else self.registry[name].default
+
+    def value(self, name):
+        if name not in self._values:
+            self.load(name)
+            metric = self.registry[name]
+            if isinstance(metric, Derived):
+                self._values[name] = metric.compute(*(self.value(n) for n in metric.inputs))
+        return self._values[name]
+
+    def values(self, *names):
+        """Values of `names` in order, reading each table at most once"""
+        self.load(*names)
+        return [self.value(name) for name in names]
+
+    def render(self, *names):
+        """`names` as st.metric figures in one row of columns"""
+        values = self.values(*names)
+        for column, name, value in zip(st.columns(len(names)), names, values):
+            metric = self.registry[name]
+            with column:
+                st.metric(metric.label, metric.fmt.format(value))
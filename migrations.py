@@ -0,0 +1,283 @@
+"""
+Versioned schema migrations.
+
+Each migration is a (version, description, steps) tuple.  A step is either
+an SQL statement or a callable taking the connection.  Migrations run in
+version order at startup, each one in its own transaction, and the applied
+versions are recorded in the schema_version table.
+"""
+
+import sqlite3
+
+import clinical_search
+import rollups
+import snapshot
+
+# A patient whose created_at is NULL or not a date only counts towards
+# total_patients; clinic_counters.day is NOT NULL
+PATIENT_COUNTER_TRIGGERS = [
+    """CREATE TRIGGER IF NOT EXISTS trg_counters_patients_insert AFTER INSERT ON patients
+       BEGIN
+           INSERT INTO clinic_counters (day, name, value) VALUES ('', 'total_patients', 1)
+           ON CONFLICT (day, name) DO UPDATE SET value = value + 1;
+           INSERT INTO clinic_counters (day, name, value)
+           SELECT date(NEW.created_at), 'new_patients', 1 WHERE date(NEW.created_at) IS NOT NULL
+           ON CONFLICT (day, name) DO UPDATE SET value = value + 1;
+       END""",
+    """CREATE TRIGGER IF NOT EXISTS trg_counters_patients_delete AFTER DELETE ON patients
+       BEGIN
+           UPDATE clinic_counters SET value = value - 1 WHERE day = '' AND name = 'total_patients';
+           UPDATE clinic_counters SET value = value - 1
+           WHERE date(OLD.created_at) IS NOT NULL AND day = date(OLD.created_at) AND name = 'new_patients';
+       END""",
+    """CREATE TRIGGER IF NOT EXISTS trg_counters_patients_update AFTER UPDATE OF created_at ON patients
+       WHEN date(OLD.created_at) IS NOT date(NEW.created_at)
+       BEGIN
+           UPDATE clinic_counters SET value = value - 1
+           WHERE date(OLD.created_at) IS NOT NULL AND day = date(OLD.created_at) AND name = 'new_patients';
+           INSERT INTO clinic_counters (day, name, value)
+           SELECT date(NEW.created_at), 'new_patients', 1 WHERE date(NEW.created_at) IS NOT NULL
+           ON CONFLICT (day, name) DO UPDATE SET value = value + 1;
+       END""",
+]
+
+MIGRATIONS = [
+    (1, "Index appointments by date, status and doctor", [
+        """CREATE INDEX IF NOT EXISTS idx_appointments_date_status_doctor
+           ON appointments (appointment_date, status, doctor_name)""",
+        """CREATE INDEX IF NOT EXISTS idx_appointments_status_date
+           ON appointments (status, appointment_date)""",
+        """CREATE INDEX IF NOT EXISTS idx_appointments_doctor
+           ON appointments (doctor_name)""",
+    ]),
+    (2, "Index bills by date and payment status", [
+        """CREATE INDEX IF NOT EXISTS idx_bills_date_status
+           ON bills (bill_date, payment_status)""",
+        """CREATE INDEX IF NOT EXISTS idx_bills_status_date
+           ON bills (payment_status, bill_date)""",
+        """CREATE INDEX IF NOT EXISTS idx_bills_created_at
+           ON bills (created_at)""",
+    ]),
+    (3, "Index medical records by patient and visit date", [
+        """CREATE INDEX IF NOT EXISTS idx_medical_records_patient_visit
+           ON medical_records (patient_id, visit_date)""",
+        """CREATE INDEX IF NOT EXISTS idx_medical_records_visit_date
+           ON medical_records (visit_date)""",
+    ]),
+    (4, "Index patients by creation time and name", [
+        """CREATE INDEX IF NOT EXISTS idx_patients_created_at
+           ON patients (created_at)""",
+        """CREATE INDEX IF NOT EXISTS idx_patients_name
+           ON patients (name)""",
+    ]),
+    (5, "Dashboard counters maintained by triggers", [
+        """CREATE TABLE IF NOT EXISTS clinic_counters
+           (
+               day TEXT NOT NULL DEFAULT '',
+               name TEXT NOT NULL,
+               value NUMERIC NOT NULL DEFAULT 0,
+               PRIMARY KEY (day, name)
+           ) WITHOUT ROWID""",
+        # Backfill from the existing rows
+        """INSERT OR REPLACE INTO clinic_counters (day, name, value)
+           SELECT '', 'total_patients', COUNT(*) FROM patients""",
+        """INSERT OR REPLACE INTO clinic_counters (day, name, value)
+           SELECT date(created_at), 'new_patients', COUNT(*) FROM patients
+           WHERE created_at IS NOT NULL GROUP BY date(created_at)""",
+        """INSERT OR REPLACE INTO clinic_counters (day, name, value)
+           SELECT appointment_date, 'scheduled_appointments', COUNT(*) FROM appointments
+           WHERE status = 'Scheduled' GROUP BY appointment_date""",
+        """INSERT OR REPLACE INTO clinic_counters (day, name, value)
+           SELECT '', 'paid_revenue', COALESCE(SUM(amount), 0) FROM bills WHERE payment_status = 'Paid'""",
+        """INSERT OR REPLACE INTO clinic_counters (day, name, value)
+           SELECT '', 'unpaid_bills', COUNT(*) FROM bills WHERE payment_status = 'Unpaid'""",
+        # Patients
+        *PATIENT_COUNTER_TRIGGERS,
+        # Appointments: scheduled appointments per day
+        """CREATE TRIGGER IF NOT EXISTS trg_counters_appointments_insert AFTER INSERT ON appointments
+           WHEN NEW.status = 'Scheduled'
+           BEGIN
+               INSERT INTO clinic_counters (day, name, value) VALUES (NEW.appointment_date, 'scheduled_appointments', 1)
+               ON CONFLICT (day, name) DO UPDATE SET value = value + 1;
+           END""",
+        """CREATE TRIGGER IF NOT EXISTS trg_counters_appointments_delete AFTER DELETE ON appointments
+           WHEN OLD.status = 'Scheduled'
+           BEGIN
+               UPDATE clinic_counters SET value = value - 1
+               WHERE day = OLD.appointment_date AND name = 'scheduled_appointments';
+           END""",
+        """CREATE TRIGGER IF NOT EXISTS trg_counters_appointments_update
+           AFTER UPDATE OF status, appointment_date ON appointments
+           BEGIN
+               UPDATE clinic_counters SET value = value - 1
+               WHERE OLD.status = 'Scheduled' AND day = OLD.appointment_date AND name = 'scheduled_appointments';
+               INSERT INTO clinic_counters (day, name, value)
+               SELECT NEW.appointment_date, 'scheduled_appointments', 1 WHERE NEW.status = 'Scheduled'
+               ON CONFLICT (day, name) DO UPDATE SET value = value + 1;
+           END""",
+        # Bills: paid revenue and unpaid bill count
+        """CREATE TRIGGER IF NOT EXISTS trg_counters_bills_insert AFTER INSERT ON bills
+           BEGIN
+               INSERT INTO clinic_counters (day, name, value)
+               SELECT '', 'paid_revenue', NEW.amount WHERE NEW.payment_status = 'Paid'
+               ON CONFLICT (day, name) DO UPDATE SET value = value + excluded.value;
+               INSERT INTO clinic_counters (day, name, value)
+               SELECT '', 'unpaid_bills', 1 WHERE NEW.payment_status = 'Unpaid'
+               ON CONFLICT (day, name) DO UPDATE SET value = value + 1;
+           END""",
+        """CREATE TRIGGER IF NOT EXISTS trg_counters_bills_delete AFTER DELETE ON bills
+           BEGIN
+               UPDATE clinic_counters SET value = value - OLD.amount
+               WHERE OLD.payment_status = 'Paid' AND day = '' AND name = 'paid_revenue';
+               UPDATE clinic_counters SET value = value - 1
+               WHERE OLD.payment_status = 'Unpaid' AND day = '' AND name = 'unpaid_bills';
+           END""",
+        """CREATE TRIGGER IF NOT EXISTS trg_counters_bills_update AFTER UPDATE OF amount, payment_status ON bills
+           BEGIN
+               UPDATE clinic_counters SET value = value - OLD.amount
+               WHERE OLD.payment_status = 'Paid' AND day = '' AND name = 'paid_revenue';
+               UPDATE clinic_counters SET value = value - 1
+               WHERE OLD.payment_status = 'Unpaid' AND day = '' AND name = 'unpaid_bills';
+               INSERT INTO clinic_counters (day, name, value)
+               SELECT '', 'paid_revenue', NEW.amount WHERE NEW.payment_status = 'Paid'
+               ON CONFLICT (day, name) DO UPDATE SET value = value + excluded.value;
+               INSERT INTO clinic_counters (day, name, value)
+               SELECT '', 'unpaid_bills', 1 WHERE NEW.payment_status = 'Unpaid'
+               ON CONFLICT (day, name) DO UPDATE SET value = value + 1;
+           END""",
+    ]),
+    (6, "Add trigger-maintained daily rollups for the Reports page",
+     rollups.CREATE_STATEMENTS + rollups.REBUILD_STATEMENTS + rollups.TRIGGER_STATEMENTS),
+    (7, "Trigram full-text index over patient name, phone and national ID", [
+        """CREATE VIRTUAL TABLE IF NOT EXISTS patients_fts
+           USING fts5(name, phone, national_id, content='patients', content_rowid='id', tokenize='trigram')""",
+        "INSERT INTO patients_fts (patients_fts) VALUES ('rebuild')",
+        """CREATE TRIGGER IF NOT EXISTS trg_patients_fts_insert AFTER INSERT ON patients
+           BEGIN
+               INSERT INTO patients_fts (rowid, name, phone, national_id)
+               VALUES (NEW.id, NEW.name, NEW.phone, NEW.national_id);
+           END""",
+        """CREATE TRIGGER IF NOT EXISTS trg_patients_fts_delete AFTER DELETE ON patients
+           BEGIN
+               INSERT INTO patients_fts (patients_fts, rowid, name, phone, national_id)
+               VALUES ('delete', OLD.id, OLD.name, OLD.phone, OLD.national_id);
+           END""",
+        """CREATE TRIGGER IF NOT EXISTS trg_patients_fts_update AFTER UPDATE OF name, phone, national_id ON patients
+           BEGIN
+               INSERT INTO patients_fts (patients_fts, rowid, name, phone, national_id)
+               VALUES ('delete', OLD.id, OLD.name, OLD.phone, OLD.national_id);
+               INSERT INTO patients_fts (rowid, name, phone, national_id)
+               VALUES (NEW.id, NEW.name, NEW.phone, NEW.national_id);
+           END""",
+    ]),
+    (8, "Full-text index over medical record notes", clinical_search.CREATE_STATEMENTS),
+    (9, "Background report jobs", [
+        """CREATE TABLE IF NOT EXISTS report_jobs
+           (
+               id INTEGER PRIMARY KEY AUTOINCREMENT,
+               report_type TEXT NOT NULL,
+               export_format TEXT NOT NULL,
+               params TEXT NOT NULL,
+               cache_key TEXT NOT NULL,
+               status TEXT NOT NULL DEFAULT 'queued',
+               progress REAL NOT NULL DEFAULT 0,
+               row_count INTEGER,
+               artifact_path TEXT,
+               error TEXT,
+               requested_by TEXT,
+               created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+               started_at TIMESTAMP,
+               finished_at TIMESTAMP
+           )""",
+        """CREATE INDEX IF NOT EXISTS idx_report_jobs_cache_key
+           ON report_jobs (cache_key, status)""",
+        """CREATE INDEX IF NOT EXISTS idx_report_jobs_requested_by
+           ON report_jobs (requested_by, id)""",
+    ]),
+    (10, "Track changed months for incremental Parquet snapshots",
+     snapshot.CREATE_STATEMENTS + snapshot.TRIGGER_STATEMENTS),
+    (11, "Skip patients without a creation date in the new_patients counter", [
+        "DROP TRIGGER IF EXISTS trg_counters_patients_insert",
+        "DROP TRIGGER IF EXISTS trg_counters_patients_delete",
+        "DROP TRIGGER IF EXISTS trg_counters_patients_update",
+        *PATIENT_COUNTER_TRIGGERS,
+    ]),
+    (12, "Record the process running each report job", [
+        "ALTER TABLE report_jobs ADD COLUMN owner TEXT",
+    ]),
+    (13, "Index the nullable keyset sort keys of the patient and bill lists", [
+        """CREATE INDEX IF NOT EXISTS idx_patients_created_at_key
+           ON patients (COALESCE(created_at, ''), id)""",
+        """CREATE INDEX IF NOT EXISTS idx_bills_bill_date_key
+           ON bills (COALESCE(bill_date, ''), id)""",
+    ]),
+    (14, "Let any process ask for a report job to be cancelled", [
+        "ALTER TABLE report_jobs ADD COLUMN cancel_requested INTEGER NOT NULL DEFAULT 0",
+    ]),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def ensure_version_table(conn):
+    """Create the schema_version table"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS schema_version
+        (
+            version INTEGER PRIMARY KEY,
+            description TEXT,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    conn.commit()
+
+
+def current_version(conn):
+    """Highest applied migration version (0 when none)"""
+    row = conn.execute("SELECT MAX(version) FROM schema_version").fetchone()
+    return row[0] or 0
+
+
+def is_current(conn):
+    """True when every migration has been applied, without creating anything"""
+    try:
+        return current_version(conn) >= LATEST_VERSION
+    except sqlite3.OperationalError:
+        # No schema_version table: a new or pre-migrations database
+        return False
+
+
+def migrate(conn, target=None):
+    """Apply pending migrations up to `target` and return their versions
+
+    Each migration takes the write lock before checking the version again,
+    so server processes starting together apply it only once.
+    """
+    ensure_version_table(conn)
+    target = LATEST_VERSION if target is None else target
+    applied = []
+
+    for number, description, steps in MIGRATIONS:
+        if number > target:
+            continue
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            if number <= current_version(conn):
+                conn.rollback()
+                continue
+            for step in steps:
+                if callable(step):
+                    step(conn)
+                else:
+                    conn.execute(step)
+            conn.execute(
+                "INSERT INTO schema_version (version, description) VALUES (?, ?)",
+                (number, description)
+            )
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        applied.append(number)
+
+    return applied
@@ -0,0 +1,218 @@
+"""
+Per-rerun timings of app.py and the pages.
+
+A page calls page_profiler.start() once the login check has passed and
+page_profiler.finish() at the end of the script, and wraps the parts worth
+timing (tabs, expanders, charts) in `with page_profiler.section(name)`;
+section() also works as a decorator on a helper function.  Every rerun
+records its wall time, the queries it issued and their time, and the
+messages and bytes it sent to the browser, with the same figures for each
+section.  st.stop() or st.rerun() inside a section ends the rerun there.
+
+The last SAMPLES reruns of the process are kept in memory for the
+Performance page.  Set CLINIC_PAGE_PROFILE=0 to turn recording off; the
+memory profiling mode (memory_tracker.py) records through these hooks too.
+"""
+
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+
+import streamlit as st
+from streamlit.runtime.scriptrunner import RerunException, get_script_run_ctx
+from database import db
+from memory_tracker import memory_tracker
+
+SAMPLES = 1000
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))] if ordered else 0.0
+
+
+def _status(exception):
+    """How a rerun or section ended, from the exception leaving it"""
+    if exception is None:
+        return 'ok'
+    if isinstance(exception, Exception):
+        return 'error'
+    # st.rerun() and st.switch_page() raise RerunException, st.stop() StopException
+    return 'rerun' if isinstance(exception, RerunException) else 'stop'
+
+
+class Rerun:
+    """Counters of the script run in progress on one thread"""
+
+    def __init__(self, page, user, session_id, queries, query_seconds):
+        self.page = page
+        self.user = user
+        self.session_id = session_id
+        self.started = time.perf_counter()
+        self.queries = queries
+        self.query_seconds = query_seconds
+        self.messages = 0
+        self.bytes = 0
+        self.sections = []
+        self.open_sections = []
+        self.memory = memory_tracker.begin_rerun()
+
+
+class PageProfiler:
+    """Ring buffer of rerun samples, filled by start()/finish() and section()"""
+
+    def __init__(self, query_profiler, samples=SAMPLES):
+        self.enabled = os.environ.get('CLINIC_PAGE_PROFILE', '1') != '0'
+        self.query_profiler = query_profiler
+        self.samples = deque(maxlen=samples)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def _count_messages(self, ctx):
+        """Count the messages a session sends to the browser, once per script run context"""
+        if ctx is None or getattr(ctx, '_page_profiler', False):
+            return
+        enqueue = ctx._enqueue
+
+        def counting_enqueue(msg):
+            rerun = getattr(self._local, 'rerun', None)
+            if rerun is not None:
+                rerun.messages += 1
+                rerun.bytes += msg.ByteSize()
+            enqueue(msg)
+
+        ctx._enqueue = counting_enqueue
+        ctx._page_profiler = True
+
+    def start(self, page):
+        """Begin timing a rerun of `page` on this thread"""
+        if not self.enabled:
+            return
+        ctx = get_script_run_ctx()
+        user = session_id = None
+        if ctx is not None:
+            self._count_messages(ctx)
+            user = (st.session_state.get('user') or {}).get('username')
+            session_id = ctx.session_id
+        self._local.rerun = Rerun(page, user, session_id, *self.query_profiler.thread_totals())
+
+    def finish(self, status='ok'):
+        """Record the rerun in progress on this thread and return its sample"""
+        rerun = getattr(self._local, 'rerun', None)
+        if rerun is None:
+            return None
+        self._local.rerun = None
+        queries, query_seconds = self.query_profiler.thread_totals()
+        sample = {
+            'time': time.strftime('%Y-%m-%d %H:%M:%S'),
+            'page': rerun.page,
+            'user': rerun.user,
+            'status': status,
+            'ms': (time.perf_counter() - rerun.started) * 1000,
+            'queries': queries - rerun.queries,
+            'query_ms': (query_seconds - rerun.query_seconds) * 1000,
+            'messages': rerun.messages,
+            'bytes': rerun.bytes,
+            'sections': sorted(rerun.sections, key=lambda section: section['start_ms']),
+        }
+        # Memory kept by the rerun and the session's state size, in memory profiling mode
+        sample.update(memory_tracker.end_rerun(rerun.page, rerun.memory, rerun.session_id, rerun.user,
+                                               st.session_state if rerun.session_id is not None else None))
+        with self._lock:
+            self.samples.append(sample)
+        return sample
+
+    @contextmanager
+    def page(self, name):
+        """Time a whole script run; for scripts with a main() function"""
+        self.start(name)
+        error = None
+        try:
+            yield
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            self.finish(_status(error))
+
+    @contextmanager
+    def section(self, name):
+        """Time part of the current rerun; nested sections are named 'outer / inner'"""
+        rerun = getattr(self._local, 'rerun', None)
+        if rerun is None:
+            yield
+            return
+        rerun.open_sections.append(name)
+        started = time.perf_counter()
+        queries, query_seconds = self.query_profiler.thread_totals()
+        messages, sent = rerun.messages, rerun.bytes
+        error = None
+        try:
+            yield
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            now_queries, now_query_seconds = self.query_profiler.thread_totals()
+            rerun.sections.append({
+                'section': ' / '.join(rerun.open_sections),
+                'status': _status(error),
+                'start_ms': (started - rerun.started) * 1000,
+                'ms': (time.perf_counter() - started) * 1000,
+                'queries': now_queries - queries,
+                'query_ms': (now_query_seconds - query_seconds) * 1000,
+                'messages': rerun.messages - messages,
+                'bytes': rerun.bytes - sent,
+            })
+            rerun.open_sections.pop()
+            if _status(error) in ('rerun', 'stop') and not rerun.open_sections:
+                # The script ends here, before the page's finish()
+                self.finish(_status(error))
+
+    def recent(self):
+        """Every recorded rerun, oldest first"""
+        with self._lock:
+            return list(self.samples)
+
+    def slowest(self, n=20):
+        return sorted(self.recent(), key=lambda sample: sample['ms'], reverse=True)[:n]
+
+    def page_summary(self):
+        """Rerun count, latency percentiles, queries and bytes per page"""
+        pages = defaultdict(list)
+        for sample in self.recent():
+            pages[sample['page']].append(sample)
+        return [_summarize({'page': page}, samples) for page, samples in sorted(pages.items())]
+
+    def section_summary(self):
+        """The same figures per page section"""
+        sections = defaultdict(list)
+        for sample in self.recent():
+            for section in sample['sections']:
+                sections[(sample['page'], section['section'])].append(section)
+        return [_summarize({'page': page, 'section': name}, samples)
+                for (page, name), samples in sorted(sections.items())]
+
+    def reset(self):
+        with self._lock:
+            self.samples.clear()
+
+
+def _summarize(row, samples):
+    timings = [sample['ms'] for sample in samples]
+    row.update({
+        'runs': len(samples),
+        'avg_ms': sum(timings) / len(timings),
+        'p50_ms': percentile(timings, 50),
+        'p95_ms': percentile(timings, 95),
+        'max_ms': max(timings),
+        'queries': sum(sample['queries'] for sample in samples) / len(samples),
+        'query_ms': sum(sample['query_ms'] for sample in samples) / len(samples),
+        'kb_sent': sum(sample['bytes'] for sample in samples) / len(samples) / 1024,
+    })
+    return row
+
+
+page_profiler = PageProfiler(db.profiler)
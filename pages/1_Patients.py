@@ -1,14 +1,22 @@
 import streamlit as st
 import pandas as pd
-from database import db
+from database import db, PATIENT_COLUMNS
 from auth import auth
+from page_profiler import page_profiler
+from paging import KeysetPager
+from metrics import Metrics
 
 st.set_page_config(page_title="Patients Management", page_icon="👥")
 
+# Maximum number of search results shown
+SEARCH_LIMIT = 200
+
 if not auth.is_logged_in():
     st.warning("⚠️ Please log in first")
     st.stop()
 
+page_profiler.start("pages/1_Patients.py")
+
 st.title("👥 Patients Management")
 
 # Add new patient button
@@ -79,67 +87,47 @@ with search_col2:
 # Patients list
 st.subheader("📋 Patients List")
 
-# Build query
-query = """
-SELECT id, national_id, name, phone, email, date_of_birth,
-       gender, address, emergency_contact, blood_type, allergies, created_at
-FROM patients
-"""
-params = ()
-
-if st.session_state.get('patient_search'):
-    query += " WHERE name LIKE ? OR phone LIKE ? OR national_id LIKE ?"
-    params = (f"%{st.session_state.patient_search}%",
-              f"%{st.session_state.patient_search}%",
-              f"%{st.session_state.patient_search}%")
-
-query += " ORDER BY created_at DESC"
-
-# Fetch data
-patients_data, columns = db.execute_query(query, params)
-
-if patients_data:
-    # Convert to DataFrame
-    patients_df = pd.DataFrame(patients_data, columns=columns)
-
-    # Display data in interactive table
-    st.dataframe(
-        patients_df,
-        use_container_width=True,
-        hide_index=True,
-        column_config={
-            "id": st.column_config.NumberColumn("ID", width="small"),
-            "national_id": "National ID",
-            "name": "Name",
-            "phone": "Phone",
-            "email": "Email",
-            "date_of_birth": "Date of Birth",
-            "gender": "Gender",
-            "blood_type": "Blood Type"
-        }
-    )
-
-    # Statistics
-    st.subheader("📊 Patient Statistics")
-    col1, col2, col3, col4 = st.columns(4)
-
-    total_patients = len(patients_data)
-    male_count = len([p for p in patients_data if p[6] == 'Male'])
-    female_count = len([p for p in patients_data if p[6] == 'Female'])
-
-    with col1:
-        st.metric("Total Patients", total_patients)
-    with col2:
-        st.metric("Male", male_count)
-    with col3:
-        st.metric("Female", female_count)
-    with col4:
-        from datetime import datetime
-        today_count = len([p for p in patients_data if p[11].split()[0] == str(datetime.now().date())])
-        st.metric("New Patients Today", today_count)
-
-else:
-    st.info("📭 No patient data available")
+column_config = {
+    "id": st.column_config.NumberColumn("ID", width="small"),
+    "national_id": "National ID",
+    "name": "Name",
+    "phone": "Phone",
+    "email": "Email",
+    "date_of_birth": "Date of Birth",
+    "gender": "Gender",
+    "blood_type": "Blood Type"
+}
+with page_profiler.section("📋 Patients List"):
+    # Searches go through the full-text index, the full list is paged in SQL
+    if st.session_state.get('patient_search'):
+        patients_data = db.search_patients(st.session_state.patient_search, limit=SEARCH_LIMIT)
+        if patients_data:
+            st.dataframe(pd.DataFrame(patients_data, columns=PATIENT_COLUMNS), use_container_width=True,
+                         hide_index=True, column_config=column_config)
+            if len(patients_data) == SEARCH_LIMIT:
+                st.caption(f"Showing the {SEARCH_LIMIT} best matches, refine the search to narrow them down")
+    else:
+        pager = KeysetPager(
+            "patients_list",
+            ', '.join(PATIENT_COLUMNS),
+            "patients",
+            {
+                "Newest first": (("COALESCE(created_at, '')", "id"), "DESC"),
+                "Oldest first": (("COALESCE(created_at, '')", "id"), "ASC"),
+                "Name (A-Z)": (("name", "id"), "ASC"),
+            }
+        )
+        patients_data = pager.render(PATIENT_COLUMNS, column_config=column_config)
+
+    if patients_data:
+        # Statistics
+        st.subheader("📊 Patient Statistics")
+        Metrics().render('patients.total', 'patients.male', 'patients.female', 'patients.new_today')
+
+    else:
+        st.info("📭 No patient data available")
+
+page_profiler.finish()
 
 # Back to dashboard button
 if st.button("🏠 Back to Dashboard"):
@@ -1,8 +1,10 @@
 import streamlit as st
-import pandas as pd
 from datetime import datetime, date, timedelta
 from database import db
 from auth import auth
+from page_profiler import page_profiler
+from paging import KeysetPager
+from metrics import Metrics
 
 st.set_page_config(page_title="Appointments", page_icon="📅", layout="wide")
 
@@ -10,13 +12,18 @@ if not auth.is_logged_in():
     st.warning("⚠️ Please log in first")
     st.stop()
 
+page_profiler.start("pages/2_Appointments.py")
+
 st.title("📅 Appointments Management")
 
+# Figures for the stats tab, each table is read once per run
+metrics = Metrics()
+
 # Page tabs
 tab1, tab2, tab3, tab4 = st.tabs(
     ["📋 Appointment Schedule", "➕ Book New Appointment", "📊 Appointment Statistics", "⚙️ Settings"])
 
-with tab1:
+with tab1, page_profiler.section("📋 Appointment Schedule"):
     st.subheader("📋 Appointment Schedule")
 
     # Appointment filters
@@ -30,47 +37,38 @@ with tab1:
         doctor_options = ["All"] + [doc[0] for doc in doctors_result[0]] if doctors_result[0] else ["All"]
         filter_doctor = st.selectbox("👨‍⚕️ Doctor", doctor_options)
 
-    # Build filter query
-    query = """
-            SELECT a.id, \
-                   p.name, \
-                   a.doctor_name, \
-                   a.appointment_date, \
-                   a.appointment_time,
-                   a.status, \
-                   a.type, \
-                   a.notes, \
-                   p.phone
-            FROM appointments a
-                     JOIN patients p ON a.patient_id = p.id
-            WHERE 1 = 1 \
-            """
-    params = []
+    # Filters and sorting run in SQL, one page is fetched at a time
+    filters, params = [], []
 
     if filter_date:
-        query += " AND a.appointment_date = ?"
+        filters.append("a.appointment_date = ?")
         params.append(filter_date)
 
     if filter_status != "All":
-        query += " AND a.status = ?"
+        filters.append("a.status = ?")
         params.append(filter_status)
 
     if filter_doctor != "All":
-        query += " AND a.doctor_name = ?"
+        filters.append("a.doctor_name = ?")
         params.append(filter_doctor)
 
-    query += " ORDER BY a.appointment_date DESC, a.appointment_time DESC"
-
-    appointments_data, columns = db.execute_query(query, params)
-
-    if appointments_data:
-        df = pd.DataFrame(appointments_data,
-                          columns=["ID", "Patient", "Doctor", "Date", "Time", "Status", "Type", "Notes", "Phone"])
-        st.dataframe(df, use_container_width=True, hide_index=True)
-    else:
+    pager = KeysetPager(
+        "appointments_schedule",
+        """a.id, p.name, a.doctor_name, a.appointment_date, a.appointment_time,
+           a.status, a.type, a.notes, p.phone""",
+        "appointments a JOIN patients p ON a.patient_id = p.id",
+        {
+            "Latest first": (("a.appointment_date", "a.appointment_time", "a.id"), "DESC"),
+            "Earliest first": (("a.appointment_date", "a.appointment_time", "a.id"), "ASC"),
+        },
+        filters, params
+    )
+    appointments_data = pager.render(["ID", "Patient", "Doctor", "Date", "Time", "Status", "Type", "Notes", "Phone"])
+
+    if not appointments_data:
         st.info("📭 No appointments match search criteria")
 
-with tab2:
+with tab2, page_profiler.section("➕ Book New Appointment"):
     st.subheader("➕ Book New Appointment")
 
     with st.form("add_appointment_form", clear_on_submit=True):
@@ -110,7 +108,7 @@ with tab2:
                         VALUES (?, ?, ?, ?, ?, ?, ?) \
                         """
                 result, error = db.execute_query(query, (
-                    patient_id, doctor_name, appointment_date, appointment_time,
+                    patient_id, doctor_name, appointment_date, appointment_time.strftime("%H:%M"),
                     status, appointment_type, notes
                 ))
 
@@ -122,36 +120,13 @@ with tab2:
             else:
                 st.error("❌ Please fill all required fields (*)")
 
-with tab3:
+with tab3, page_profiler.section("📊 Appointment Statistics"):
     st.subheader("📊 Appointment Statistics")
 
-    col1, col2, col3, col4 = st.columns(4)
-
-    with col1:
-        total_appointments = db.execute_query("SELECT COUNT(*) FROM appointments")[0][0][0] if \
-        db.execute_query("SELECT COUNT(*) FROM appointments")[0] else 0
-        st.metric("Total Appointments", total_appointments)
-
-    with col2:
-        today_appointments = \
-        db.execute_query("SELECT COUNT(*) FROM appointments WHERE appointment_date = ?", (date.today(),))[0][0][0] if \
-        db.execute_query("SELECT COUNT(*) FROM appointments WHERE appointment_date = ?", (date.today(),))[0] else 0
-        st.metric("Today's Appointments", today_appointments)
+    metrics.render('appointments.total', 'appointments.today', 'appointments.completed',
+                   'appointments.upcoming_today')
 
-    with col3:
-        completed_appointments = db.execute_query("SELECT COUNT(*) FROM appointments WHERE status = 'Completed'")[0][0][
-            0] if db.execute_query("SELECT COUNT(*) FROM appointments WHERE status = 'Completed'")[0] else 0
-        st.metric("Completed Appointments", completed_appointments)
-
-    with col4:
-        upcoming_appointments = \
-        db.execute_query("SELECT COUNT(*) FROM appointments WHERE appointment_date = ? AND status = 'Scheduled'",
-                         (date.today(),))[0][0][0] if \
-        db.execute_query("SELECT COUNT(*) FROM appointments WHERE appointment_date = ? AND status = 'Scheduled'",
-                         (date.today(),))[0] else 0
-        st.metric("Upcoming Appointments", upcoming_appointments)
-
-with tab4:
+with tab4, page_profiler.section("⚙️ Settings"):
     st.subheader("⚙️ Appointment Settings")
 
     col1, col2 = st.columns(2)
@@ -177,6 +152,8 @@ with tab4:
     if st.button("💾 Save Settings", type="primary"):
         st.success("✅ Settings saved successfully!")
 
+page_profiler.finish()
+
 # Back to dashboard button
 if st.button("🏠 Back to Dashboard"):
     st.switch_page("app.py")
\ No newline at end of file
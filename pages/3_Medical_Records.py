@@ -1,21 +1,40 @@
 import streamlit as st
 import pandas as pd
-from datetime import datetime, date
-from database import db
+from datetime import datetime, date, timedelta
+from database import db, SEARCH_CANDIDATES
 from auth import auth
+from page_profiler import page_profiler
+import clinical_search
+from paging import KeysetPager
+from metrics import Metrics
 
 st.set_page_config(page_title="Medical Records", page_icon="📋", layout="wide")
 
+# Results per page in the clinical search tab
+SEARCH_PAGE_SIZE = 20
+
+# Visits shown at a time in a patient's expander
+VISITS_PER_PAGE = 5
+
+# Patients a search can filter the records list to; search_patients() ranks at most SEARCH_CANDIDATES matches
+PATIENT_FILTER_LIMIT = SEARCH_CANDIDATES
+
 if not auth.is_logged_in():
     st.warning("⚠️ Please log in first")
     st.stop()
 
+page_profiler.start("pages/3_Medical_Records.py")
+
 st.title("📋 Medical Records")
 
+# Figures for the stats tab, each table is read once per run
+metrics = Metrics()
+
 # Page tabs
-tab1, tab2, tab3 = st.tabs(["👥 Patient Medical Records", "➕ New Medical Record", "📊 Medical Statistics"])
+tab1, tab2, tab3, tab4 = st.tabs(
+    ["👥 Patient Medical Records", "➕ New Medical Record", "📊 Medical Statistics", "🔎 Clinical Search"])
 
-with tab1:
+with tab1, page_profiler.section("👥 Patient Medical Records"):
     st.subheader("👥 Patient Medical Records")
 
     # Search for patient
@@ -25,28 +44,46 @@ with tab1:
     with col2:
         search_btn = st.button("Search", use_container_width=True)
 
-    # Fetch patient data
-    query = """
-            SELECT p.id, \
-                   p.name, \
-                   p.phone, \
-                   p.date_of_birth, \
-                   p.gender, \
-                   p.blood_type,
-                   COUNT(mr.id)       as records_count,
-                   MAX(mr.visit_date) as last_visit
-            FROM patients p
-                     LEFT JOIN medical_records mr ON p.id = mr.patient_id \
-            """
-
-    params = []
+    # One page of patients with their visit counts
+    filters, params = [], []
     if search_term:
-        query += " WHERE p.name LIKE ? OR p.phone LIKE ?"
-        params = [f"%{search_term}%", f"%{search_term}%"]
-
-    query += " GROUP BY p.id ORDER BY p.name"
-
-    patients_data, columns = db.execute_query(query, params)
+        matches = [row[0] for row in db.search_patients(search_term, limit=PATIENT_FILTER_LIMIT, columns=['id'])]
+        if len(matches) == PATIENT_FILTER_LIMIT:
+            st.caption(f"Showing records of the {PATIENT_FILTER_LIMIT} best matching patients, "
+                       "refine the search to narrow them down")
+        filters.append(f"p.id IN ({', '.join('?' * len(matches)) or 'NULL'})")
+        params = matches
+
+    pager = KeysetPager(
+        "medical_records_patients",
+        """p.id, p.name, p.phone, p.date_of_birth, p.gender, p.blood_type,
+           (SELECT COUNT(*) FROM medical_records mr WHERE mr.patient_id = p.id) as records_count,
+           (SELECT MAX(mr.visit_date) FROM medical_records mr WHERE mr.patient_id = p.id) as last_visit""",
+        "patients p",
+        {
+            "Name (A-Z)": (("p.name", "p.id"), "ASC"),
+            "Newest patients": (("COALESCE(p.created_at, '')", "p.id"), "DESC"),
+        },
+        filters, params, page_sizes=(10, 25, 50)
+    )
+    patients_data = pager.current_page()
+
+    # Newest visits of every patient on the page in one query; a patient's
+    # older visits are only read once their expander is paged
+    visit_cursors = st.session_state.setdefault('visit_cursors', {})
+    first_pages = [patient[0] for patient in patients_data if len(visit_cursors.get(patient[0], [None])) == 1]
+    visits = {}
+    if first_pages:
+        for record in db.fetch_all(f"""
+                SELECT patient_id, id, visit_date, diagnosis, symptoms, prescription, tests, doctor_name, notes
+                FROM (SELECT mr.*,
+                             ROW_NUMBER() OVER (PARTITION BY patient_id ORDER BY visit_date DESC, id DESC) AS visit_number
+                      FROM medical_records mr
+                      WHERE patient_id IN ({', '.join('?' * len(first_pages))}))
+                WHERE visit_number <= ?
+                ORDER BY patient_id, visit_number
+                """, first_pages + [VISITS_PER_PAGE + 1]):
+            visits.setdefault(record[0], []).append(record[1:])
 
     if patients_data:
         for patient in patients_data:
@@ -63,35 +100,54 @@ with tab1:
                     st.write(f"**Last Visit:** {patient[7] or 'No visits'}")
 
                 # Display medical records for this patient
-                records_query = """
-                                SELECT visit_date, diagnosis, symptoms, prescription, tests, doctor_name, notes
-                                FROM medical_records
-                                WHERE patient_id = ?
-                                ORDER BY visit_date DESC \
-                                """
-                records_data, _ = db.execute_query(records_query, (patient[0],))
+                cursors = visit_cursors.get(patient[0], [None])
+                if len(cursors) == 1:
+                    records_data = visits.get(patient[0], [])
+                else:
+                    records_data = db.fetch_all("""
+                                                SELECT id, visit_date, diagnosis, symptoms, prescription, tests,
+                                                       doctor_name, notes
+                                                FROM medical_records
+                                                WHERE patient_id = ? AND (visit_date, id) < (?, ?)
+                                                ORDER BY visit_date DESC, id DESC
+                                                LIMIT ?
+                                                """, (patient[0], *cursors[-1], VISITS_PER_PAGE + 1))
+                has_older = len(records_data) > VISITS_PER_PAGE
+                records_data = records_data[:VISITS_PER_PAGE]
 
                 if records_data:
                     for record in records_data:
                         with st.container():
                             st.markdown("---")
-                            st.write(f"**📅 Visit Date:** {record[0]}")
-                            st.write(f"**👨‍⚕️ Doctor:** {record[5]}")
+                            st.write(f"**📅 Visit Date:** {record[1]}")
+                            st.write(f"**👨‍⚕️ Doctor:** {record[6]}")
 
                             col1, col2 = st.columns(2)
                             with col1:
-                                if record[1]:
-                                    st.write(f"**🩺 Diagnosis:** {record[1]}")
                                 if record[2]:
-                                    st.write(f"**🤒 Symptoms:** {record[2]}")
-                            with col2:
+                                    st.write(f"**🩺 Diagnosis:** {record[2]}")
                                 if record[3]:
-                                    st.write(f"**💊 Prescription:** {record[3]}")
+                                    st.write(f"**🤒 Symptoms:** {record[3]}")
+                            with col2:
                                 if record[4]:
-                                    st.write(f"**🔬 Tests:** {record[4]}")
-
-                            if record[6]:
-                                st.write(f"**📝 Notes:** {record[6]}")
+                                    st.write(f"**💊 Prescription:** {record[4]}")
+                                if record[5]:
+                                    st.write(f"**🔬 Tests:** {record[5]}")
+
+                            if record[7]:
+                                st.write(f"**📝 Notes:** {record[7]}")
+
+                    # Visit paging
+                    col1, col2 = st.columns(2)
+                    with col1:
+                        if len(cursors) > 1 and st.button("⬅️ Newer Visits", key=f"newer_visits_{patient[0]}"):
+                            visit_cursors[patient[0]] = cursors[:-1]
+                            st.rerun()
+                    with col2:
+                        if has_older and st.button("Older Visits ➡️", key=f"older_visits_{patient[0]}"):
+                            last = records_data[-1]
+                            visit_cursors[patient[0]] = cursors + [(last[1], last[0])]
+                            st.rerun()
                 else:
                     st.info("No medical records found for this patient")
 
@@ -102,7 +158,11 @@ with tab1:
                     st.session_state.show_add_record = True
                     st.rerun()
 
-with tab2:
+        pager.navigation(len(patients_data))
+    else:
+        st.info("📭 No patients found")
+
+with tab2, page_profiler.section("➕ New Medical Record"):
     st.subheader("➕ Add New Medical Record")
 
     if st.session_state.get('show_add_record', False):
@@ -161,39 +221,10 @@ with tab2:
     else:
         st.info("👈 Please select a patient from the records list to add a new medical record")
 
-with tab3:
+with tab3, page_profiler.section("📊 Medical Statistics"):
     st.subheader("📊 Medical Statistics")
 
-    col1, col2, col3, col4 = st.columns(4)
-
-    with col1:
-        total_records = db.execute_query("SELECT COUNT(*) FROM medical_records")[0][0][0] if \
-        db.execute_query("SELECT COUNT(*) FROM medical_records")[0] else 0
-        st.metric("Total Records", total_records)
-
-    with col2:
-        total_patients = db.execute_query("SELECT COUNT(DISTINCT patient_id) FROM medical_records")[0][0][0] if \
-        db.execute_query("SELECT COUNT(DISTINCT patient_id) FROM medical_records")[0] else 0
-        st.metric("Unique Patients", total_patients)
-
-    with col3:
-        monthly_visits = db.execute_query("""
-                                          SELECT COUNT(*)
-                                          FROM medical_records
-                                          WHERE strftime('%Y-%m', visit_date) = strftime('%Y-%m', 'now')
-                                          """)[0][0][0] if db.execute_query(
-            "SELECT COUNT(*) FROM medical_records WHERE strftime('%Y-%m', visit_date) = strftime('%Y-%m', 'now')")[
-            0] else 0
-        st.metric("Visits This Month", monthly_visits)
-
-    with col4:
-        today_visits = db.execute_query("""
-                                        SELECT COUNT(*)
-                                        FROM medical_records
-                                        WHERE visit_date = date ('now')
-                                        """)[0][0][0] if \
-        db.execute_query("SELECT COUNT(*) FROM medical_records WHERE visit_date = date('now')")[0] else 0
-        st.metric("Visits Today", today_visits)
+    metrics.render('records.total', 'records.patients', 'records.this_month', 'records.today')
 
     # Detailed statistics
     st.subheader("📈 Detailed Statistics")
@@ -230,6 +261,70 @@ with tab3:
             trend_df = pd.DataFrame(monthly_trend, columns=["Month", "Count"])
             st.line_chart(trend_df.set_index("Month"))
 
+with tab4, page_profiler.section("🔎 Clinical Search"):
+    st.subheader("🔎 Clinical Search")
+
+    search_text = st.text_input("Search diagnoses, symptoms, prescriptions, tests and notes",
+                                placeholder='e.g. amoxicillin, "chest pain" fever')
+
+    col1, col2, col3, col4 = st.columns([2, 2, 2, 2])
+    with col1:
+        search_start = st.date_input("From", value=date.today() - timedelta(days=365), key="clinical_search_start")
+    with col2:
+        search_end = st.date_input("To", value=date.today(), key="clinical_search_end")
+    with col3:
+        doctors = [row[0] for row in db.fetch_all("""
+                                                  SELECT DISTINCT doctor_name
+                                                  FROM medical_records
+                                                  WHERE doctor_name IS NOT NULL
+                                                  ORDER BY doctor_name
+                                                  """)]
+        search_doctor = st.selectbox("Doctor", ["All"] + doctors, key="clinical_search_doctor")
+    with col4:
+        search_order = st.radio("Sort", ["Latest first", "Most relevant"], horizontal=True)
+
+    # Start from the first page whenever the search changes
+    search_key = (search_text, search_start, search_end, search_doctor, search_order)
+    if st.session_state.get('clinical_search_key') != search_key:
+        st.session_state.clinical_search_key = search_key
+        st.session_state.clinical_search_pages = [None]
+
+    if search_text.strip():
+        pages = st.session_state.clinical_search_pages
+        latest = search_order == "Latest first"
+        results = clinical_search.search(
+            db, search_text, search_start, search_end,
+            doctor=None if search_doctor == "All" else search_doctor,
+            order='latest' if latest else 'relevance',
+            limit=SEARCH_PAGE_SIZE + 1,
+            after=pages[-1] if latest else None,
+            offset=(len(pages) - 1) * SEARCH_PAGE_SIZE
+        )
+        has_more = len(results) > SEARCH_PAGE_SIZE
+        results = results[:SEARCH_PAGE_SIZE]
+
+        if results:
+            st.caption(f"Page {len(pages)}")
+            for record_id, patient_id, patient_name, visit_date, doctor_name, snippet in results:
+                with st.container():
+                    st.markdown(f"**📅 {visit_date}** | 👤 {patient_name or 'Unknown patient'} | 👨‍⚕️ {doctor_name}")
+                    st.markdown(snippet)
+                    st.markdown("---")
+        else:
+            st.info("📭 No medical records match this search")
+
+        col1, col2 = st.columns(2)
+        with col1:
+            if len(pages) > 1 and st.button("⬅️ Previous", use_container_width=True):
+                pages.pop()
+                st.rerun()
+        with col2:
+            if has_more and st.button("Next ➡️", use_container_width=True):
+                pages.append((results[-1][3], results[-1][0]))
+                st.rerun()
+
+page_profiler.finish()
+
 # Back to dashboard button
 if st.button("🏠 Back to Dashboard"):
     st.switch_page("app.py")
\ No newline at end of file
@@ -3,6 +3,9 @@ import pandas as pd
 from datetime import datetime, date
 from database import db
 from auth import auth
+from page_profiler import page_profiler
+from paging import KeysetPager
+from metrics import Metrics
 
 st.set_page_config(page_title="Bills Management", page_icon="💰", layout="wide")
 
@@ -10,12 +13,17 @@ if not auth.is_logged_in():
     st.warning("⚠️ Please log in first")
     st.stop()
 
+page_profiler.start("pages/4_Bills.py")
+
 st.title("💰 Bills Management")
 
+# Figures for the stats tab, each table is read once per run
+metrics = Metrics()
+
 # Page tabs
 tab1, tab2, tab3, tab4 = st.tabs(["🧾 Bills List", "➕ New Bill", "💳 Payments", "📊 Financial Statistics"])
 
-with tab1:
+with tab1, page_profiler.section("🧾 Bills List"):
     st.subheader("🧾 Bills List")
 
     # Bills filtering
@@ -27,52 +35,46 @@ with tab1:
     with col3:
         end_date = st.date_input("To Date", value=date.today())
 
-    # Build query
-    query = """
-            SELECT b.id, \
-                   p.name, \
-                   b.amount, \
-                   b.paid_amount, \
-                   b.payment_status,
-                   b.bill_date, \
-                   b.services, \
-                   b.payment_method
-            FROM bills b
-                     JOIN patients p ON b.patient_id = p.id
-            WHERE b.bill_date BETWEEN ? AND ? \
-            """
+    # Filters and sorting run in SQL, one page is fetched at a time
+    source = "bills b JOIN patients p ON b.patient_id = p.id"
+    filters = ["b.bill_date BETWEEN ? AND ?"]
     params = [start_date, end_date]
 
     if filter_status != "All":
-        query += " AND b.payment_status = ?"
+        filters.append("b.payment_status = ?")
         params.append(filter_status)
 
-    query += " ORDER BY b.bill_date DESC"
 
-    bills_data, columns = db.execute_query(query, params)
+    # Color formatting based on status
+    def color_status(status):
+        if status == "Paid":
+            return "background-color: #d4edda; color: #155724;"
+        elif status == "Unpaid":
+            return "background-color: #f8d7da; color: #721c24;"
+        else:
+            return "background-color: #fff3cd; color: #856404;"
+
+
+    pager = KeysetPager(
+        "bills_list",
+        "b.id, p.name, b.amount, b.paid_amount, b.payment_status, b.bill_date, b.services, b.payment_method",
+        source,
+        {
+            "Latest first": (("COALESCE(b.bill_date, '')", "b.id"), "DESC"),
+            "Oldest first": (("COALESCE(b.bill_date, '')", "b.id"), "ASC"),
+        },
+        filters, params
+    )
+    bills_data = pager.render(["ID", "Patient", "Amount", "Paid", "Status", "Date", "Services", "Payment Method"],
+                              style=lambda df: df.style.applymap(color_status, subset=["Status"]))
 
     if bills_data:
-        df = pd.DataFrame(bills_data,
-                          columns=["ID", "Patient", "Amount", "Paid", "Status", "Date", "Services", "Payment Method"])
-
-
-        # Color formatting based on status
-        def color_status(status):
-            if status == "Paid":
-                return "background-color: #d4edda; color: #155724;"
-            elif status == "Unpaid":
-                return "background-color: #f8d7da; color: #721c24;"
-            else:
-                return "background-color: #fff3cd; color: #856404;"
-
-
-        styled_df = df.style.applymap(color_status, subset=["Status"])
-
-        st.dataframe(styled_df, use_container_width=True, hide_index=True)
-
-        # Total amounts
-        total_amount = sum(bill[2] for bill in bills_data)
-        total_paid = sum(bill[3] for bill in bills_data)
+        # Total amounts over every matching bill, not just this page
+        total_amount, total_paid = db.fetch_one(f"""
+            SELECT COALESCE(SUM(b.amount), 0), COALESCE(SUM(b.paid_amount), 0)
+            FROM {source}
+            WHERE {' AND '.join(filters)}
+        """, params)
         remaining = total_amount - total_paid
 
         col1, col2, col3 = st.columns(3)
@@ -86,7 +88,7 @@ with tab1:
     else:
         st.info("📭 No bills match the search criteria")
 
-with tab2:
+with tab2, page_profiler.section("➕ New Bill"):
     st.subheader("➕ Create New Bill")
 
     with st.form("add_bill_form", clear_on_submit=True):
@@ -154,7 +156,7 @@ with tab2:
             else:
                 st.error("❌ Please fill all required fields (*)")
 
-with tab3:
+with tab3, page_profiler.section("💳 Payments"):
     st.subheader("💳 Record Payments")
 
     # Unpaid bills
@@ -208,33 +210,10 @@ with tab3:
     else:
         st.success("✅ No pending bills for payment")
 
-with tab4:
+with tab4, page_profiler.section("📊 Financial Statistics"):
     st.subheader("📊 Financial Statistics")
 
-    col1, col2, col3, col4 = st.columns(4)
-
-    with col1:
-        total_bills = db.execute_query("SELECT COUNT(*) FROM bills")[0][0][0] if \
-        db.execute_query("SELECT COUNT(*) FROM bills")[0] else 0
-        st.metric("Total Bills", total_bills)
-
-    with col2:
-        total_revenue = db.execute_query("SELECT COALESCE(SUM(amount), 0) FROM bills")[0][0][0] if \
-        db.execute_query("SELECT COALESCE(SUM(amount), 0) FROM bills")[0] else 0
-        st.metric("Total Revenue", f"${total_revenue:,.0f}")
-
-    with col3:
-        paid_revenue = db.execute_query("SELECT COALESCE(SUM(paid_amount), 0) FROM bills")[0][0][0] if \
-        db.execute_query("SELECT COALESCE(SUM(paid_amount), 0) FROM bills")[0] else 0
-        st.metric("Collected Revenue", f"${paid_revenue:,.0f}")
-
-    with col4:
-        pending_revenue = \
-        db.execute_query("SELECT COALESCE(SUM(amount - paid_amount), 0) FROM bills WHERE payment_status != 'Paid'")[0][
-            0][0] if \
-        db.execute_query("SELECT COALESCE(SUM(amount - paid_amount), 0) FROM bills WHERE payment_status != 'Paid'")[
-            0] else 0
-        st.metric("Pending Amount", f"${pending_revenue:,.0f}")
+    metrics.render('bills.total', 'bills.revenue', 'bills.collected', 'bills.pending')
 
     # Revenue analysis
     st.subheader("📈 Revenue Analysis")
@@ -271,6 +250,8 @@ with tab4:
             for method in payment_methods:
                 st.write(f"- {method[0]}: {method[1]} bills (${method[2]:,.0f})")
 
+page_profiler.finish()
+
 # Back to dashboard button
 if st.button("🏠 Back to Dashboard"):
     st.switch_page("app.py")
\ No newline at end of file
@@ -1,12 +1,15 @@
 import streamlit as st
 import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
 from datetime import datetime, date, timedelta
-import io
-import time
+import os
+import json
 from database import db
 from auth import auth
+from page_profiler import page_profiler
+from metrics import Metrics
+from analytics import analytics
+import exports
+import report_jobs
 
 st.set_page_config(page_title="Reports and Analytics", page_icon="📊", layout="wide")
 
@@ -15,30 +18,24 @@ if not auth.is_logged_in():
     st.stop()
 
 
+def plotly_express():
+    """plotly.express, imported when the first chart is drawn rather than with the page"""
+    import plotly.express as px
+    return px
+
+
 # Helper functions for data loading
 def get_main_stats(start_date, end_date):
     """Get main statistics"""
     try:
-        # New patients
-        new_patients_result = db.execute_query(
-            "SELECT COUNT(*) FROM patients WHERE date(created_at) BETWEEN ? AND ?",
-            (start_date, end_date)
-        )
-        new_patients = new_patients_result[0][0][0] if new_patients_result[0] else 0
-
-        # Appointments
-        appointments_result = db.execute_query(
-            "SELECT COUNT(*) FROM appointments WHERE appointment_date BETWEEN ? AND ?",
-            (start_date, end_date)
-        )
-        total_appointments = appointments_result[0][0][0] if appointments_result[0] else 0
-
-        # Revenue
-        revenue_result = db.execute_query(
-            "SELECT COALESCE(SUM(amount), 0) FROM bills WHERE bill_date BETWEEN ? AND ?",
-            (start_date, end_date)
-        )
-        total_revenue = revenue_result[0][0][0] if revenue_result[0] else 0
+        # Period totals from the daily rollups
+        new_patients, total_appointments, total_revenue = analytics.fetch_one("""
+            SELECT (SELECT CAST(COALESCE(SUM(patient_count), 0) AS INTEGER) FROM daily_new_patients
+                    WHERE day BETWEEN ? AND ?),
+                   (SELECT CAST(COALESCE(SUM(appointment_count), 0) AS INTEGER) FROM daily_appointments_by_status
+                    WHERE day BETWEEN ? AND ?),
+                   (SELECT COALESCE(SUM(revenue), 0) FROM daily_revenue WHERE day BETWEEN ? AND ?)
+        """, (start_date, end_date) * 3)
 
         # Working days
         working_days = (end_date - start_date).days + 1
@@ -70,18 +67,12 @@ def get_main_stats(start_date, end_date):
 def get_revenue_trend(start_date, end_date):
     """Get revenue trend"""
     try:
-        data = db.execute_query("""
-                                SELECT bill_date as date, SUM(amount) as revenue
-                                FROM bills
-                                WHERE bill_date BETWEEN ? AND ?
-                                GROUP BY bill_date
-                                ORDER BY bill_date
-                                """, (start_date, end_date))
-
-        if data and data[0]:
-            df = pd.DataFrame(data[0], columns=["Date", "Revenue"])
-            df['Date'] = pd.to_datetime(df['Date'])
-            return df
+        return analytics.get_dataframe("""
+                                SELECT day as Date, revenue as Revenue
+                                FROM daily_revenue
+                                WHERE day BETWEEN ? AND ? AND bill_count > 0
+                                ORDER BY day
+                                """, (start_date, end_date), dtypes={'Date': 'datetime', 'Revenue': 'float'})
     except Exception as e:
         st.error(f"Error loading revenue trend: {str(e)}")
     return pd.DataFrame()
@@ -90,27 +81,72 @@ def get_revenue_trend(start_date, end_date):
 def get_appointment_distribution(start_date, end_date):
     """Get appointment distribution"""
     try:
-        data = db.execute_query("""
-                                SELECT status, COUNT(*) as count
-                                FROM appointments
-                                WHERE appointment_date BETWEEN ? AND ?
+        return analytics.get_dataframe("""
+                                SELECT NULLIF(status, '') as Status, SUM(appointment_count) as Count
+                                FROM daily_appointments_by_status
+                                WHERE day BETWEEN ? AND ?
                                 GROUP BY status
-                                """, (start_date, end_date))
-
-        if data and data[0]:
-            return pd.DataFrame(data[0], columns=["Status", "Count"])
+                                HAVING SUM(appointment_count) > 0
+                                """, (start_date, end_date), dtypes={'Status': 'category', 'Count': 'integer'})
     except Exception as e:
         st.error(f"Error loading appointment distribution: {str(e)}")
     return pd.DataFrame()
 
 
+def get_gender_distribution():
+    """Get patient gender distribution"""
+    try:
+        return analytics.get_dataframe("""
+                                       SELECT gender as Gender, COUNT(*) as Count
+                                       FROM patients
+                                       WHERE gender IS NOT NULL AND gender != ''
+                                       GROUP BY gender
+                                       """)
+    except Exception as e:
+        st.error(f"Error loading gender distribution: {str(e)}")
+    return pd.DataFrame()
+
+
+def get_age_distribution():
+    """Get patient age group distribution"""
+    # Birth date cut-offs instead of julianday(), so both backends run the same SQL
+    today = date.today()
+
+    def born_before(years):
+        # Feb 29 has no counterpart in most years
+        return today.replace(year=today.year - years, day=28 if today.month == 2 and today.day == 29 else today.day)
+
+    try:
+        return analytics.get_dataframe("""
+                                       SELECT CASE
+                                                  WHEN date_of_birth IS NULL THEN 'Not specified'
+                                                  WHEN date_of_birth > ? THEN 'Under 18'
+                                                  WHEN date_of_birth > ? THEN '18-30'
+                                                  WHEN date_of_birth > ? THEN '31-45'
+                                                  WHEN date_of_birth > ? THEN '46-60'
+                                                  ELSE 'Over 60'
+                                                  END as "Age Group",
+                                              COUNT(*) as Count
+                                       FROM patients
+                                       GROUP BY 1
+                                       """, (born_before(18), born_before(31), born_before(46), born_before(61)))
+    except Exception as e:
+        st.error(f"Error loading age distribution: {str(e)}")
+    return pd.DataFrame()
+
+
+page_profiler.start("pages/5_Reports.py")
+
 st.title("📊 Reports and Analytics")
 
+# Figures for the report tabs, each table is read once per run
+metrics = Metrics()
+
 # Page tabs
 tab1, tab2, tab3, tab4, tab5 = st.tabs(
     ["🏥 Overview", "👥 Patient Reports", "📅 Appointment Reports", "💰 Financial Reports", "📤 Export"])
 
-with tab1:
+with tab1, page_profiler.section("🏥 Overview"):
     st.subheader("🏥 Clinic Performance Overview")
 
     # Time period selection
@@ -150,6 +186,8 @@ with tab1:
     st.subheader("📈 Key Indicators")
 
     stats = get_main_stats(start_date, end_date)
+    if analytics.active_backend() == 'duckdb':
+        st.caption(f"Figures from the DuckDB analytics snapshot taken at {analytics.snapshot_time:%H:%M:%S}")
 
     col1, col2, col3, col4 = st.columns(4)
 
@@ -186,11 +224,11 @@ with tab1:
     # Main charts
     col1, col2 = st.columns(2)
 
-    with col1:
+    with col1, page_profiler.section("Revenue trend chart"):
         # Revenue trend
         revenue_data = get_revenue_trend(start_date, end_date)
         if not revenue_data.empty:
-            fig = px.line(
+            fig = plotly_express().line(
                 revenue_data,
                 x='Date',
                 y='Revenue',
@@ -206,11 +244,11 @@ with tab1:
         else:
             st.info("No revenue data for selected period")
 
-    with col2:
+    with col2, page_profiler.section("Appointment status chart"):
         # Appointment distribution
         appointment_dist = get_appointment_distribution(start_date, end_date)
         if not appointment_dist.empty:
-            fig = px.pie(
+            fig = plotly_express().pie(
                 appointment_dist,
                 values='Count',
                 names='Status',
@@ -221,49 +259,20 @@ with tab1:
         else:
             st.info("No appointment data for selected period")
 
-with tab2:
+with tab2, page_profiler.section("👥 Patient Reports"):
     st.subheader("👥 Patient Reports and Analysis")
 
-    col1, col2, col3 = st.columns(3)
-
-    with col1:
-        total_patients_result = db.execute_query("SELECT COUNT(*) FROM patients")
-        total_patients = total_patients_result[0][0][0] if total_patients_result[0] else 0
-        st.metric("Total Patients", total_patients)
-
-    with col2:
-        active_patients_result = db.execute_query("""
-                                                  SELECT COUNT(DISTINCT patient_id)
-                                                  FROM medical_records
-                                                  WHERE visit_date >= date ('now', '-30 days')
-                                                  """)
-        active_patients = active_patients_result[0][0][0] if active_patients_result[0] else 0
-        st.metric("Active Patients", active_patients)
-
-    with col3:
-        new_patients_month_result = db.execute_query("""
-                                                     SELECT COUNT(*)
-                                                     FROM patients
-                                                     WHERE created_at >= date ('now', '-30 days')
-                                                     """)
-        new_patients_month = new_patients_month_result[0][0][0] if new_patients_month_result[0] else 0
-        st.metric("New Patients (Last 30 days)", new_patients_month)
+    metrics.render('patients.total', 'records.active_patients', 'patients.new_30_days')
 
     # Patient charts
     col1, col2 = st.columns(2)
 
-    with col1:
+    with col1, page_profiler.section("Gender chart"):
         # Gender distribution
-        gender_dist_result = db.execute_query("""
-                                              SELECT gender, COUNT(*) as count
-                                              FROM patients
-                                              WHERE gender IS NOT NULL AND gender != ''
-                                              GROUP BY gender
-                                              """)
-
-        if gender_dist_result and gender_dist_result[0]:
-            gender_df = pd.DataFrame(gender_dist_result[0], columns=["Gender", "Count"])
-            fig = px.pie(
+        gender_df = get_gender_distribution()
+
+        if not gender_df.empty:
+            fig = plotly_express().pie(
                 gender_df,
                 values='Count',
                 names='Gender',
@@ -273,29 +282,12 @@ with tab2:
         else:
             st.info("No gender data available")
 
-    with col2:
+    with col2, page_profiler.section("Age group chart"):
         # Age distribution
-        age_dist_result = db.execute_query("""
-                                           SELECT CASE
-                                                      WHEN date_of_birth IS NULL THEN 'Not specified'
-                                                      WHEN (julianday('now') - julianday(date_of_birth)) / 365 < 18
-                                                          THEN 'Under 18'
-                                                      WHEN (julianday('now') - julianday(date_of_birth)) / 365 BETWEEN 18 AND 30
-                                                          THEN '18-30'
-                                                      WHEN (julianday('now') - julianday(date_of_birth)) / 365 BETWEEN 31 AND 45
-                                                          THEN '31-45'
-                                                      WHEN (julianday('now') - julianday(date_of_birth)) / 365 BETWEEN 46 AND 60
-                                                          THEN '46-60'
-                                                      ELSE 'Over 60'
-                                                      END as age_group,
-                                                  COUNT(*) as count
-                                           FROM patients
-                                           GROUP BY age_group
-                                           """)
-
-        if age_dist_result and age_dist_result[0]:
-            age_df = pd.DataFrame(age_dist_result[0], columns=["Age Group", "Count"])
-            fig = px.bar(
+        age_df = get_age_distribution()
+
+        if not age_df.empty:
+            fig = plotly_express().bar(
                 age_df,
                 x='Age Group',
                 y='Count',
@@ -306,89 +298,33 @@ with tab2:
         else:
             st.info("No age data available")
 
-with tab3:
+with tab3, page_profiler.section("📅 Appointment Reports"):
     st.subheader("📅 Appointment Performance Analysis")
 
-    col1, col2, col3, col4 = st.columns(4)
-
-    with col1:
-        total_appointments_result = db.execute_query("SELECT COUNT(*) FROM appointments")
-        total_appointments = total_appointments_result[0][0][0] if total_appointments_result[0] else 0
-        st.metric("Total Appointments", total_appointments)
-
-    with col2:
-        completed_rate_result = db.execute_query("""
-                                                 SELECT ROUND(100.0 * COUNT(*) / (SELECT COUNT(*) FROM appointments), 1)
-                                                 FROM appointments
-                                                 WHERE status = 'Completed'
-                                                 """)
-        completed_rate = completed_rate_result[0][0][0] if completed_rate_result[0] else 0
-        st.metric("Completion Rate", f"{completed_rate}%")
-
-    with col3:
-        cancellation_rate_result = db.execute_query("""
-                                                    SELECT ROUND(100.0 * COUNT(*) / (SELECT COUNT(*) FROM appointments), 1)
-                                                    FROM appointments
-                                                    WHERE status = 'Cancelled'
-                                                    """)
-        cancellation_rate = cancellation_rate_result[0][0][0] if cancellation_rate_result[0] else 0
-        st.metric("Cancellation Rate", f"{cancellation_rate}%")
+    metrics.render('appointments.total', 'appointments.completion_rate', 'appointments.cancellation_rate',
+                   'appointments.average_daily')
 
-    with col4:
-        avg_daily_result = db.execute_query("""
-                                            SELECT ROUND(AVG(daily_count), 1)
-                                            FROM (SELECT appointment_date, COUNT(*) as daily_count
-                                                  FROM appointments
-                                                  GROUP BY appointment_date)
-                                            """)
-        avg_daily = avg_daily_result[0][0][0] if avg_daily_result[0] else 0
-        st.metric("Average Daily Appointments", avg_daily)
-
-with tab4:
+with tab4, page_profiler.section("💰 Financial Reports"):
     st.subheader("💰 Financial Analysis and Reports")
 
-    col1, col2, col3, col4 = st.columns(4)
-
-    with col1:
-        total_revenue_result = db.execute_query("SELECT COALESCE(SUM(amount), 0) FROM bills")
-        total_revenue = total_revenue_result[0][0][0] if total_revenue_result[0] else 0
-        st.metric("Total Revenue", f"${total_revenue:,.0f}")
-
-    with col2:
-        collected_revenue_result = db.execute_query("SELECT COALESCE(SUM(paid_amount), 0) FROM bills")
-        collected_revenue = collected_revenue_result[0][0][0] if collected_revenue_result[0] else 0
-        st.metric("Collected Revenue", f"${collected_revenue:,.0f}")
-
-    with col3:
-        pending_revenue_result = db.execute_query(
-            "SELECT COALESCE(SUM(amount - paid_amount), 0) FROM bills WHERE payment_status != 'Paid'")
-        pending_revenue = pending_revenue_result[0][0][0] if pending_revenue_result[0] else 0
-        st.metric("Pending Amount", f"${pending_revenue:,.0f}")
-
-    with col4:
-        collection_rate = (collected_revenue / total_revenue * 100) if total_revenue > 0 else 0
-        st.metric("Collection Rate", f"{collection_rate:.1f}%")
+    metrics.render('bills.revenue', 'bills.collected', 'bills.pending', 'bills.collection_rate')
 
-with tab5:
+with tab5, page_profiler.section("📤 Export"):
     st.subheader("📤 Export Reports and Data")
 
     col1, col2 = st.columns(2)
 
     with col1:
         st.write("**📋 Select Report Type**")
-        report_type = st.selectbox("Report Type", [
-            "Comprehensive Report",
-            "Patients Report",
-            "Appointments Report",
-            "Bills Report",
-            "Medical Records Report"
-        ])
+        report_type = st.selectbox("Report Type", list(exports.REPORT_DATASETS))
 
         export_format = st.selectbox("File Format", ["Excel", "CSV", "PDF"])
 
-        if report_type == "Comprehensive Report":
-            start_date_export = st.date_input("From Date", value=date.today().replace(day=1), key="export_start")
-            end_date_export = st.date_input("To Date", value=date.today(), key="export_end")
+        start_date_export = st.date_input("From Date", value=date.today().replace(day=1), key="export_start")
+        end_date_export = st.date_input("To Date", value=date.today(), key="export_end")
+
+        if export_format == "CSV":
+            compress_export = st.checkbox("Compress (gzip)", help="Several datasets are exported as one ZIP file")
 
         include_charts = st.checkbox("Include charts and graphs")
 
@@ -424,40 +360,15 @@ with tab5:
 
     with col1:
         if st.button("📥 Export Data", use_container_width=True, type="primary"):
-            with st.spinner("Generating report..."):
-                time.sleep(2)
-                st.success("✅ Report generated successfully!")
-
-                # Create sample data for export
-                if report_type == "Patients Report":
-                    data = db.get_dataframe("SELECT * FROM patients LIMIT 100")
-                elif report_type == "Appointments Report":
-                    data = db.get_dataframe("SELECT * FROM appointments LIMIT 100")
-                elif report_type == "Bills Report":
-                    data = db.get_dataframe("SELECT * FROM bills LIMIT 100")
-                else:
-                    data = db.get_dataframe("SELECT * FROM patients LIMIT 10")
-
-                if export_format == "Excel":
-                    buffer = io.BytesIO()
-                    with pd.ExcelWriter(buffer, engine='openpyxl') as writer:
-                        data.to_excel(writer, index=False, sheet_name='Report')
-                    st.download_button(
-                        label="📥 Download Excel File",
-                        data=buffer.getvalue(),
-                        file_name=f"{report_type}_{date.today()}.xlsx",
-                        mime="application/vnd.ms-excel",
-                        use_container_width=True
-                    )
-                elif export_format == "CSV":
-                    csv = data.to_csv(index=False).encode('utf-8')
-                    st.download_button(
-                        label="📥 Download CSV File",
-                        data=csv,
-                        file_name=f"{report_type}_{date.today()}.csv",
-                        mime="text/csv",
-                        use_container_width=True
-                    )
+            job_id, reused = report_jobs.jobs.submit(
+                report_type, export_format, start_date_export, end_date_export,
+                compress=export_format == "CSV" and compress_export,
+                requested_by=st.session_state.user['username']
+            )
+            if reused:
+                st.success("♻️ The same report was requested recently, see Report Jobs below")
+            else:
+                st.success("⏳ Report queued, it is generated in the background")
 
     with col2:
         if st.button("🖨️ Print Report", use_container_width=True):
@@ -467,6 +378,57 @@ with tab5:
         if st.button("📧 Send by Email", use_container_width=True):
             st.info("🚧 Email feature under development")
 
+    # Reports generated in the background
+    st.subheader("🗂️ Report Jobs")
+    if st.button("🔄 Refresh", key="refresh_report_jobs"):
+        st.rerun()
+
+    user_jobs = report_jobs.jobs.recent(st.session_state.user['username'])
+    if not user_jobs:
+        st.info("📭 No reports requested yet")
+
+    for job in user_jobs:
+        params = json.loads(job['params'])
+        col1, col2, col3 = st.columns([3, 2, 1])
+
+        with col1:
+            st.write(f"**{job['report_type']}** · {job['export_format']} · "
+                     f"{params['start_date']} → {params['end_date']}")
+            st.caption(f"Requested {job['created_at']}")
+
+        with col2:
+            if job['status'] in report_jobs.ACTIVE_STATUSES:
+                st.progress(job['progress'], text=f"{job['status'].title()} {job['progress']:.0%}")
+            elif job['status'] == 'done':
+                st.write(f"✅ Done · {job['row_count']:,} rows")
+            elif job['status'] == 'failed':
+                st.write(f"❌ Failed: {job['error']}")
+            else:
+                st.write(f"⚪ {job['status'].title()}")
+
+        with col3:
+            path = job['artifact_path']
+            if job['status'] in report_jobs.ACTIVE_STATUSES:
+                if st.button("✖️ Cancel", key=f"cancel_job_{job['id']}", use_container_width=True):
+                    report_jobs.jobs.cancel(job['id'])
+                    st.rerun()
+            elif job['status'] == 'done' and path and os.path.exists(path):
+                # Only the chosen file is loaded for the download button
+                if st.session_state.get('download_job') == job['id']:
+                    suffix = next(s for s in exports.MIME_TYPES if path.endswith(s))
+                    with open(path, 'rb') as file:
+                        st.download_button(
+                            label="💾 Save",
+                            data=file,
+                            file_name=f"{job['report_type']}_{params['start_date']}_{params['end_date']}{suffix}",
+                            mime=exports.MIME_TYPES[suffix],
+                            key=f"save_job_{job['id']}",
+                            use_container_width=True
+                        )
+                elif st.button("📥 Download", key=f"download_job_{job['id']}", use_container_width=True):
+                    st.session_state.download_job = job['id']
+                    st.rerun()
+
     # Data preview
     st.subheader("👀 Data Preview")
 
@@ -489,6 +451,8 @@ with tab5:
 
     st.dataframe(preview_data, use_container_width=True)
 
+page_profiler.finish()
+
 # Back to dashboard button
 if st.button("🏠 Back to Dashboard"):
     st.switch_page("app.py")
\ No newline at end of file
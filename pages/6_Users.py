@@ -4,6 +4,8 @@ import hashlib
 from datetime import datetime
 from database import db
 from auth import auth
+from page_profiler import page_profiler
+from metrics import Metrics
 
 st.set_page_config(page_title="Users Management", page_icon="👤", layout="wide")
 
@@ -16,12 +18,17 @@ if st.session_state.user['role'] != 'admin':
     st.error("⛔ You don't have permission to access this page")
     st.stop()
 
+page_profiler.start("pages/6_Users.py")
+
 st.title("👤 Users Management")
 
+# Figures for the stats tab, each table is read once per run
+metrics = Metrics()
+
 # Page tabs
 tab1, tab2, tab3 = st.tabs(["📋 Users List", "➕ New User", "📊 User Permissions"])
 
-with tab1:
+with tab1, page_profiler.section("📋 Users List"):
     st.subheader("📋 Users List")
 
     # Fetch users data
@@ -89,7 +96,7 @@ with tab1:
     else:
         st.info("📭 No users registered")
 
-with tab2:
+with tab2, page_profiler.section("➕ New User"):
     st.subheader("➕ Add New User")
 
     with st.form("add_user_form", clear_on_submit=True):
@@ -141,7 +148,7 @@ with tab2:
             else:
                 st.error("❌ Please fill all required fields (*)")
 
-with tab3:
+with tab3, page_profiler.section("📊 User Permissions"):
     st.subheader("📊 User Permissions")
 
     # Define roles and permissions
@@ -192,27 +199,7 @@ with tab3:
     # User activity statistics
     st.subheader("📈 User Activity")
 
-    col1, col2, col3 = st.columns(3)
-
-    with col1:
-        total_users = db.execute_query("SELECT COUNT(*) FROM users")[0][0][0] if \
-        db.execute_query("SELECT COUNT(*) FROM users")[0] else 0
-        st.metric("Total Users", total_users)
-
-    with col2:
-        active_users = db.execute_query("SELECT COUNT(*) FROM users WHERE is_active = 1")[0][0][0] if \
-        db.execute_query("SELECT COUNT(*) FROM users WHERE is_active = 1")[0] else 0
-        st.metric("Active Users", active_users)
-
-    with col3:
-        new_users_month = db.execute_query("""
-                                           SELECT COUNT(*)
-                                           FROM users
-                                           WHERE strftime('%Y-%m', created_at) = strftime('%Y-%m', 'now')
-                                           """)[0][0][0] if \
-        db.execute_query("SELECT COUNT(*) FROM users WHERE strftime('%Y-%m', created_at) = strftime('%Y-%m', 'now')")[
-            0] else 0
-        st.metric("New Users This Month", new_users_month)
+    metrics.render('users.total', 'users.active', 'users.new_this_month')
 
 # Edit user form
 if st.session_state.get('show_edit_form', False):
@@ -264,6 +251,8 @@ if st.session_state.get('show_edit_form', False):
             st.session_state.show_edit_form = False
             st.rerun()
 
+page_profiler.finish()
+
 # Back to dashboard button
 if st.button("🏠 Back to Dashboard"):
     st.switch_page("app.py")
\ No newline at end of file
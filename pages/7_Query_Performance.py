@@ -0,0 +1,124 @@
+import streamlit as st
+import pandas as pd
+from database import db
+from auth import auth
+from page_profiler import page_profiler
+
+st.set_page_config(page_title="Query Performance", page_icon="🐢", layout="wide")
+
+if not auth.is_logged_in():
+    st.warning("⚠️ Please log in first")
+    st.stop()
+
+# Check user permissions
+if st.session_state.user['role'] != 'admin':
+    st.error("⛔ You don't have permission to access this page")
+    st.stop()
+
+page_profiler.start("pages/7_Query_Performance.py")
+
+st.title("🐢 Query Performance")
+
+# Profiler settings
+col1, col2, col3 = st.columns([2, 2, 1])
+with col1:
+    top_n = st.number_input("Number of queries", min_value=5, max_value=100, value=20, step=5)
+with col2:
+    db.profiler.slow_query_ms = st.number_input("Slow query threshold (ms)", min_value=1.0,
+                                                value=float(db.profiler.slow_query_ms), step=10.0)
+with col3:
+    st.write("")
+    st.write("")
+    if st.button("🗑️ Reset Statistics", use_container_width=True):
+        db.profiler.reset()
+        st.rerun()
+
+COLUMNS = {
+    "query": "Query",
+    "calls": "Calls",
+    "total_ms": "Total (ms)",
+    "avg_ms": "Avg (ms)",
+    "p95_ms": "p95 (ms)",
+    "max_ms": "Max (ms)",
+    "rows": "Rows",
+    "callers": "Called From",
+}
+
+
+def show_ranking(by):
+    """Table of the top queries ordered by `by`, with their plans"""
+    stats = db.query_stats(top_n, by=by)
+    if not stats:
+        st.info("📭 No queries recorded yet")
+        return
+
+    df = pd.DataFrame(stats)[list(COLUMNS)].rename(columns=COLUMNS)
+    st.dataframe(df.round(2), use_container_width=True, hide_index=True)
+
+    st.write("**🔎 Query Plans**")
+    for row in stats:
+        with st.expander(f"{row[by]:,.1f} ms - {row['query'][:100]}"):
+            st.code(row['query'], language="sql")
+            st.write(f"**Plan:** {row['plan'] or 'Not captured'}")
+
+
+# Page tabs
+tab1, tab2, tab3, tab4 = st.tabs(["⏱️ By Total Time", "📈 By p95 Time", "🐢 Slow Query Log", "🗄️ Connections & Cache"])
+
+with tab1, page_profiler.section("⏱️ By Total Time"):
+    st.subheader("⏱️ Top Queries by Total Time")
+    show_ranking("total_ms")
+
+with tab2, page_profiler.section("📈 By p95 Time"):
+    st.subheader("📈 Top Queries by p95 Time")
+    show_ranking("p95_ms")
+
+with tab3, page_profiler.section("🐢 Slow Query Log"):
+    st.subheader("🐢 Slow Query Log")
+    st.caption(f"Queries slower than {db.profiler.slow_query_ms:,.0f} ms, most recent first")
+
+    slow_log = list(db.profiler.slow_log)
+    if slow_log:
+        df = pd.DataFrame(reversed(slow_log))
+        df.columns = ["Time", "Duration (ms)", "Rows", "Called From", "Query"]
+        st.dataframe(df.round(2), use_container_width=True, hide_index=True)
+    else:
+        st.success("✅ No slow queries recorded")
+
+with tab4, page_profiler.section("🗄️ Connections & Cache"):
+    st.subheader("🗄️ Connections and Cache")
+
+    pool_stats = db.pool.stats()
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        st.metric("Pool Size", pool_stats['size'])
+    with col2:
+        st.metric("Idle Connections", pool_stats['idle'])
+    with col3:
+        st.metric("Connections Opened", pool_stats['created'])
+    with col4:
+        st.metric("Connections Reused", pool_stats['reused'])
+
+    cache_stats = db.cache_stats()
+    if cache_stats:
+        col1, col2, col3, col4 = st.columns(4)
+        with col1:
+            st.metric("Cache Hit Rate", f"{cache_stats['hit_rate'] * 100:.1f}%")
+        with col2:
+            st.metric("Cache Hits", cache_stats['hits'])
+        with col3:
+            st.metric("Cache Misses", cache_stats['misses'])
+        with col4:
+            st.metric("Cached Results", cache_stats['entries'])
+    else:
+        st.info("💡 Query result cache is disabled (set CLINIC_QUERY_CACHE_SIZE to enable)")
+
+    st.write(f"**Database profile:** {db.profile} | **Schema version:** {db.schema_version()}")
+    schema_init = "skipped, schema was current" if db.schema_was_current else "schema created or migrated"
+    st.write(f"**Database startup:** {db.init_seconds * 1000:,.1f} ms ({schema_init})")
+
+page_profiler.finish()
+
+# Back to dashboard button
+if st.button("🏠 Back to Dashboard"):
+    st.switch_page("app.py")
@@ -0,0 +1,151 @@
+import streamlit as st
+import pandas as pd
+from auth import auth
+from page_profiler import page_profiler
+from memory_tracker import memory_tracker, format_bytes, process_rss
+
+st.set_page_config(page_title="Performance", page_icon="⏱️", layout="wide")
+
+if not auth.is_logged_in():
+    st.warning("⚠️ Please log in first")
+    st.stop()
+
+# Check user permissions
+if st.session_state.user['role'] != 'admin':
+    st.error("⛔ You don't have permission to access this page")
+    st.stop()
+
+page_profiler.start("pages/8_Performance.py")
+
+st.title("⏱️ Page Performance")
+
+if not page_profiler.enabled:
+    st.info("💡 Page profiling is turned off (unset CLINIC_PAGE_PROFILE or set it to 1 to enable)")
+
+# Settings
+col1, col2 = st.columns([4, 1])
+with col1:
+    top_n = st.number_input("Slowest reruns shown", min_value=5, max_value=200, value=20, step=5)
+with col2:
+    st.write("")
+    st.write("")
+    if st.button("🗑️ Reset Samples", use_container_width=True):
+        page_profiler.reset()
+        st.rerun()
+
+samples = page_profiler.recent()
+st.caption(f"{len(samples):,} reruns recorded by this server process (up to {page_profiler.samples.maxlen:,} kept)")
+
+SUMMARY_COLUMNS = {
+    "runs": "Reruns",
+    "avg_ms": "Avg (ms)",
+    "p50_ms": "p50 (ms)",
+    "p95_ms": "p95 (ms)",
+    "max_ms": "Max (ms)",
+    "queries": "Queries",
+    "query_ms": "Query Time (ms)",
+    "kb_sent": "Sent (KB)",
+}
+
+# Page tabs
+tab1, tab2, tab3, tab4, tab5 = st.tabs(
+    ["📊 Pages", "🐢 Slowest Reruns", "🧩 Sections", "🕒 Recent Reruns", "🧠 Memory"])
+
+with tab1, page_profiler.section("📊 Pages"):
+    st.subheader("📊 Rerun Time per Page")
+
+    summary = page_profiler.page_summary()
+    if summary:
+        df = pd.DataFrame(summary).rename(columns={"page": "Page", **SUMMARY_COLUMNS})
+        st.dataframe(df.round(1), use_container_width=True, hide_index=True)
+
+        import plotly.express as px
+
+        timings = pd.DataFrame([{"Page": sample['page'], "Duration (ms)": sample['ms']} for sample in samples])
+        fig = px.histogram(timings, x="Duration (ms)", facet_col="Page", facet_col_wrap=3, nbins=30,
+                           title="Rerun Time Distribution")
+        fig.update_yaxes(matches=None, title_text="")
+        fig.for_each_annotation(lambda annotation: annotation.update(text=annotation.text.split("=")[-1]))
+        st.plotly_chart(fig, use_container_width=True)
+    else:
+        st.info("📭 No reruns recorded yet")
+
+with tab2, page_profiler.section("🐢 Slowest Reruns"):
+    st.subheader("🐢 Slowest Recent Reruns")
+
+    for sample in page_profiler.slowest(top_n):
+        title = (f"{sample['ms']:,.0f} ms - {sample['page']} ({sample['time']}, {sample['user'] or 'anonymous'}, "
+                 f"{sample['status']})")
+        with st.expander(title):
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                st.metric("Queries", sample['queries'])
+            with col2:
+                st.metric("Query Time", f"{sample['query_ms']:,.1f} ms")
+            with col3:
+                st.metric("Sent to Browser", f"{sample['bytes'] / 1024:,.1f} KB")
+
+            if sample['sections']:
+                sections = pd.DataFrame(sample['sections'])
+                sections['kb_sent'] = sections['bytes'] / 1024
+                sections = sections[['section', 'status', 'ms', 'queries', 'query_ms', 'kb_sent']]
+                sections.columns = ["Section", "Status", "Duration (ms)", "Queries", "Query Time (ms)", "Sent (KB)"]
+                st.dataframe(sections.round(1), use_container_width=True, hide_index=True)
+
+with tab3, page_profiler.section("🧩 Sections"):
+    st.subheader("🧩 Time per Section")
+
+    section_summary = page_profiler.section_summary()
+    if section_summary:
+        df = pd.DataFrame(section_summary).rename(columns={"page": "Page", "section": "Section", **SUMMARY_COLUMNS})
+        st.dataframe(df.sort_values("p95 (ms)", ascending=False).round(1), use_container_width=True,
+                     hide_index=True)
+    else:
+        st.info("📭 No sections recorded yet")
+
+with tab4, page_profiler.section("🕒 Recent Reruns"):
+    st.subheader("🕒 Recent Reruns")
+
+    if samples:
+        df = pd.DataFrame(reversed(samples))[['time', 'page', 'user', 'status', 'ms', 'queries', 'query_ms',
+                                              'messages', 'bytes']]
+        df.columns = ["Time", "Page", "User", "Status", "Duration (ms)", "Queries", "Query Time (ms)", "Messages",
+                      "Bytes Sent"]
+        st.dataframe(df.round(1), use_container_width=True, hide_index=True)
+    else:
+        st.info("📭 No reruns recorded yet")
+
+with tab5, page_profiler.section("🧠 Memory"):
+    st.subheader("🧠 Memory")
+
+    if not memory_tracker.enabled:
+        st.info("💡 Memory profiling is off (start with `python run.py --memory-profile` "
+                "or set CLINIC_MEMORY_PROFILE=1)")
+    else:
+        col1, col2 = st.columns(2)
+        with col1:
+            st.metric("Process Size", format_bytes(process_rss()))
+        with col2:
+            st.metric("Reports Every", f"{memory_tracker.report_seconds / 60:,.0f} min")
+
+        st.write("**💾 Sessions by State Size**")
+        sessions = memory_tracker.session_sizes()
+        if sessions:
+            df = pd.DataFrame([{"User": user, "Last Page": page, "Session State": format_bytes(total),
+                                "Largest Entries": ", ".join(f"{key} ({format_bytes(size)})" for key, size in
+                                                             sorted(state.items(), key=lambda item: item[1],
+                                                                    reverse=True)[:3])}
+                               for _, user, page, total, state in sessions])
+            st.dataframe(df, use_container_width=True, hide_index=True)
+
+        if st.button("📝 Write Report Now"):
+            path = memory_tracker.write_report()
+            st.success(f"✅ Report written to {path}")
+        if memory_tracker.last_report:
+            st.code(memory_tracker.last_report, language=None)
+
+page_profiler.finish()
+
+# Back to dashboard button
+if st.button("🏠 Back to Dashboard"):
+    st.switch_page("app.py")
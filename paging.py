@@ -0,0 +1,116 @@
+import streamlit as st
+import pandas as pd
+from database import db
+
+
+class KeysetPager:
+    """Server-side paging of one query that seeks on its sort keys instead of using OFFSET
+
+    `sort_options` maps a label to (keys, direction).  The keys must be
+    non-NULL SQL expressions ending with a unique column, ideally matching
+    an index, e.g. {"Newest first": (("COALESCE(p.created_at, '')", "p.id"), "DESC")}.
+    A row-value seek never returns rows whose key is NULL, so nullable
+    columns go through COALESCE.
+    `filters` are SQL conditions combined with AND, with their `params`.
+    """
+
+    def __init__(self, key, select, source, sort_options, filters=(), params=(),
+                 page_sizes=(25, 50, 100), count_cap=10000):
+        self.key = key
+        self.select = select
+        self.source = source
+        self.sort_options = sort_options
+        self.filters = list(filters)
+        self.params = list(params)
+        self.page_sizes = page_sizes
+        self.count_cap = count_cap
+
+    def _where(self, extra=()):
+        conditions = self.filters + list(extra)
+        return f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+    def fetch(self, sort, limit, after=None):
+        """Up to `limit` rows in `sort` order, starting after the key values `after`
+
+        Each row ends with its sort key values, which are the cursor for
+        the next page.
+        """
+        keys, direction = self.sort_options[sort]
+        seek, params = [], list(self.params)
+        if after is not None:
+            operator = "<" if direction == "DESC" else ">"
+            # SQLite only seeks an expression index on a bound of the first key alone
+            seek.append(f"{keys[0]} {operator}= ?")
+            seek.append(f"({', '.join(keys)}) {operator} ({', '.join('?' * len(keys))})")
+            params.append(after[0])
+            params.extend(after)
+
+        query = f"""
+            SELECT {self.select}, {', '.join(keys)}
+            FROM {self.source}
+            {self._where(seek)}
+            ORDER BY {', '.join(f'{key} {direction}' for key in keys)}
+            LIMIT ?
+        """
+        return db.fetch_all(query, params + [limit])
+
+    def count(self):
+        """Number of matching rows, counting no further than count_cap + 1"""
+        return db.scalar(f"""
+            SELECT COUNT(*) FROM (SELECT 1 FROM {self.source} {self._where()} LIMIT ?)
+        """, self.params + [self.count_cap + 1], 0)
+
+    def current_page(self):
+        """Sort and page size controls, then the rows of the current page without their sort keys"""
+        col1, col2 = st.columns([3, 1])
+        with col1:
+            sort = st.selectbox("Sort by", list(self.sort_options), key=f"{self.key}_sort")
+        with col2:
+            page_size = st.selectbox("Rows per page", self.page_sizes, key=f"{self.key}_page_size")
+
+        # Go back to the first page whenever the query changes
+        state = (self.select, self.source, tuple(self.filters), tuple(map(str, self.params)), sort, page_size)
+        if st.session_state.get(f"{self.key}_state") != state:
+            st.session_state[f"{self.key}_state"] = state
+            st.session_state[f"{self.key}_cursors"] = [None]
+        self._cursors = st.session_state[f"{self.key}_cursors"]
+
+        rows = self.fetch(sort, page_size + 1, self._cursors[-1])
+        self._has_next = len(rows) > page_size
+        rows = rows[:page_size]
+        key_count = len(self.sort_options[sort][0])
+        self._next_cursor = tuple(rows[-1][-key_count:]) if rows else None
+        self._first_row = (len(self._cursors) - 1) * page_size + 1
+        return [row[:-key_count] for row in rows]
+
+    def navigation(self, shown):
+        """Row range caption and previous/next buttons for a page of `shown` rows"""
+        total = self.count()
+        total_text = f"{self.count_cap:,}+" if total > self.count_cap else f"{total:,}"
+        st.caption(f"Rows {self._first_row:,}–{self._first_row + shown - 1:,} of {total_text}")
+
+        col1, col2, col3 = st.columns([1, 1, 4])
+        with col1:
+            if len(self._cursors) > 1 and st.button("⬅️ Previous", key=f"{self.key}_previous",
+                                                    use_container_width=True):
+                self._cursors.pop()
+                st.rerun()
+        with col2:
+            if self._has_next and st.button("Next ➡️", key=f"{self.key}_next", use_container_width=True):
+                self._cursors.append(self._next_cursor)
+                st.rerun()
+
+    def render(self, columns, style=None, column_config=None):
+        """The current page as a table with sort, page size and previous/next controls
+
+        Returns the rows of the page without their sort keys.
+        """
+        page = self.current_page()
+        if not page:
+            return []
+
+        df = pd.DataFrame(page, columns=columns)
+        st.dataframe(style(df) if style else df, use_container_width=True, hide_index=True,
+                     column_config=column_config)
+        self.navigation(len(page))
+        return page
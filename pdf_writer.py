@@ -0,0 +1,118 @@
+"""
+Minimal PDF writer for text reports.
+
+Pages hold lines of monospaced text in the standard Courier fonts, so no
+font has to be embedded.  Each page is compressed and written to the file
+as soon as it is full, and only the object offsets are kept, so reports
+of any length are written in constant memory.
+"""
+
+import zlib
+
+# A4 landscape, in points
+PAGE_WIDTH = 842
+PAGE_HEIGHT = 595
+MARGIN = 36
+FONT_SIZE = 7
+LINE_HEIGHT = 9
+
+# Courier glyphs are 0.6 em wide
+LINE_CHARS = int((PAGE_WIDTH - 2 * MARGIN) / (FONT_SIZE * 0.6))
+PAGE_LINES = int((PAGE_HEIGHT - 2 * MARGIN) / LINE_HEIGHT) - 2
+
+# Object numbers written last, once every page is known
+CATALOG, PAGES, FONT, BOLD_FONT, INFO = 1, 2, 3, 4, 5
+
+
+def _escape(text):
+    """PDF string literal contents for one line of text"""
+    text = " ".join(str(text).split())
+    text = text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+    return text.encode('cp1252', errors='replace')
+
+
+class PdfWriter:
+    """Lines of text laid out on pages of a PDF written to the binary file `file`"""
+
+    def __init__(self, file, title=""):
+        self.file = file
+        self.title = title
+        self.position = 0
+        self.offsets = {}
+        self.pages = []
+        self.lines = []
+        # Lines repeated at the top of every new page, e.g. table headers
+        self.page_header = []
+
+        self._write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+        self._object(FONT, b"<< /Type /Font /Subtype /Type1 /BaseFont /Courier /Encoding /WinAnsiEncoding >>")
+        self._object(BOLD_FONT,
+                     b"<< /Type /Font /Subtype /Type1 /BaseFont /Courier-Bold /Encoding /WinAnsiEncoding >>")
+        self._next_number = INFO + 1
+
+    def _write(self, data):
+        self.file.write(data)
+        self.position += len(data)
+
+    def _object(self, number, body):
+        self.offsets[number] = self.position
+        self._write(b"%d 0 obj\n" % number + body + b"\nendobj\n")
+
+    def _new_object(self, body):
+        number = self._next_number
+        self._next_number += 1
+        self._object(number, body)
+        return number
+
+    def line(self, text="", bold=False):
+        """Add a line, starting a new page when the current one is full"""
+        if len(self.lines) >= PAGE_LINES:
+            self.page_break()
+        if not self.lines:
+            self.lines.extend(self.page_header)
+        self.lines.append((text, bold))
+
+    def page_break(self):
+        """Write the current page, if it has any lines"""
+        if not self.lines:
+            return
+        footer = f"{self.title}    Page {len(self.pages) + 1}".strip()
+
+        content = [b"BT /F1 %d Tf %d TL %d %d Td" % (FONT_SIZE, LINE_HEIGHT, MARGIN, PAGE_HEIGHT - MARGIN)]
+        font = b"/F1"
+        for text, bold in self.lines:
+            wanted = b"/F2" if bold else b"/F1"
+            if wanted != font:
+                content.append(b"%s %d Tf" % (wanted, FONT_SIZE))
+                font = wanted
+            content.append(b"(" + _escape(text) + b") Tj T*")
+        content.append(b"ET")
+        content.append(b"BT /F1 %d Tf %d %d Td (%s) Tj ET" % (FONT_SIZE, MARGIN, MARGIN / 2, _escape(footer)))
+        stream = zlib.compress(b"\n".join(content))
+
+        contents = self._new_object(b"<< /Length %d /Filter /FlateDecode >>\nstream\n" % len(stream)
+                                    + stream + b"\nendstream")
+        self.pages.append(self._new_object(
+            b"<< /Type /Page /Parent %d 0 R /MediaBox [0 0 %d %d] /Contents %d 0 R "
+            b"/Resources << /Font << /F1 %d 0 R /F2 %d 0 R >> >> >>"
+            % (PAGES, PAGE_WIDTH, PAGE_HEIGHT, contents, FONT, BOLD_FONT)))
+        self.lines = []
+
+    def close(self):
+        """Write the last page and the document structure; the file itself is left open"""
+        if not self.pages and not self.lines:
+            self.line()
+        self.page_break()
+
+        kids = b" ".join(b"%d 0 R" % page for page in self.pages)
+        self._object(PAGES, b"<< /Type /Pages /Kids [" + kids + b"] /Count %d >>" % len(self.pages))
+        self._object(CATALOG, b"<< /Type /Catalog /Pages %d 0 R >>" % PAGES)
+        self._object(INFO, b"<< /Title (" + _escape(self.title) + b") /Producer (Clinic Management System) >>")
+
+        xref = self.position
+        count = self._next_number
+        self._write(b"xref\n0 %d\n0000000000 65535 f \n" % count)
+        for number in range(1, count):
+            self._write(b"%010d 00000 n \n" % self.offsets[number])
+        self._write(b"trailer\n<< /Size %d /Root %d 0 R /Info %d 0 R >>\nstartxref\n%d\n%%%%EOF\n"
+                    % (count, CATALOG, INFO, xref))
@@ -0,0 +1,129 @@
+import re
+import threading
+import time
+from collections import OrderedDict
+
+READ_TABLES = re.compile(r'\b(?:FROM|JOIN)\s+([A-Za-z_][A-Za-z0-9_]*)', re.IGNORECASE)
+# Anchored by written_table() for one statement, searched by trigger_dependencies() in trigger bodies
+WRITE_TABLE = re.compile(
+    r'\b(?:INSERT(?:\s+OR\s+\w+)?\s+INTO|REPLACE\s+INTO|UPDATE(?:\s+OR\s+\w+)?|DELETE\s+FROM)\s+([A-Za-z_][A-Za-z0-9_]*)',
+    re.IGNORECASE
+)
+
+
+def is_read_query(query):
+    """True for SELECT and WITH ... SELECT statements"""
+    head = query.lstrip()[:6].upper()
+    return head.startswith('SELECT') or head.startswith('WITH')
+
+
+def read_tables(query):
+    """Tables a SELECT reads from"""
+    return frozenset(name.lower() for name in READ_TABLES.findall(query))
+
+
+def written_table(query):
+    """Table an INSERT/UPDATE/DELETE writes to, or None if unknown"""
+    match = WRITE_TABLE.match(query.lstrip())
+    return match.group(1).lower() if match else None
+
+
+def trigger_dependencies(conn):
+    """Map each table to the tables its triggers write to"""
+    dependencies = {}
+    for table, sql in conn.execute("SELECT tbl_name, sql FROM sqlite_master WHERE type = 'trigger'"):
+        body = sql[sql.upper().find('BEGIN'):]
+        targets = {name.lower() for name in WRITE_TABLE.findall(body)}
+        dependencies.setdefault(table.lower(), set()).update(targets)
+    return dependencies
+
+
+class QueryCache:
+    """LRU cache of SELECT results with a TTL and table-level invalidation.
+
+    Entries are dropped when a write through the same Database touches a
+    table they read from.  Writes made by other processes are only picked
+    up once the TTL expires.
+    """
+
+    def __init__(self, max_entries=256, ttl=30.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._dependencies = {}
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'invalidations': 0, 'evictions': 0}
+
+    @staticmethod
+    def _key(query, params):
+        return query, tuple(params)
+
+    def get(self, query, params=()):
+        """Cached result or None"""
+        key = self._key(query, params)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self._stats['misses'] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats['hits'] += 1
+            return entry[2]
+
+    def put(self, query, params, result):
+        """Store a result, evicting the least recently used entries"""
+        key = self._key(query, params)
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, read_tables(query), result)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats['evictions'] += 1
+
+    def set_dependencies(self, dependencies):
+        """Tables written by triggers when a table is written, see trigger_dependencies()"""
+        self._dependencies = dependencies
+
+    def _affected(self, table):
+        """`table` plus every table its triggers write to, transitively"""
+        affected, pending = set(), [table]
+        while pending:
+            name = pending.pop()
+            if name not in affected:
+                affected.add(name)
+                pending.extend(self._dependencies.get(name, ()))
+        return affected
+
+    def invalidate(self, table=None):
+        """Drop entries that read `table` (every entry when table is None)"""
+        with self._lock:
+            if table is None:
+                dropped = len(self._entries)
+                self._entries.clear()
+            else:
+                affected = self._affected(table)
+                stale = [key for key, entry in self._entries.items() if not affected.isdisjoint(entry[1])]
+                for key in stale:
+                    del self._entries[key]
+                dropped = len(stale)
+            self._stats['invalidations'] += dropped
+
+    def invalidate_for_write(self, query):
+        """Drop entries affected by a write statement"""
+        self.invalidate(written_table(query))
+
+    def clear(self):
+        """Empty the cache"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """Hit/miss counters"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['entries'] = len(self._entries)
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = stats['hits'] / lookups if lookups else 0.0
+        return stats
@@ -0,0 +1,145 @@
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from collections import deque
+
+logger = logging.getLogger("clinic.slow_queries")
+
+# Frames from these files are skipped when looking for the calling page
+_INTERNAL_FILES = ('database.py', 'query_profiler.py', 'connection_pool.py', 'query_cache.py', 'contextlib.py')
+_WHITESPACE = re.compile(r'\s+')
+
+
+def normalize(query):
+    """Collapse whitespace so the same statement always gets the same key"""
+    return _WHITESPACE.sub(' ', query).strip()
+
+
+def find_caller():
+    """'file:function' of the first frame outside the database layer"""
+    frame = sys._getframe(2)
+    while frame is not None:
+        filename = os.path.basename(frame.f_code.co_filename)
+        if filename not in _INTERNAL_FILES:
+            return f"{filename}:{frame.f_code.co_name}"
+        frame = frame.f_back
+    return "unknown"
+
+
+class QueryStats:
+    """Aggregated timings of one SQL statement"""
+
+    def __init__(self, query, samples):
+        self.query = query
+        self.calls = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.rows = 0
+        self.callers = {}
+        self.samples = deque(maxlen=samples)
+        self.slowest_params = ()
+        self.plan = None
+
+    def p95(self):
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] if ordered else 0.0
+
+    def as_dict(self):
+        return {
+            'query': self.query,
+            'calls': self.calls,
+            'total_ms': self.total * 1000,
+            'avg_ms': self.total / self.calls * 1000 if self.calls else 0.0,
+            'p95_ms': self.p95() * 1000,
+            'max_ms': self.max * 1000,
+            'rows': self.rows,
+            'callers': ', '.join(sorted(self.callers, key=self.callers.get, reverse=True)),
+            'plan': self.plan,
+        }
+
+
+class QueryProfiler:
+    """Per-statement wall time, row counts, callers and a slow-query log"""
+
+    def __init__(self, slow_query_ms=100.0, samples=500, slow_log_size=200):
+        self.enabled = True
+        self.slow_query_ms = slow_query_ms
+        self._samples = samples
+        self._stats = {}
+        self.slow_log = deque(maxlen=slow_log_size)
+        self._lock = threading.Lock()
+        # Running totals of the calling thread, which the page profiler diffs per rerun
+        self._thread = threading.local()
+
+    def record(self, query, params, seconds, rows, conn=None):
+        """Record one execution; slow ones are logged with their plan"""
+        if not self.enabled:
+            return
+        key = normalize(query)
+        caller = find_caller()
+        self._thread.queries = getattr(self._thread, 'queries', 0) + 1
+        self._thread.seconds = getattr(self._thread, 'seconds', 0.0) + seconds
+        with self._lock:
+            stats = self._stats.get(key)
+            if stats is None:
+                stats = self._stats[key] = QueryStats(key, self._samples)
+            stats.calls += 1
+            stats.total += seconds
+            stats.rows += max(rows, 0)
+            stats.samples.append(seconds)
+            stats.callers[caller] = stats.callers.get(caller, 0) + 1
+            if seconds >= stats.max:
+                stats.max = seconds
+                stats.slowest_params = tuple(params)
+
+        if seconds * 1000 < self.slow_query_ms:
+            return
+        if stats.plan is None and conn is not None:
+            stats.plan = explain(conn, query, params)
+        self.slow_log.append({
+            'time': time.strftime('%Y-%m-%d %H:%M:%S'),
+            'ms': seconds * 1000,
+            'rows': rows,
+            'caller': caller,
+            'query': key,
+        })
+        logger.warning("Slow query (%.1f ms, %d rows) from %s: %s | plan: %s",
+                       seconds * 1000, rows, caller, key, stats.plan)
+
+    def thread_totals(self):
+        """(queries, seconds) recorded so far on the calling thread"""
+        return getattr(self._thread, 'queries', 0), getattr(self._thread, 'seconds', 0.0)
+
+    def top(self, n=10, by='total_ms'):
+        """The `n` statements with the highest `by` value"""
+        with self._lock:
+            rows = [stats.as_dict() for stats in self._stats.values()]
+        return sorted(rows, key=lambda row: row[by], reverse=True)[:n]
+
+    def missing_plans(self):
+        """(query, params) of recorded statements without a captured plan"""
+        with self._lock:
+            return [(stats.query, stats.slowest_params) for stats in self._stats.values() if stats.plan is None]
+
+    def set_plan(self, query, plan):
+        with self._lock:
+            stats = self._stats.get(normalize(query))
+            if stats is not None:
+                stats.plan = plan
+
+    def reset(self):
+        """Forget all recorded statements and the slow-query log"""
+        with self._lock:
+            self._stats.clear()
+            self.slow_log.clear()
+
+
+def explain(conn, query, params=()):
+    """EXPLAIN QUERY PLAN as one line of ' | '-separated steps"""
+    try:
+        return ' | '.join(row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + query, params))
+    except Exception as e:
+        return f"unavailable: {e}"
@@ -0,0 +1,239 @@
+"""
+Background report jobs.
+
+Exports requested on the Reports page run in a small worker pool instead
+of the user's script run.  Every job is a row of report_jobs (migration 9)
+holding its status and progress, so any session can follow it.  Finished
+files are kept in ARTIFACT_DIR and handed out again for identical requests
+made within CACHE_TTL seconds.
+
+Several server processes can share the database, so each job records the
+process that runs it (pid and a per-process token).  A queued or running
+job is only marked failed once that process is gone, or after
+STALE_JOB_SECONDS whatever its owner.  Cancelling another process's job
+sets cancel_requested, which its worker reads with each progress update.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import exports
+from database import db
+
+WORKERS = 2
+CACHE_TTL = 15 * 60
+ARTIFACT_DIR = "report_artifacts"
+
+# Seconds between progress updates written to report_jobs
+PROGRESS_INTERVAL = 0.5
+
+ACTIVE_STATUSES = ('queued', 'running')
+
+# Jobs still active after this long are failed even if their process seems alive
+STALE_JOB_SECONDS = 6 * 3600
+
+JOB_COLUMNS = ['id', 'report_type', 'export_format', 'params', 'status', 'progress', 'row_count',
+               'artifact_path', 'error', 'created_at', 'finished_at']
+
+
+class JobCancelled(Exception):
+    """Raised inside a running job once its cancellation has been requested"""
+
+
+def process_alive(pid):
+    """False when no process `pid` exists on this machine"""
+    if os.name == 'nt':
+        # os.kill(pid, 0) would send CTRL_C_EVENT; only STALE_JOB_SECONDS applies there
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def cache_key(report_type, export_format, params):
+    """Identity of a report request, used to find a finished copy"""
+    request = json.dumps([report_type, export_format, params], sort_keys=True, default=str)
+    return hashlib.sha256(request.encode()).hexdigest()
+
+
+class ReportJobs:
+    """Queue of report exports run by a pool of worker threads"""
+
+    def __init__(self, database, workers=WORKERS, artifact_dir=None, cache_ttl=CACHE_TTL):
+        self.db = database
+        self.artifact_dir = artifact_dir or os.path.join(
+            os.path.dirname(os.path.abspath(database.db_name)), ARTIFACT_DIR)
+        self.cache_ttl = cache_ttl
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="report-job")
+        self._cancel_events = {}
+        self._lock = threading.Lock()
+        # pid and a token, so a restarted process reusing the pid is not taken for the old one
+        self.owner = f"{os.getpid()}:{uuid.uuid4().hex}"
+
+    def _owner_gone(self, owner):
+        """True when the process that queued a job has exited"""
+        if owner == self.owner:
+            return False
+        pid, _, _ = (owner or '').partition(':')
+        # An earlier process that had our pid, or a job from before owners were recorded
+        if not pid.isdigit() or int(pid) == os.getpid():
+            return True
+        return not process_alive(int(pid))
+
+    def recover(self):
+        """Fail queued or running jobs whose process has exited, or that are older than STALE_JOB_SECONDS"""
+        active = self.db.fetch_all("""
+            SELECT id, owner, COALESCE(started_at, created_at) < datetime('now', ?) FROM report_jobs
+            WHERE status IN ('queued', 'running')
+        """, (f"-{STALE_JOB_SECONDS} seconds",))
+        for job_id, owner, stale in active:
+            if stale or self._owner_gone(owner):
+                self._finish(job_id, 'failed', error='Interrupted: the server process running it stopped')
+
+    def submit(self, report_type, export_format, start_date, end_date, compress=False,
+               requested_by=None, force=False):
+        """Queue a report and return (job id, reused).
+
+        Unless `force` is set, an identical job that is still running, or
+        finished within the cache TTL, is returned instead of a new one.
+        """
+        params = {'start_date': str(start_date), 'end_date': str(end_date),
+                  'compress': bool(compress) and export_format == "CSV"}
+        key = cache_key(report_type, export_format, params)
+        self.prune()
+        self.recover()
+
+        if not force:
+            job = self.db.fetch_one("""
+                SELECT id, status, artifact_path FROM report_jobs
+                WHERE cache_key = ?
+                  AND (status IN ('queued', 'running')
+                       OR (status = 'done' AND finished_at >= datetime('now', ?)))
+                ORDER BY id DESC LIMIT 1
+            """, (key, f"-{self.cache_ttl} seconds"))
+            if job and (job[1] != 'done' or os.path.exists(job[2])):
+                return job[0], True
+
+        job_id = self.db.insert("""
+            INSERT INTO report_jobs (report_type, export_format, params, cache_key, requested_by, owner)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, (report_type, export_format, json.dumps(params), key, requested_by, self.owner))
+        with self._lock:
+            self._cancel_events[job_id] = threading.Event()
+        self._pool.submit(self._run, job_id, report_type, export_format, params)
+        return job_id, False
+
+    def cancel(self, job_id):
+        """Ask a queued or running job to stop"""
+        with self._lock:
+            event = self._cancel_events.get(job_id)
+        if event is not None:
+            event.set()
+            return
+        owner = self.db.scalar("SELECT owner FROM report_jobs WHERE id = ? AND status IN ('queued', 'running')",
+                               (job_id,))
+        if self._owner_gone(owner):
+            self._finish(job_id, 'cancelled')
+        else:
+            # Run by another process: its worker stops at its next progress update
+            self.db.execute("UPDATE report_jobs SET cancel_requested = 1 WHERE id = ?", (job_id,))
+
+    def _cancel_requested(self, job_id):
+        return bool(self.db.scalar("SELECT cancel_requested FROM report_jobs WHERE id = ?", (job_id,), 0))
+
+    def get(self, job_id):
+        """One job as a dict, or None"""
+        row = self.db.fetch_one(f"SELECT {', '.join(JOB_COLUMNS)} FROM report_jobs WHERE id = ?", (job_id,))
+        return dict(zip(JOB_COLUMNS, row)) if row else None
+
+    def recent(self, requested_by=None, limit=10):
+        """The latest jobs of a user, newest first, as dicts"""
+        self.recover()
+        rows = self.db.fetch_all(f"""
+            SELECT {', '.join(JOB_COLUMNS)} FROM report_jobs
+            WHERE requested_by IS ?
+            ORDER BY id DESC LIMIT ?
+        """, (requested_by, limit))
+        return [dict(zip(JOB_COLUMNS, row)) for row in rows]
+
+    def prune(self):
+        """Delete the files of jobs that finished more than the cache TTL ago"""
+        expired = self.db.fetch_all("""
+            SELECT id, artifact_path FROM report_jobs
+            WHERE status = 'done' AND finished_at < datetime('now', ?)
+        """, (f"-{self.cache_ttl} seconds",))
+        for job_id, path in expired:
+            if path and os.path.exists(path):
+                os.remove(path)
+            self.db.execute("UPDATE report_jobs SET status = 'expired', artifact_path = NULL WHERE id = ?",
+                            (job_id,))
+
+    def _finish(self, job_id, status, **fields):
+        """Record the final status of a job that is still queued or running"""
+        assignments = ["status = ?", "finished_at = CURRENT_TIMESTAMP"] + [f"{name} = ?" for name in fields]
+        self.db.execute(f"""
+            UPDATE report_jobs SET {', '.join(assignments)}
+            WHERE id = ? AND status IN ('queued', 'running')
+        """, (status, *fields.values(), job_id))
+
+    def _run(self, job_id, report_type, export_format, params):
+        """Worker: run one export and record the outcome"""
+        event = self._cancel_events[job_id]
+        try:
+            if event.is_set() or self._cancel_requested(job_id):
+                raise JobCancelled()
+            self.db.execute("UPDATE report_jobs SET status = 'running', started_at = CURRENT_TIMESTAMP "
+                            "WHERE id = ?", (job_id,))
+
+            datasets = exports.REPORT_DATASETS[report_type]
+            start_date, end_date = params['start_date'], params['end_date']
+            total = max(exports.count_rows(self.db, datasets, start_date, end_date), 1)
+            written, last_update = 0, time.monotonic()
+            lock = threading.Lock()
+
+            def progress(rows):
+                # Called by the exporter after every chunk, from its own threads for Excel
+                nonlocal written, last_update
+                if event.is_set():
+                    raise JobCancelled()
+                with lock:
+                    written += rows
+                    if time.monotonic() - last_update < PROGRESS_INTERVAL:
+                        return
+                    last_update = time.monotonic()
+                    done = min(written / total, 0.99)
+                self.db.execute("UPDATE report_jobs SET progress = ? WHERE id = ?", (done, job_id))
+                if self._cancel_requested(job_id):
+                    event.set()
+                    raise JobCancelled()
+
+            options = {'compress': params['compress']} if export_format == "CSV" else {}
+            path, row_count = exports.EXPORTERS[export_format](
+                self.db, datasets, start_date, end_date, progress=progress, **options)
+
+            os.makedirs(self.artifact_dir, exist_ok=True)
+            suffix = next(s for s in exports.MIME_TYPES if path.endswith(s))
+            artifact = os.path.join(self.artifact_dir, f"report_{job_id}{suffix}")
+            shutil.move(path, artifact)
+            self._finish(job_id, 'done', progress=1.0, row_count=row_count, artifact_path=artifact)
+        except JobCancelled:
+            self._finish(job_id, 'cancelled')
+        except Exception as e:
+            print(f"Report job {job_id} failed: {e}")
+            self._finish(job_id, 'failed', error=str(e))
+        finally:
+            with self._lock:
+                self._cancel_events.pop(job_id, None)
+
+
+jobs = ReportJobs(db)
@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""
+Daily rollup tables for the Reports page.
+
+daily_revenue, daily_appointments_by_status and daily_new_patients are
+kept up to date by triggers (see migration 6).  This module holds the SQL
+that rebuilds them from the raw tables and a consistency checker.
+
+Usage:
+    python rollups.py rebuild   # recompute every rollup from the raw tables
+    python rollups.py check     # compare rollups with the raw tables
+"""
+
+import sys
+
+# NULL dates and statuses are stored as '' because they are part of the key
+CREATE_STATEMENTS = [
+    """CREATE TABLE IF NOT EXISTS daily_revenue
+       (
+           day TEXT NOT NULL PRIMARY KEY,
+           revenue REAL NOT NULL DEFAULT 0,
+           collected REAL NOT NULL DEFAULT 0,
+           bill_count INTEGER NOT NULL DEFAULT 0
+       ) WITHOUT ROWID""",
+    """CREATE TABLE IF NOT EXISTS daily_appointments_by_status
+       (
+           day TEXT NOT NULL,
+           status TEXT NOT NULL,
+           appointment_count INTEGER NOT NULL DEFAULT 0,
+           PRIMARY KEY (day, status)
+       ) WITHOUT ROWID""",
+    """CREATE TABLE IF NOT EXISTS daily_new_patients
+       (
+           day TEXT NOT NULL PRIMARY KEY,
+           patient_count INTEGER NOT NULL DEFAULT 0
+       ) WITHOUT ROWID""",
+]
+
+# Aggregates of the raw tables, in the shape of each rollup
+RAW_AGGREGATES = {
+    'daily_revenue': """
+        SELECT COALESCE(bill_date, ''), COALESCE(SUM(amount), 0), COALESCE(SUM(paid_amount), 0), COUNT(*)
+        FROM bills GROUP BY COALESCE(bill_date, '')""",
+    'daily_appointments_by_status': """
+        SELECT COALESCE(appointment_date, ''), COALESCE(status, ''), COUNT(*)
+        FROM appointments GROUP BY COALESCE(appointment_date, ''), COALESCE(status, '')""",
+    'daily_new_patients': """
+        SELECT COALESCE(date(created_at), ''), COUNT(*)
+        FROM patients GROUP BY COALESCE(date(created_at), '')""",
+}
+
+REBUILD_STATEMENTS = []
+for _table, _aggregate in RAW_AGGREGATES.items():
+    REBUILD_STATEMENTS.append(f"DELETE FROM {_table}")
+    REBUILD_STATEMENTS.append(f"INSERT INTO {_table} {_aggregate}")
+
+TRIGGER_STATEMENTS = [
+    # Bills -> daily_revenue
+    """CREATE TRIGGER IF NOT EXISTS trg_rollup_bills_insert AFTER INSERT ON bills
+       BEGIN
+           INSERT INTO daily_revenue (day, revenue, collected, bill_count)
+           VALUES (COALESCE(NEW.bill_date, ''), COALESCE(NEW.amount, 0), COALESCE(NEW.paid_amount, 0), 1)
+           ON CONFLICT (day) DO UPDATE SET revenue = revenue + excluded.revenue,
+                                           collected = collected + excluded.collected,
+                                           bill_count = bill_count + 1;
+       END""",
+    """CREATE TRIGGER IF NOT EXISTS trg_rollup_bills_delete AFTER DELETE ON bills
+       BEGIN
+           UPDATE daily_revenue SET revenue = revenue - COALESCE(OLD.amount, 0),
+                                    collected = collected - COALESCE(OLD.paid_amount, 0),
+                                    bill_count = bill_count - 1
+           WHERE day = COALESCE(OLD.bill_date, '');
+       END""",
+    """CREATE TRIGGER IF NOT EXISTS trg_rollup_bills_update AFTER UPDATE OF amount, paid_amount, bill_date ON bills
+       BEGIN
+           UPDATE daily_revenue SET revenue = revenue - COALESCE(OLD.amount, 0),
+                                    collected = collected - COALESCE(OLD.paid_amount, 0),
+                                    bill_count = bill_count - 1
+           WHERE day = COALESCE(OLD.bill_date, '');
+           INSERT INTO daily_revenue (day, revenue, collected, bill_count)
+           VALUES (COALESCE(NEW.bill_date, ''), COALESCE(NEW.amount, 0), COALESCE(NEW.paid_amount, 0), 1)
+           ON CONFLICT (day) DO UPDATE SET revenue = revenue + excluded.revenue,
+                                           collected = collected + excluded.collected,
+                                           bill_count = bill_count + 1;
+       END""",
+    # Appointments -> daily_appointments_by_status
+    """CREATE TRIGGER IF NOT EXISTS trg_rollup_appointments_insert AFTER INSERT ON appointments
+       BEGIN
+           INSERT INTO daily_appointments_by_status (day, status, appointment_count)
+           VALUES (COALESCE(NEW.appointment_date, ''), COALESCE(NEW.status, ''), 1)
+           ON CONFLICT (day, status) DO UPDATE SET appointment_count = appointment_count + 1;
+       END""",
+    """CREATE TRIGGER IF NOT EXISTS trg_rollup_appointments_delete AFTER DELETE ON appointments
+       BEGIN
+           UPDATE daily_appointments_by_status SET appointment_count = appointment_count - 1
+           WHERE day = COALESCE(OLD.appointment_date, '') AND status = COALESCE(OLD.status, '');
+       END""",
+    """CREATE TRIGGER IF NOT EXISTS trg_rollup_appointments_update
+       AFTER UPDATE OF appointment_date, status ON appointments
+       BEGIN
+           UPDATE daily_appointments_by_status SET appointment_count = appointment_count - 1
+           WHERE day = COALESCE(OLD.appointment_date, '') AND status = COALESCE(OLD.status, '');
+           INSERT INTO daily_appointments_by_status (day, status, appointment_count)
+           VALUES (COALESCE(NEW.appointment_date, ''), COALESCE(NEW.status, ''), 1)
+           ON CONFLICT (day, status) DO UPDATE SET appointment_count = appointment_count + 1;
+       END""",
+    # Patients -> daily_new_patients
+    """CREATE TRIGGER IF NOT EXISTS trg_rollup_patients_insert AFTER INSERT ON patients
+       BEGIN
+           INSERT INTO daily_new_patients (day, patient_count)
+           VALUES (COALESCE(date(NEW.created_at), ''), 1)
+           ON CONFLICT (day) DO UPDATE SET patient_count = patient_count + 1;
+       END""",
+    """CREATE TRIGGER IF NOT EXISTS trg_rollup_patients_delete AFTER DELETE ON patients
+       BEGIN
+           UPDATE daily_new_patients SET patient_count = patient_count - 1
+           WHERE day = COALESCE(date(OLD.created_at), '');
+       END""",
+    """CREATE TRIGGER IF NOT EXISTS trg_rollup_patients_update AFTER UPDATE OF created_at ON patients
+       BEGIN
+           UPDATE daily_new_patients SET patient_count = patient_count - 1
+           WHERE day = COALESCE(date(OLD.created_at), '');
+           INSERT INTO daily_new_patients (day, patient_count)
+           VALUES (COALESCE(date(NEW.created_at), ''), 1)
+           ON CONFLICT (day) DO UPDATE SET patient_count = patient_count + 1;
+       END""",
+]
+
+# Rows whose count dropped to zero are kept; they are ignored when comparing
+ROLLUP_ROWS = {
+    'daily_revenue': "SELECT day, revenue, collected, bill_count FROM daily_revenue WHERE bill_count != 0",
+    'daily_appointments_by_status': """
+        SELECT day, status, appointment_count FROM daily_appointments_by_status WHERE appointment_count != 0""",
+    'daily_new_patients': "SELECT day, patient_count FROM daily_new_patients WHERE patient_count != 0",
+}
+
+
+def rebuild(db):
+    """Recompute every rollup table from the raw tables in one transaction"""
+    with db.transaction():
+        for statement in REBUILD_STATEMENTS:
+            db.execute(statement)
+
+
+def check(db, tolerance=0.005):
+    """Compare the rollups with the raw tables and return the differences.
+
+    Each difference is (table, key, rollup values, raw values); an empty
+    list means the rollups are consistent.
+    """
+    differences = []
+    for table, aggregate in RAW_AGGREGATES.items():
+        key_size = 2 if table == 'daily_appointments_by_status' else 1
+        raw = {row[:key_size]: row[key_size:] for row in db.fetch_all(aggregate) if row[-1]}
+        rollup = {row[:key_size]: row[key_size:] for row in db.fetch_all(ROLLUP_ROWS[table])}
+
+        for key in sorted(set(raw) | set(rollup)):
+            expected, actual = raw.get(key), rollup.get(key)
+            if expected is None or actual is None or any(
+                    abs(a - b) > tolerance for a, b in zip(actual, expected)):
+                differences.append((table, key, actual, expected))
+    return differences
+
+
+def main():
+    if len(sys.argv) != 2 or sys.argv[1] not in ('rebuild', 'check'):
+        print(__doc__)
+        return 2
+
+    from database import db
+
+    if sys.argv[1] == 'rebuild':
+        rebuild(db)
+        print("✅ Rollup tables rebuilt")
+        return 0
+
+    differences = check(db)
+    for table, key, actual, expected in differences:
+        print(f"❌ {table} {key}: rollup={actual} raw={expected}")
+    if differences:
+        print(f"\n{len(differences)} differences found, run 'python rollups.py rebuild' to fix them")
+        return 1
+    print("✅ Rollup tables match the raw tables")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
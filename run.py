@@ -3,32 +3,42 @@
 Clinic Management System - Main Run File
 """
 
+import argparse
+import importlib.util
 import os
 import sys
 import subprocess
+import time
 
 def check_dependencies():
-    """Check installed requirements"""
+    """Check installed requirements without importing them"""
     required = ['streamlit', 'pandas', 'plotly', 'openpyxl']
     missing = []
 
     for package in required:
-        try:
-            __import__(package)
+        # find_spec only locates the package; importing plotly or openpyxl here would cost seconds
+        if importlib.util.find_spec(package) is not None:
             print(f"✅ {package}")
-        except ImportError:
+        else:
             missing.append(package)
             print(f"❌ {package}")
 
     return missing
 
 def main():
+    parser = argparse.ArgumentParser(description="Start the clinic management system")
+    parser.add_argument("--memory-profile", action="store_true",
+                        help="trace memory and write periodic reports to memory_reports/ (slows the app down)")
+    args = parser.parse_args()
+
     print("=" * 50)
     print("🏥 Clinic Management System - Streamlit")
     print("=" * 50)
 
     print("🔍 Checking dependencies...")
+    started = time.perf_counter()
     missing = check_dependencies()
+    print(f"⏱️ Checked in {(time.perf_counter() - started) * 1000:.0f} ms")
 
     if missing:
         print(f"\n❌ Missing libraries: {missing}")
@@ -40,9 +50,18 @@ def main():
     print("\n✅ All requirements installed")
     print("🚀 Starting system...")
 
+    env = dict(os.environ)
+    if args.memory_profile:
+        # Trace from interpreter start, so imports are attributed too
+        env['CLINIC_MEMORY_PROFILE'] = '1'
+        frames = env.get('CLINIC_MEMORY_FRAMES', '20')
+        if frames != '0':
+            env['PYTHONTRACEMALLOC'] = frames
+        print("🧠 Memory profiling on, reports are written to memory_reports/")
+
     # Run Streamlit
     try:
-        subprocess.run(["streamlit", "run", "app.py", "--server.port=8501", "--server.address=0.0.0.0"])
+        subprocess.run(["streamlit", "run", "app.py", "--server.port=8501", "--server.address=0.0.0.0"], env=env)
     except KeyboardInterrupt:
         print("\n🛑 System stopped")
     except Exception as e:
@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+"""
+Parquet snapshots of the clinic database for analysts.
+
+Every table in SNAPSHOT_TABLES is written to zstd-compressed Parquet files
+under the output directory, one file per month of its date column:
+
+    snapshots/appointments/month=2024-05/part.parquet
+    snapshots/users/part.parquet
+
+Password hashes are never exported.  Triggers (migration 10) note the
+month of every inserted, updated or deleted row in snapshot_changes, so
+after the first full snapshot only the months that changed are written
+again.  Rows are read in chunks from the live database, which stays
+available to the app while a snapshot runs.
+
+Usage:
+    python snapshot.py [--output DIR] [--full]
+
+Requires pyarrow.
+"""
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import time
+from datetime import datetime
+
+# Table -> column whose month partitions it, None for small tables kept in one file
+SNAPSHOT_TABLES = {
+    'patients': 'created_at',
+    'appointments': 'appointment_date',
+    'medical_records': 'visit_date',
+    'bills': 'bill_date',
+    'users': None,
+}
+
+EXCLUDED_COLUMNS = {
+    'users': ('password_hash',),
+}
+
+OUTPUT_DIR = "snapshots"
+STATE_FILE = "_snapshot.json"
+CHUNK_ROWS = 50000
+COMPRESSION = 'zstd'
+
+# Rows with no date are kept in this partition
+UNKNOWN_MONTH = ''
+
+
+def _month(row, column):
+    """SQL for the partition of the OLD or NEW `row` of a trigger"""
+    if column is None:
+        return "''"
+    return f"COALESCE(substr({row}.{column}, 1, 7), '')"
+
+
+CREATE_STATEMENTS = [
+    """CREATE TABLE IF NOT EXISTS snapshot_changes
+       (
+           id INTEGER PRIMARY KEY AUTOINCREMENT,
+           table_name TEXT NOT NULL,
+           month TEXT NOT NULL,
+           UNIQUE (table_name, month)
+       )""",
+]
+
+# REPLACE gives a changed partition a new id, so a change made while a
+# snapshot is running survives the snapshot deleting the ids it has read
+TRIGGER_STATEMENTS = []
+for _table, _column in SNAPSHOT_TABLES.items():
+    TRIGGER_STATEMENTS += [
+        f"""CREATE TRIGGER IF NOT EXISTS trg_snapshot_{_table}_insert AFTER INSERT ON {_table}
+           BEGIN
+               INSERT OR REPLACE INTO snapshot_changes (table_name, month) VALUES ('{_table}', {_month('NEW', _column)});
+           END""",
+        f"""CREATE TRIGGER IF NOT EXISTS trg_snapshot_{_table}_delete AFTER DELETE ON {_table}
+           BEGIN
+               INSERT OR REPLACE INTO snapshot_changes (table_name, month) VALUES ('{_table}', {_month('OLD', _column)});
+           END""",
+        f"""CREATE TRIGGER IF NOT EXISTS trg_snapshot_{_table}_update AFTER UPDATE ON {_table}
+           BEGIN
+               INSERT OR REPLACE INTO snapshot_changes (table_name, month) VALUES ('{_table}', {_month('OLD', _column)});
+               INSERT OR REPLACE INTO snapshot_changes (table_name, month) VALUES ('{_table}', {_month('NEW', _column)});
+           END""",
+    ]
+
+
+def partition_path(output, table, month):
+    """Parquet file of one partition, in the hive layout pyarrow and DuckDB read"""
+    if SNAPSHOT_TABLES[table] is None:
+        return os.path.join(output, table, "part.parquet")
+    return os.path.join(output, table, f"month={month or 'unknown'}", "part.parquet")
+
+
+def table_schema(database, table):
+    """Exported columns of `table` and their Arrow schema, from the declared column types"""
+    import pyarrow as pa
+
+    fields = []
+    for name, declared in database.fetch_all("SELECT name, type FROM pragma_table_info(?) ORDER BY cid",
+                                             (table,)):
+        if name in EXCLUDED_COLUMNS.get(table, ()):
+            continue
+        declared = (declared or '').upper()
+        if 'INT' in declared:
+            fields.append(pa.field(name, pa.int64()))
+        elif 'REAL' in declared:
+            fields.append(pa.field(name, pa.float64()))
+        else:
+            # Dates and timestamps stay ISO strings, as SQLite stores them
+            fields.append(pa.field(name, pa.string()))
+    return pa.schema(fields)
+
+
+def _arrow_array(values, arrow_type):
+    import pyarrow as pa
+
+    if pa.types.is_string(arrow_type):
+        values = [None if value is None else str(value) for value in values]
+    return pa.array(values, type=arrow_type)
+
+
+def months(database, table):
+    """Every partition of `table` that has rows"""
+    column = SNAPSHOT_TABLES[table]
+    if column is None:
+        return [UNKNOWN_MONTH]
+    return [row[0] for row in database.fetch_all(
+        f"SELECT DISTINCT COALESCE(substr({column}, 1, 7), '') FROM {table}")]
+
+
+def write_partition(database, output, table, month, schema, chunk_rows=CHUNK_ROWS):
+    """Write one partition from the database and return its row count.
+
+    The file is written next to its final path and moved into place when
+    complete; a partition that no longer has rows is removed.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    column = SNAPSHOT_TABLES[table]
+    query = f"SELECT {', '.join(schema.names)} FROM {table}"
+    params = ()
+    if column is not None and month:
+        # Every value starting with the month, which the date index can seek to
+        query += f" WHERE {column} >= ? AND {column} < ?"
+        params = (month, month + '\uffff')
+    elif column is not None:
+        query += f" WHERE {column} IS NULL OR {column} = ''"
+
+    path = partition_path(output, table, month)
+    temp_path = path + ".tmp"
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    rows = 0
+    writer = pq.ParquetWriter(temp_path, schema, compression=COMPRESSION)
+    try:
+        for chunk in database.stream(query, params, chunk_size=chunk_rows):
+            columns = list(zip(*chunk))
+            writer.write_batch(pa.record_batch(
+                [_arrow_array(list(values), field.type) for values, field in zip(columns, schema)], schema=schema))
+            rows += len(chunk)
+    finally:
+        writer.close()
+
+    if rows:
+        os.replace(temp_path, path)
+    else:
+        os.remove(temp_path)
+        if os.path.exists(path):
+            os.remove(path)
+        if column is not None and not os.listdir(os.path.dirname(path)):
+            os.rmdir(os.path.dirname(path))
+    return rows
+
+
+def take_snapshot(database, output, full=False, chunk_rows=CHUNK_ROWS):
+    """Write the partitions changed since the last snapshot, or all of them, and return the summary"""
+    state_path = os.path.join(output, STATE_FILE)
+    full = full or not os.path.exists(state_path)
+    if full and os.path.exists(state_path):
+        # A full snapshot that fails half way must not look complete
+        os.remove(state_path)
+
+    # Changes noted from here on are picked up by the next snapshot
+    changes = database.fetch_all("SELECT id, table_name, month FROM snapshot_changes")
+
+    summary = {'taken_at': datetime.now().isoformat(timespec='seconds'), 'full': full, 'tables': {}}
+    for table in SNAPSHOT_TABLES:
+        started = time.perf_counter()
+        if full:
+            shutil.rmtree(os.path.join(output, table), ignore_errors=True)
+            changed = months(database, table)
+        else:
+            changed = sorted({month for _, name, month in changes if name == table})
+
+        schema = table_schema(database, table)
+        rows = sum(write_partition(database, output, table, month, schema, chunk_rows) for month in changed)
+        summary['tables'][table] = {'partitions': len(changed), 'rows': rows}
+        print(f"{table:<16} {len(changed):>5} partitions {rows:>10,} rows  {time.perf_counter() - started:.1f}s")
+
+    with database.transaction():
+        database.execute_many("DELETE FROM snapshot_changes WHERE id = ?", [(change[0],) for change in changes])
+
+    with open(state_path, 'w', encoding='utf-8') as file:
+        json.dump(summary, file, indent=2)
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--output", help=f"snapshot directory (default: {OUTPUT_DIR}/ next to the database)")
+    parser.add_argument("--full", action="store_true", help="rewrite every partition")
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS)
+    args = parser.parse_args()
+
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        print("❌ pyarrow is required for snapshots: pip install pyarrow")
+        return 1
+
+    from database import db
+
+    output = args.output or os.path.join(os.path.dirname(os.path.abspath(db.db_name)), OUTPUT_DIR)
+    started = time.perf_counter()
+    summary = take_snapshot(db, output, full=args.full, chunk_rows=args.chunk_rows)
+    kind = "Full" if summary['full'] else "Incremental"
+    print(f"✅ {kind} snapshot written to {output} in {time.perf_counter() - started:.1f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,10 @@
+import pytest
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    """A Database on a new file in a temporary directory"""
+    # database.py opens clinic.db in the working directory on import
+    monkeypatch.chdir(tmp_path)
+    from database import Database
+    return Database(str(tmp_path / "test.db"))
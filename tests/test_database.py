@@ -0,0 +1,90 @@
+import pytest
+
+
+def add_patients(db, *names):
+    db.execute_many("INSERT INTO patients (name, phone) VALUES (?, ?)",
+                    [(name, f"0100{i:04d}") for i, name in enumerate(names)])
+
+
+def test_fetch_helpers(db):
+    add_patients(db, "Alice", "Bob")
+    assert db.fetch_all("SELECT name FROM patients ORDER BY name") == [("Alice",), ("Bob",)]
+    assert db.fetch_one("SELECT name FROM patients WHERE name = ?", ("Bob",)) == ("Bob",)
+    assert db.fetch_one("SELECT name FROM patients WHERE name = 'Nobody'") is None
+    assert db.scalar("SELECT MAX(id) FROM patients WHERE name = 'Nobody'", default=0) == 0
+    assert db.column_names("SELECT id, name FROM patients") == ["id", "name"]
+
+
+def test_transaction_commits_once(db):
+    with db.transaction():
+        patient_id = db.insert("INSERT INTO patients (name) VALUES ('Alice')")
+        db.execute("INSERT INTO bills (patient_id, amount, payment_status) VALUES (?, 10, 'Unpaid')", (patient_id,))
+        with db.transaction():
+            db.execute("UPDATE patients SET phone = '123' WHERE id = ?", (patient_id,))
+    assert db.fetch_one("SELECT name, phone FROM patients") == ("Alice", "123")
+    assert db.scalar("SELECT COUNT(*) FROM bills") == 1
+
+
+def test_transaction_rolls_back_on_error(db):
+    with pytest.raises(RuntimeError):
+        with db.transaction():
+            db.insert("INSERT INTO patients (name) VALUES ('Alice')")
+            with db.transaction():
+                db.insert("INSERT INTO patients (name) VALUES ('Bob')")
+            raise RuntimeError("abort")
+    assert db.scalar("SELECT COUNT(*) FROM patients") == 0
+    # The counter triggers ran inside the same transaction
+    assert db.scalar("SELECT value FROM clinic_counters WHERE day = '' AND name = 'total_patients'") == 0
+
+
+def test_cache_invalidated_through_triggers(db):
+    db.enable_cache()
+    query = "SELECT value FROM clinic_counters WHERE day = '' AND name = 'total_patients'"
+    assert db.scalar(query) == 0
+    assert db.scalar(query) == 0
+    assert db.cache_stats()['hits'] == 1
+
+    # Writing patients changes clinic_counters through a trigger
+    add_patients(db, "Alice")
+    assert db.scalar(query) == 1
+    with db.transaction():
+        db.execute("DELETE FROM patients")
+        # Reads inside a transaction bypass the cache
+        assert db.scalar(query) == 0
+    assert db.scalar(query) == 0
+
+
+def test_search_patients(db):
+    add_patients(db, "Alice Smith", "Alan Smithers", "Bob Jones")
+    names = [row[1] for row in db.search_patients("smith", columns=['id', 'name'])]
+    assert names == ["Alice Smith", "Alan Smithers"]
+    assert [row[1] for row in db.search_patients("al smith", columns=['id', 'name'])] == names
+    assert db.search_patients("smith", limit=1, columns=['id']) == [(1,)]
+    assert db.search_patients("   ") == []
+
+
+def test_get_dataframe_coerces_bad_values(db):
+    patient_id = db.insert("INSERT INTO patients (name) VALUES ('Alice')")
+    db.execute_many("""INSERT INTO bills (patient_id, amount, paid_amount, payment_status, bill_date)
+                       VALUES (?, ?, ?, 'Paid', ?)""",
+                    [(patient_id, 123456.78, 100, '2024-05-01'), (patient_id, 'abc', None, 'not a date')])
+    query = "SELECT patient_id, amount, paid_amount, bill_date FROM bills ORDER BY id"
+
+    df = db.get_dataframe(query, dtypes='auto')
+    assert len(df) == 2
+    assert str(df['amount'].dtype) == 'float64'
+    assert df['amount'][0] == 123456.78 and df['amount'].isna()[1]
+    assert df['paid_amount'].isna()[1]
+    assert df['bill_date'].isna()[1]
+    assert df['patient_id'].dtype.kind == 'i'
+
+    table = db.get_dataframe(query, dtypes='auto', arrow=True)
+    assert table.column('amount').to_pylist() == [123456.78, None]
+    assert table.column('bill_date').null_count == 1
+
+
+def test_get_dataframe_failure_keeps_the_return_type(db):
+    import pyarrow as pa
+
+    assert isinstance(db.get_dataframe("SELECT missing FROM bills", arrow=True), pa.Table)
+    assert db.get_dataframe("SELECT missing FROM bills", dtypes='auto').empty
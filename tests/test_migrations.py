@@ -0,0 +1,78 @@
+import sqlite3
+import threading
+
+import pytest
+
+
+def counter(db, day, name):
+    return db.scalar("SELECT value FROM clinic_counters WHERE day = ? AND name = ?", (day, name))
+
+
+def test_patient_without_created_at(db):
+    total = counter(db, '', 'total_patients') or 0
+    db.execute("INSERT INTO patients (name, created_at) VALUES ('No Date', NULL)")
+    db.execute("INSERT INTO patients (name, created_at) VALUES ('Bad Date', 'yesterday')")
+    assert counter(db, '', 'total_patients') == total + 2
+
+    db.execute("INSERT INTO patients (name, created_at) VALUES ('Dated', '2024-05-01 10:00:00')")
+    assert counter(db, '2024-05-01', 'new_patients') == 1
+    db.execute("UPDATE patients SET created_at = NULL WHERE name = 'Dated'")
+    assert counter(db, '2024-05-01', 'new_patients') == 0
+    db.execute("DELETE FROM patients WHERE name IN ('No Date', 'Bad Date', 'Dated')")
+    assert counter(db, '', 'total_patients') == total
+
+
+def downgrade_to_10(conn):
+    conn.execute("ALTER TABLE report_jobs DROP COLUMN owner")
+    conn.execute("ALTER TABLE report_jobs DROP COLUMN cancel_requested")
+    conn.execute("DELETE FROM schema_version WHERE version > 10")
+    conn.commit()
+
+
+def test_upgrade_replaces_counter_triggers(db):
+    from database import Database
+
+    # The version 5 trigger, which failed on a NULL created_at
+    with db.connection() as conn:
+        conn.execute("DROP TRIGGER trg_counters_patients_insert")
+        conn.execute("""CREATE TRIGGER trg_counters_patients_insert AFTER INSERT ON patients
+                        BEGIN
+                            INSERT INTO clinic_counters (day, name, value)
+                            VALUES (date(NEW.created_at), 'new_patients', 1)
+                            ON CONFLICT (day, name) DO UPDATE SET value = value + 1;
+                        END""")
+        downgrade_to_10(conn)
+    with pytest.raises(sqlite3.IntegrityError):
+        db.execute("INSERT INTO patients (name, created_at) VALUES ('No Date', NULL)")
+
+    upgraded = Database(db.db_name)
+    upgraded.execute("INSERT INTO patients (name, created_at) VALUES ('No Date', NULL)")
+
+
+def test_concurrent_migrate_applies_each_version_once(db):
+    import migrations
+
+    with db.connection() as conn:
+        downgrade_to_10(conn)
+
+    barrier = threading.Barrier(4)
+    applied, errors = [], []
+
+    def run():
+        conn = sqlite3.connect(db.db_name, timeout=30)
+        try:
+            barrier.wait()
+            applied.extend(migrations.migrate(conn))
+        except Exception as e:
+            errors.append(e)
+        finally:
+            conn.close()
+
+    threads = [threading.Thread(target=run) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert sorted(applied) == list(range(11, migrations.LATEST_VERSION + 1))
@@ -0,0 +1,51 @@
+import pytest
+
+
+@pytest.fixture
+def patients(db, monkeypatch):
+    import paging
+
+    monkeypatch.setattr(paging, 'db', db)
+    created = ['2024-01-02', None, '2024-01-01', '2024-01-02', None, '2024-01-03', '2024-01-02']
+    db.execute_many("INSERT INTO patients (name, created_at) VALUES (?, ?)",
+                    [(f"Patient {i}", day) for i, day in enumerate(created)])
+    return db.fetch_all("SELECT id, COALESCE(created_at, ''), name FROM patients")
+
+
+SORT_OPTIONS = {
+    "Newest first": (("COALESCE(created_at, '')", "id"), "DESC"),
+    "Oldest first": (("COALESCE(created_at, '')", "id"), "ASC"),
+    "Name (A-Z)": (("name", "id"), "ASC"),
+}
+
+
+def all_pages(pager, sort, page_size):
+    key_count = len(SORT_OPTIONS[sort][0])
+    ids, after = [], None
+    for _ in range(20):
+        rows = pager.fetch(sort, page_size, after)
+        ids += [row[0] for row in rows]
+        if len(rows) < page_size:
+            return ids
+        after = rows[-1][-key_count:]
+    raise AssertionError("paging did not end")
+
+
+@pytest.mark.parametrize("page_size", [1, 2, 3, 10])
+def test_pages_cover_every_row_once(patients, page_size):
+    from paging import KeysetPager
+
+    pager = KeysetPager("test", "id", "patients", SORT_OPTIONS)
+    newest = sorted(patients, key=lambda row: (row[1], row[0]), reverse=True)
+    assert all_pages(pager, "Newest first", page_size) == [row[0] for row in newest]
+    assert all_pages(pager, "Oldest first", page_size) == [row[0] for row in reversed(newest)]
+    assert all_pages(pager, "Name (A-Z)", page_size) == [row[0] for row in sorted(patients, key=lambda row: row[2])]
+
+
+def test_filters_and_count(patients):
+    from paging import KeysetPager
+
+    pager = KeysetPager("test", "id", "patients", SORT_OPTIONS, ["(created_at IS NULL OR created_at > ?)"],
+                        ['2024-01-01'], count_cap=3)
+    assert len(all_pages(pager, "Newest first", 2)) == 6
+    assert pager.count() == 4
@@ -0,0 +1,71 @@
+import os
+import threading
+
+import pytest
+
+DEAD_PID = 999999
+
+
+@pytest.fixture
+def jobs(db, tmp_path):
+    import report_jobs
+    return report_jobs.ReportJobs(db, artifact_dir=str(tmp_path / "artifacts"))
+
+
+def add_job(jobs, owner, status='running'):
+    return jobs.db.insert("""
+        INSERT INTO report_jobs (report_type, export_format, params, cache_key, status, owner)
+        VALUES ('Bills Report', 'CSV', '{}', 'key', ?, ?)
+    """, (status, owner))
+
+
+def status(jobs, job_id):
+    return jobs.get(job_id)['status']
+
+
+def test_recover_fails_only_jobs_of_exited_processes(jobs):
+    own = add_job(jobs, jobs.owner)
+    other = add_job(jobs, f"{os.getppid()}:token", 'queued')
+    dead = add_job(jobs, f"{DEAD_PID}:token")
+    restarted = add_job(jobs, f"{os.getpid()}:earlier")
+    stale = add_job(jobs, jobs.owner)
+    jobs.db.execute("UPDATE report_jobs SET started_at = datetime('now', '-7 hours') WHERE id = ?", (stale,))
+
+    jobs.recover()
+    assert [status(jobs, job_id) for job_id in (own, other, dead, restarted, stale)] == \
+        ['running', 'queued', 'failed', 'failed', 'failed']
+
+
+def test_cancel_job_of_another_process(jobs):
+    other = add_job(jobs, f"{os.getppid()}:token")
+    dead = add_job(jobs, f"{DEAD_PID}:token")
+
+    jobs.cancel(other)
+    jobs.cancel(dead)
+    assert status(jobs, other) == 'running'
+    assert jobs.db.scalar("SELECT cancel_requested FROM report_jobs WHERE id = ?", (other,)) == 1
+    assert status(jobs, dead) == 'cancelled'
+
+
+def test_worker_stops_on_cancel_request(jobs):
+    job_id = add_job(jobs, jobs.owner, 'queued')
+    jobs.db.execute("UPDATE report_jobs SET cancel_requested = 1 WHERE id = ?", (job_id,))
+    jobs._cancel_events[job_id] = threading.Event()
+
+    jobs._run(job_id, 'Bills Report', 'CSV', {'start_date': '2024-01-01', 'end_date': '2024-12-31', 'compress': False})
+    assert status(jobs, job_id) == 'cancelled'
+    assert job_id not in jobs._cancel_events
+
+
+def test_submit_runs_and_reuses_job(jobs):
+    patient_id = jobs.db.insert("INSERT INTO patients (name) VALUES ('Alice')")
+    jobs.db.execute_many("INSERT INTO bills (patient_id, amount, payment_status, bill_date) VALUES (?, ?, 'Paid', ?)",
+                         [(patient_id, 10.5 * i, f"2024-03-{i:02d}") for i in range(1, 11)])
+
+    job_id, reused = jobs.submit('Bills Report', 'CSV', '2024-01-01', '2024-12-31')
+    assert not reused
+    jobs._pool.shutdown(wait=True)
+    job = jobs.get(job_id)
+    assert (job['status'], job['row_count'], job['progress']) == ('done', 10, 1.0)
+    assert os.path.exists(job['artifact_path'])
+    assert jobs.submit('Bills Report', 'CSV', '2024-01-01', '2024-12-31') == (job_id, True)